@@ -0,0 +1,154 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import load_only, undefer
+from datetime import datetime
+import csv, io, json, zlib, logging
+from .database import Analysis, User, SessionLocal
+from .security import require_role
+from .analyze import filter_analyses
+from .result_format import expand_result
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+logger = logging.getLogger("admin_export")
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+BASE_COLUMNS = ["id", "user_id", "filename", "score", "created_at", "has_file"]
+RESULT_FIELDS = {
+    "fileType", "workType", "detectedType", "isValid", "status",
+    "sectionsFound", "sectionsMissing", "errors", "warnings",
+    "recommendations", "structureDetails", "fileDetails",
+}
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+
+def _parse_fields(fields: str) -> list[str]:
+    if not fields:
+        return []
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in RESULT_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля full_result: {', '.join(unknown)}"
+        )
+    return list(dict.fromkeys(selected))
+
+def _row_to_dict(analysis: Analysis, result_fields: list[str]) -> dict:
+    row = {
+        "id": analysis.id,
+        "user_id": analysis.user_id,
+        "filename": analysis.filename,
+        "score": analysis.score,
+        "created_at": analysis.created_at.isoformat() if analysis.created_at else None,
+        "has_file": bool(analysis.file_object_name),
+    }
+    if result_fields:
+        result = expand_result(analysis.full_result) or {}
+        for field in result_fields:
+            row[field] = result.get(field)
+    return row
+
+def _serialize_rows(rows, export_format: str, result_fields: list[str]):
+    """Превращает поток записей в поток строк выбранного формата."""
+    if export_format == "ndjson":
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(BASE_COLUMNS + result_fields)
+    for row in rows:
+        values = [row[c] for c in BASE_COLUMNS]
+        for field in result_fields:
+            value = row[field]
+            values.append(json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value)
+        writer.writerow(values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _chunked(lines, compress: bool):
+    """Склеивает строки в блоки по CHUNK_SIZE и при необходимости сжимает их."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            data = "".join(pending).encode("utf-8")
+            pending, size = [], 0
+            if compressor:
+                data = compressor.compress(data)
+            if data:
+                yield data
+    data = "".join(pending).encode("utf-8")
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+def _stream_analyses(filters: dict, sort_by: str, sort_order: str, result_fields: list[str]):
+    """Читает записи через серверный курсор, не держа всю выборку в памяти."""
+    db = SessionLocal()
+    try:
+        columns = [Analysis.id, Analysis.user_id, Analysis.filename, Analysis.score, Analysis.created_at, Analysis.file_object_name]
+        query = db.query(Analysis).options(load_only(*columns))
+        if result_fields:
+            query = query.options(undefer(Analysis.full_result))
+        query = filter_analyses(query, **filters)
+
+        sort_column = getattr(Analysis, sort_by)
+        if sort_order == "desc":
+            query = query.order_by(sort_column.desc(), Analysis.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), Analysis.id.asc())
+
+        for analysis in query.yield_per(YIELD_PER):
+            yield _row_to_dict(analysis, result_fields)
+    except Exception as e:
+        logger.error(f"Ошибка при экспорте анализов: {e}")
+        raise
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_analyses(
+    format: str = "csv",
+    fields: str = None,
+    gzip: bool = False,
+    search: str = None,
+    min_score: int = None,
+    max_score: int = None,
+    user_id: int = None,
+    sort_by: str = "created_at",
+    sort_order: str = "desc",
+    current_user: User = Depends(require_role("admin"))
+):
+    """Потоковая выгрузка всех анализов в CSV или NDJSON."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Поддерживаются форматы csv и ndjson")
+    if sort_by not in ["created_at", "score", "filename", "user_id"]: sort_by = "created_at"
+    if sort_order not in ["asc", "desc"]: sort_order = "desc"
+    result_fields = _parse_fields(fields)
+
+    filters = {"search": search, "min_score": min_score, "max_score": max_score, "user_id": user_id}
+    rows = _stream_analyses(filters, sort_by, sort_order, result_fields)
+    body = _chunked(_serialize_rows(rows, format, result_fields), compress=gzip)
+
+    filename = f"analyses_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    media_type = EXPORT_FORMATS[format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    logger.info(f"Admin {current_user.id} exports analyses as {format}")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import date
+from .database import AnalysisDailyStats, User, get_db
+from .security import require_role
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+SCORE_BUCKETS = 10
+
+def _bucket_label(bucket: int) -> str:
+    low = bucket * 10
+    high = 100 if bucket == SCORE_BUCKETS - 1 else low + 9
+    return f"{low}-{high}"
+
+def _average(score_sum, count) -> float:
+    return round(float(score_sum) / count, 1) if count else 0.0
+
+@router.get("/stats")
+def get_admin_stats(
+    date_from: date = None,
+    date_to: date = None,
+    user_id: int = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Сводная статистика по анализам из предагрегированной таблицы."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from не может быть позже date_to")
+
+    stats = AnalysisDailyStats
+    filters = []
+    if date_from: filters.append(stats.day >= date_from)
+    if date_to: filters.append(stats.day <= date_to)
+    if user_id is not None: filters.append(stats.user_id == user_id)
+
+    count = func.sum(stats.analyses_count).label("count")
+    score_sum = func.sum(stats.score_sum).label("score_sum")
+
+    def grouped(column):
+        return (
+            db.query(column, count, score_sum)
+            .filter(*filters)
+            .group_by(column)
+            .having(func.sum(stats.analyses_count) > 0)
+            .order_by(column)
+            .all()
+        )
+
+    daily = grouped(stats.day)
+    by_type = grouped(stats.detected_type)
+    by_bucket = {row[0]: row.count for row in grouped(stats.score_bucket)}
+
+    total = sum(row.count for row in daily)
+    total_score = sum(row.score_sum for row in daily)
+
+    return {
+        "totals": {
+            "analyses": total,
+            "averageScore": _average(total_score, total)
+        },
+        "scoreDistribution": [
+            {"bucket": _bucket_label(bucket), "count": by_bucket.get(bucket, 0)}
+            for bucket in range(SCORE_BUCKETS)
+        ],
+        "byWorkType": [
+            {"detectedType": row[0], "count": row.count, "averageScore": _average(row.score_sum, row.count)}
+            for row in sorted(by_type, key=lambda r: r.count, reverse=True)
+        ],
+        "daily": [
+            {"date": row[0].isoformat(), "count": row.count, "averageScore": _average(row.score_sum, row.count)}
+            for row in daily
+        ],
+        "filters": {
+            "date_from": date_from.isoformat() if date_from else None,
+            "date_to": date_to.isoformat() if date_to else None,
+            "user_id": user_id
+        }
+    }
@@ -0,0 +1,156 @@
+"""Контроль допуска для тяжёлых эндпоинтов анализа.
+
+Одновременно выполняется не больше ADMISSION_MAX_CONCURRENT анализов и не
+больше ADMISSION_USER_MAX_CONCURRENT от одного пользователя (считая его
+запросы в очереди). Остальные ждут в очереди длиной ADMISSION_QUEUE_SIZE
+не дольше ADMISSION_QUEUE_TIMEOUT_SECONDS. Превышение лимита пользователя
+даёт 429, переполнение или таймаут очереди — 503, оба с Retry-After.
+
+Лимиты действуют в пределах одного процесса: при нескольких воркерах
+uvicorn общий предел равен сумме по воркерам.
+"""
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from fastapi import Depends, HTTPException
+from .database import User
+from .dependencies import get_current_user
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT_SECONDS, ADMISSION_REJECTIONS
+from .config import (
+    ADMISSION_MAX_CONCURRENT, ADMISSION_USER_MAX_CONCURRENT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+
+# Вес нового замера в скользящем среднем времени анализа
+SERVICE_TIME_ALPHA = 0.2
+
+class AdmissionController:
+    """Семафор с ограниченной FIFO-очередью и лимитом на пользователя.
+
+    Работает только из event loop, поэтому обходится без блокировок.
+    Освободившийся слот передаётся первому ожидающему напрямую.
+    """
+
+    def __init__(self, max_concurrent: int, per_user: int, queue_size: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.user_requests = Counter()
+        self.waiters = deque()
+        self.avg_service_time = 1.0
+
+    def retry_after(self) -> int:
+        """Оценка, через сколько секунд освободится место в очереди."""
+        rounds = (len(self.waiters) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(self.avg_service_time * rounds))
+
+    def _reject(self, status_code: int, reason: str, detail: str):
+        ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    async def acquire(self, user_id: int):
+        if self.user_requests[user_id] >= self.per_user:
+            self._reject(429, "user_limit", "Слишком много одновременных анализов, дождитесь завершения предыдущих")
+
+        if self.active < self.max_concurrent and not self.waiters:
+            self.user_requests[user_id] += 1
+            self._set_active(self.active + 1)
+            return
+
+        if len(self.waiters) >= self.queue_size:
+            self._reject(503, "queue_full", "Сервер перегружен, повторите попытку позже")
+
+        self.user_requests[user_id] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.inc()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # Клиент отключился в очереди: место в очереди или уже переданный слот возвращаются
+            self._abandon(waiter, user_id)
+            raise
+        finally:
+            ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+        if not waiter.done() or waiter.cancelled():
+            self._abandon(waiter, user_id)
+            self._reject(503, "queue_timeout", "Сервер перегружен, повторите попытку позже")
+
+    def _abandon(self, waiter: asyncio.Future, user_id: int):
+        """Снимает запрос с очереди; если слот ему уже передан, отдаёт его следующему."""
+        self._release_user(user_id)
+        if waiter.done() and not waiter.cancelled():
+            self._hand_over()
+            return
+        waiter.cancel()
+        if waiter in self.waiters:
+            self.waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.dec()
+
+    def release(self, user_id: int, service_time: float):
+        self._release_user(user_id)
+        self.avg_service_time += SERVICE_TIME_ALPHA * (service_time - self.avg_service_time)
+        self._hand_over()
+
+    def _hand_over(self):
+        """Передаёт слот первому живому ожидающему, иначе уменьшает число активных."""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            ADMISSION_QUEUE_DEPTH.dec()
+            if not waiter.done():
+                # Слот переходит к следующему в очереди, число активных не меняется
+                waiter.set_result(None)
+                return
+        self._set_active(self.active - 1)
+
+    def _release_user(self, user_id: int):
+        self.user_requests[user_id] -= 1
+        if self.user_requests[user_id] <= 0:
+            del self.user_requests[user_id]
+
+    def _set_active(self, value: int):
+        self.active = value
+        ADMISSION_ACTIVE.set(value)
+
+analysis_admission = AdmissionController(
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_USER_MAX_CONCURRENT,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS
+)
+
+class AdmissionSlot:
+    """Занятый запросом слот анализа."""
+
+    def __init__(self, controller: AdmissionController, user_id: int):
+        self.controller = controller
+        self.user_id = user_id
+        self.start = time.perf_counter()
+        self.task = None
+
+    def hold_until(self, task: asyncio.Task):
+        """Не отдавать слот, пока не завершится фоновая задача запроса.
+
+        Анализ с потоком событий (progress) продолжается и после отключения
+        клиента, и всё это время должен занимать слот.
+        """
+        self.task = task
+
+    def release(self):
+        self.controller.release(self.user_id, time.perf_counter() - self.start)
+
+async def admit_analysis(current_user: User = Depends(get_current_user)):
+    """Зависимость эндпоинтов анализа: держит слот до конца обработки запроса."""
+    await analysis_admission.acquire(current_user.id)
+    slot = AdmissionSlot(analysis_admission, current_user.id)
+    try:
+        yield slot
+    finally:
+        if slot.task is not None and not slot.task.done():
+            slot.task.add_done_callback(lambda _: slot.release())
+        else:
+            slot.release()
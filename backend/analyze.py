@@ -1,17 +1,37 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request
-import re, logging
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+import logging
 from io import BytesIO
 from datetime import datetime
-import PyPDF2, docx
+import docx
 from .database import get_db
 from .database import Analysis, User
-from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only, undefer
 from .ocr_service import ocr_service
+from .docx_stream import extract_docx_text
+from .pdf_backends import pdf_backend
+from .pdf_ocr import ocr_missing_pages
 from PIL import Image
 from .dependencies import get_current_user
 from .security import require_role
 from .minio_service import minio_service
+from .template_store import template_store
+from .similarity import find_similar_documents, index_signature
+from .rules import DocumentIndex, apply_rules, rules_bonus
+from .result_format import compact_result, expand_result
+from .purger import soft_delete_analyses
+from .schemas import AnalysisResult, MultipleAnalysisResponse, BatchDetailsResponse
+from .admission import AdmissionSlot, admit_analysis
+from .profiling import profile_request, attach_analysis, run_profiled, SamplingProfiler
+from .tracing import span
+from .progress import report, wants_event_stream, event_stream
+from .metrics import timed, record_cache, record_analysis_error
+from .caching import make_etag, etag_matches, cache_headers, not_modified, download_url_window, DETAILS_MAX_AGE
+from pydantic import BaseModel
+from typing import Optional
 import uuid
+from functools import partial
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -25,133 +45,33 @@ import os
 router = APIRouter(prefix="/api", tags=["Analyzer"])
 logger = logging.getLogger("analyzer")
 
-WORK_TYPE_TEMPLATES = {
-    'lab_report': {
-        'name': 'Лабораторная работа',
-        'required_sections': [
-            {'id': 'title', 'name': 'Титульный лист/Название', 'patterns': [
-                r'лабораторная\s+работа', r'отчет\s+по\s+лабораторной', r'lab\s+report', r'title\s+page'
-            ]},
-            {'id': 'purpose', 'name': 'Цель работы', 'patterns': [
-                r'цель', r'цель\s+работы', r'objective', r'aim'
-            ]},
-            {'id': 'task', 'name': 'Задание', 'patterns': [
-                r'задание', r'задача', r'задачи', r'задания', r'task', r'experiment\s+task'
-            ]},
-            {'id': 'procedure', 'name': 'Ход работы', 'patterns': [
-                r'ход\s+работы', r'ход\s+выполнения', r'методика', r'процедура', r'procedure', r'methods', r'experimental\s+steps'
-            ]},
-            {'id': 'conclusion', 'name': 'Вывод', 'patterns': [
-                r'вывод', r'заключение', r'conclusion', r'results'
-            ]}
-        ],
-        'optional_sections': [
-            {'id': 'theory', 'name': 'Теоретическая часть', 'patterns': [
-                r'теория', r'теоретическая', r'theory', r'background'
-            ]},
-            {'id': 'calculations', 'name': 'Расчеты', 'patterns': [
-                r'расчет', r'вычислен', r'calculations', r'computations'
-            ]}
-        ]
-    },
-
-    'course_work': {
-        'name': 'Курсовая работа', 
-        'required_sections': [
-            {'id': 'title', 'name': 'Титульный лист', 'patterns': [
-                r'курсовая\s+работа', r'курсовой\s+проект', r'course\s+work', r'title\s+page'
-            ]},
-            {'id': 'contents', 'name': 'Содержание', 'patterns': [
-                r'содержание', r'оглавление', r'table\s+of\s+contents', r'index'
-            ]},
-            {'id': 'introduction', 'name': 'Введение', 'patterns': [
-                r'введение', r'introduction'
-            ]},
-            {'id': 'theory', 'name': 'Теоретическая часть', 'patterns': [
-                r'теоретическая\s+часть', r'глава\s+1', r'theoretical\s+part', r'chapter\s+1'
-            ]},
-            {'id': 'practice', 'name': 'Практическая часть', 'patterns': [
-                r'практическая\s+часть', r'глава\s+2', r'исследование', r'practical\s+part', r'experiment', r'research'
-            ]},
-            {'id': 'conclusion', 'name': 'Заключение', 'patterns': [
-                r'заключение', r'выводы', r'conclusion', r'results'
-            ]},
-            {'id': 'bibliography', 'name': 'Список литературы', 'patterns': [
-                r'список\s+литературы', r'библиография', r'references', r'bibliography'
-            ]}
-        ],
-        'optional_sections': [
-            {'id': 'appendix', 'name': 'Приложения', 'patterns': [
-                r'приложение', r'appendix', r'annex'
-            ]}
-        ]
-    },
-
-    'essay': {
-        'name': 'Реферат/Эссе',
-        'required_sections': [
-            {'id': 'title', 'name': 'Титульный лист', 'patterns': [
-                r'реферат', r'эссе', r'essay', r'title\s+page'
-            ]},
-            {'id': 'introduction', 'name': 'Введение', 'patterns': [
-                r'введение', r'introduction'
-            ]},
-            {'id': 'main_part', 'name': 'Основная часть', 'patterns': [
-                r'основная\s+часть', r'main\s+part', r'body'
-            ]},
-            {'id': 'conclusion', 'name': 'Заключение', 'patterns': [
-                r'заключение', r'conclusion', r'results'
-            ]}
-        ],
-        'optional_sections': [
-            {'id': 'bibliography', 'name': 'Список литературы', 'patterns': [
-                r'список\s+литературы', r'bibliography', r'references'
-            ]}
-        ]
-    },
-
-    'thesis': {
-        'name': 'Дипломная работа',
-        'required_sections': [
-            {'id': 'title', 'name': 'Титульный лист', 'patterns': [
-                r'дипломная\s+работа', r'выпускная\s+квалификационная', r'thesis', r'title\s+page'
-            ]},
-            {'id': 'abstract', 'name': 'Аннотация', 'patterns': [
-                r'аннотация', r'реферат', r'abstract', r'summary'
-            ]},
-            {'id': 'contents', 'name': 'Содержание', 'patterns': [
-                r'содержание', r'table\s+of\s+contents', r'оглавление'
-            ]},
-            {'id': 'introduction', 'name': 'Введение', 'patterns': [
-                r'введение', r'introduction'
-            ]},
-            {'id': 'chapters', 'name': 'Главы (3-4)', 'patterns': [
-                r'глава\s+[1-4]', r'chapter\s+[1-4]'
-            ]},
-            {'id': 'conclusion', 'name': 'Заключение', 'patterns': [
-                r'заключение', r'выводы', r'conclusion'
-            ]},
-            {'id': 'bibliography', 'name': 'Список литературы', 'patterns': [
-                r'список\s+литературы', r'библиография', r'references', r'bibliography'
-            ]},
-            {'id': 'appendix', 'name': 'Приложения', 'patterns': [
-                r'приложение', r'appendix', r'annex'
-            ]}
-        ]
-    }
-}
+BULK_DELETE_LIMIT = 500
+BATCH_DETAILS_LIMIT = 50
+
+class BulkDeleteRequest(BaseModel):
+    ids: Optional[list[int]] = None
+    user_id: Optional[int] = None
 
+@timed("extract_pdf")
 def extract_text_from_pdf(file_content: bytes) -> str:
     try:
-        pdf_file = BytesIO(file_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = "".join([page.extract_text() + "\n" for page in pdf_reader.pages])
-        return text
+        pages = pdf_backend.extract_pages(file_content)
+        pages = ocr_missing_pages(file_content, pages)
+        return "".join(page + "\n" for page in pages)
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         return ""
 
+@timed("extract_docx")
 def extract_text_from_docx(file_content: bytes) -> str:
+    try:
+        return extract_docx_text(file_content)
+    except Exception as e:
+        logger.warning(f"Потоковое извлечение DOCX не удалось, пробуем python-docx: {e}")
+    return extract_text_from_docx_model(file_content)
+
+def extract_text_from_docx_model(file_content: bytes) -> str:
+    """Извлечение через объектную модель python-docx: только абзацы основного текста."""
     try:
         doc_file = BytesIO(file_content)
         doc = docx.Document(doc_file)
@@ -161,6 +81,7 @@ def extract_text_from_docx(file_content: bytes) -> str:
         logger.error(f"DOCX extraction error: {e}")
         return ""
 
+@timed("extract_txt")
 def extract_text_from_txt(file_content: bytes) -> str:
     for enc in ['utf-8', 'latin-1', 'cp1251']:
         try:
@@ -169,6 +90,7 @@ def extract_text_from_txt(file_content: bytes) -> str:
             continue
     return ""
 
+@timed("extract_image")
 def extract_text_from_image(file_content: bytes) -> str:
     try:
         image = Image.open(BytesIO(file_content))
@@ -187,6 +109,7 @@ def extract_text_from_image(file_content: bytes) -> str:
         logger.error(f"Image extraction error: {e}")
         return ""
 
+@timed("report_pdf")
 def generate_report_pdf(analysis_result: dict, user_full_name: str) -> bytes:
     """Генерирует PDF-отчёт по результатам анализа."""
     buffer = BytesIO()
@@ -326,19 +249,15 @@ def _cyrillic_font_available() -> bool:
         return False
 
 
-def detect_work_type(filename: str, content: str) -> str:
+@timed("detect_type")
+def detect_work_type(filename: str, content: str, index: DocumentIndex = None, detection: list = None) -> str:
     filename_lower = filename.lower()
-    content_lower = content.lower()
-    
-    mapping = {
-        'course_work': ['курсовая', 'coursework', 'course_work'],
-        'lab_report': ['лабораторная', 'lab', 'отчет', 'laboratory'],
-        'essay': ['реферат', 'эссе', 'essay'],
-        'thesis': ['диплом', 'thesis', 'вкр', 'дипломная']
-    }
-    
-    for work_type, keywords in mapping.items():
-        if any(k in filename_lower for k in keywords) or any(re.search(k, content_lower) for k in keywords):
+    index = index or DocumentIndex(content)
+    if detection is None:
+        detection = template_store.current().detection
+
+    for work_type, keywords in detection:
+        if any(k in filename_lower for k in keywords) or index.matches_any(keywords):
             return work_type
 
     length = len(content)
@@ -347,17 +266,23 @@ def detect_work_type(filename: str, content: str) -> str:
     elif length > 5000: return 'essay'
     else: return 'lab_report'
 
+@timed("analyze")
 def analyze_work_structure(content: str, filename: str, work_type: str = None) -> dict:
+    templates = template_store.current()
+    index = DocumentIndex(content)
+    # Пересчёт оценок (rescore) заново определяет тип, только если его не выбрал пользователь
+    work_type_source = 'user' if work_type else 'detected'
     if not work_type:
-        work_type = detect_work_type(filename, content)
+        work_type = detect_work_type(filename, content, index, templates.detection)
     
-    template = WORK_TYPE_TEMPLATES.get(work_type, WORK_TYPE_TEMPLATES['lab_report'])
+    template = templates.get(work_type)
     
     analysis_result = {
         'fileName': filename,
         'fileType': 'document',
-        'workType': template['name'],
+        'workType': template.name,
         'detectedType': work_type,
+        'workTypeSource': work_type_source,
         'isValid': False,
         'score': 0,
         'sectionsFound': [],
@@ -369,8 +294,8 @@ def analyze_work_structure(content: str, filename: str, work_type: str = None) -
     }
     
     required_found = 0
-    for section in template['required_sections']:
-        found = any(re.search(p, content, re.IGNORECASE) for p in section['patterns'])
+    for section, patterns in template.required:
+        found = index.matches_any(patterns)
         analysis_result['sectionsFound'].append({**section, 'found': found})
         if found:
             required_found += 1
@@ -378,17 +303,17 @@ def analyze_work_structure(content: str, filename: str, work_type: str = None) -
             analysis_result['sectionsMissing'].append(section['name'])
             analysis_result['errors'].append(f"Отсутствует обязательный раздел: {section['name']}")
     
-    for section in template.get('optional_sections', []):
-        found = any(re.search(p, content, re.IGNORECASE) for p in section['patterns'])
+    for section, patterns in template.optional:
+        found = index.matches_any(patterns)
         analysis_result['sectionsFound'].append({**section, 'found': found, 'optional': True})
         if not found:
             analysis_result['recommendations'].append(f"Рекомендуется добавить: {section['name']}")
     
-    analyze_specific_rules(content, analysis_result, work_type)
+    analyze_specific_rules(content, analysis_result, work_type, index)
     
-    total_required = len(template['required_sections'])
+    total_required = len(template.required)
     score_percentage = (required_found / total_required) * 80 if total_required > 0 else 0
-    bonus = calculate_bonus(content, work_type)
+    bonus = calculate_bonus(content, work_type, index)
     penalty = len(analysis_result['errors']) * 5
     final_score = max(0, min(100, score_percentage + bonus - penalty))
     
@@ -403,57 +328,42 @@ def analyze_work_structure(content: str, filename: str, work_type: str = None) -
     }
     return analysis_result
 
-def analyze_specific_rules(content: str, analysis_result: dict, work_type: str):
-    content_lower = content.lower()
-    if work_type == 'lab_report':
-        if not re.search(r'\d+\.\s+|\n\s*\d+\)', content):
-            analysis_result['warnings'].append("Рекомендуется оформить ход работы в виде нумерованных шагов")
-        if not any(w in content_lower for w in ['эксперимент', 'опыт', 'исследование', 'результат']):
-            analysis_result['warnings'].append("Рекомендуется добавить описание эксперимента или исследований")
-    elif work_type == 'course_work':
-        if len(content) < 8000:
-            analysis_result['warnings'].append("Объем курсовой работы может быть недостаточным (рекомендуется 10-30 страниц)")
-        if not re.search(r'\[\d+\]', content) and not re.search(r'\([А-Яа-я]+\s*,\s*\d{4}\)', content):
-            analysis_result['recommendations'].append("Рекомендуется добавить ссылки на литературу в тексте")
-    elif work_type == 'thesis':
-        if len(content) < 20000:
-            analysis_result['errors'].append("Объем дипломной работы недостаточен (рекомендуется 40-80 страниц)")
-        chapter_count = len(re.findall(r'глава\s+[1-4]', content_lower))
-        if chapter_count < 2:
-            analysis_result['errors'].append("Дипломная работа должна содержать не менее 2 глав")
-
-def calculate_bonus(content: str, work_type: str) -> int:
-    bonus = 0
-    content_lower = content.lower()
-    if re.search(r'\bстр\.\s*\d+|\bс\.\s*\d+|\bpage\s*\d+', content_lower):
-        bonus += 5
-    if re.search(r'рис\.|рисунок|таблица|table|figure', content_lower, re.IGNORECASE):
-        bonus += 5
-    if re.search(r'\d+\.\d+', content) or re.search(r'[a-zA-Z]\.\d+', content):
-        bonus += 10
-    if work_type == 'thesis' and len(content) > 40000: bonus += 5
-    elif work_type == 'course_work' and len(content) > 15000: bonus += 5
-    return bonus
-
-@router.post("/analyze")
+def analyze_specific_rules(content: str, analysis_result: dict, work_type: str, index: DocumentIndex = None):
+    apply_rules(index or DocumentIndex(content), analysis_result, work_type)
+
+def calculate_bonus(content: str, work_type: str, index: DocumentIndex = None) -> int:
+    return rules_bonus(index or DocumentIndex(content), work_type)
+
+@router.post("/analyze", response_model=AnalysisResult, response_model_exclude_unset=True)
 async def analyze_file(
+    request: Request,
     file: UploadFile = File(...),
     work_type: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    slot: AdmissionSlot = Depends(admit_analysis),
+    profiler: Optional[SamplingProfiler] = Depends(profile_request)
 ):
+    """Анализ одного файла; с Accept: text/event-stream — с ходом анализа (progress.py)."""
+    content = await file.read()
+    run = partial(analyze_upload, file.filename, file.content_type, content, work_type, current_user, profiler)
+    if wants_event_stream(request):
+        return event_stream(run, AnalysisResult, profiler, slot)
+    return await run_in_threadpool(run_profiled, profiler, run, db)
+
+def analyze_upload(filename: str, content_type: str, content: bytes, work_type: str, current_user: User, profiler: Optional[SamplingProfiler], db: Session) -> dict:
+    """Анализ полученного файла: тело /api/analyze и финализации прямой загрузки (uploads)."""
     try:
-        logger.info(f"User {current_user.id} is analyzing file: {file.filename}")
+        logger.info(f"User {current_user.id} is analyzing file: {filename}")
 
-        if not file.filename:
+        if not filename:
             raise HTTPException(status_code=400, detail="Имя файла не указано")
 
-        content = await file.read()
-        filename = file.filename
-        file_content_type = file.content_type or ""
+        report("uploaded", size=len(content))
+        file_content_type = content_type or ""
         text_content = ""
 
-
+        report("extracting")
         if file_content_type == 'application/pdf' or filename.lower().endswith('.pdf'):
             text_content = extract_text_from_pdf(content)
         elif file_content_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document','application/msword'] or filename.lower().endswith(('.doc', '.docx')):
@@ -461,66 +371,31 @@ async def analyze_file(
         elif file_content_type == 'text/plain' or filename.lower().endswith('.txt'):
             text_content = extract_text_from_txt(content)
         elif file_content_type.startswith('image/') or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff')):
+            report("ocr", 0, 1)
             text_content = extract_text_from_image(content)
             
             if not text_content.strip():
-                analysis_record = Analysis(
-                    user_id=current_user.id,
-                    filename=filename,
-                    score=0,
-                    file_object_name=None,
-                    full_result={
-                        'fileName': filename,
-                        'score': 0,
-                        'status': 'no_text_in_image',
-                        'isValid': False,
-                        'workType': 'Не определен',
-                        'fileType': 'image',
-                        'detectedType': 'unknown',
-                        'sectionsFound': [],
-                        'sectionsMissing': [],
-                        'errors': ['Не удалось распознать текст на изображении'],
-                        'warnings': [
-                            'Убедитесь, что изображение четкое',
-                            'Текст должен быть хорошо виден', 
-                            'Попробуйте сделать фото при хорошем освещении'
-                        ],
-                        'recommendations': [
-                            'Используйте скриншоты вместо фото документов',
-                            'Убедитесь что текст не размыт',
-                            'Попробуйте увеличить контрастность изображения'
-                        ],
-                        'structureDetails': {
-                            'totalSectionsChecked': 0,
-                            'requiredSectionsFound': 0,
-                            'totalRequiredSections': 0,
-                            'contentLength': 0,
-                            'detectionConfidence': 'low'
-                        }
-                    }
-                )
-                db.add(analysis_record)
-                db.commit()
-                return analysis_record.full_result
-        else:
-            analysis_record = Analysis(
-                user_id=current_user.id,
-                filename=filename,
-                score=0,
-                file_object_name=None,
-                full_result={
+                result = {
                     'fileName': filename,
                     'score': 0,
-                    'status': 'unsupported_format',
+                    'status': 'no_text_in_image',
                     'isValid': False,
                     'workType': 'Не определен',
-                    'fileType': 'unsupported',
+                    'fileType': 'image',
                     'detectedType': 'unknown',
                     'sectionsFound': [],
                     'sectionsMissing': [],
-                    'errors': ['Формат файла не поддерживается'],
-                    'warnings': [],
-                    'recommendations': ['Загрузите PDF, DOCX, TXT или изображения (JPG, PNG, etc.)'],
+                    'errors': ['Не удалось распознать текст на изображении'],
+                    'warnings': [
+                        'Убедитесь, что изображение четкое',
+                        'Текст должен быть хорошо виден', 
+                        'Попробуйте сделать фото при хорошем освещении'
+                    ],
+                    'recommendations': [
+                        'Используйте скриншоты вместо фото документов',
+                        'Убедитесь что текст не размыт',
+                        'Попробуйте увеличить контрастность изображения'
+                    ],
                     'structureDetails': {
                         'totalSectionsChecked': 0,
                         'requiredSectionsFound': 0,
@@ -529,49 +404,97 @@ async def analyze_file(
                         'detectionConfidence': 'low'
                     }
                 }
+                record_analysis_error(result['status'])
+                analysis_record = Analysis(
+                    user_id=current_user.id,
+                    filename=filename,
+                    score=0,
+                    file_object_name=None,
+                    full_result=compact_result(result)
+                )
+                db.add(analysis_record)
+                db.commit()
+                attach_analysis(profiler, analysis_record.id)
+                return result
+        else:
+            result = {
+                'fileName': filename,
+                'score': 0,
+                'status': 'unsupported_format',
+                'isValid': False,
+                'workType': 'Не определен',
+                'fileType': 'unsupported',
+                'detectedType': 'unknown',
+                'sectionsFound': [],
+                'sectionsMissing': [],
+                'errors': ['Формат файла не поддерживается'],
+                'warnings': [],
+                'recommendations': ['Загрузите PDF, DOCX, TXT или изображения (JPG, PNG, etc.)'],
+                'structureDetails': {
+                    'totalSectionsChecked': 0,
+                    'requiredSectionsFound': 0,
+                    'totalRequiredSections': 0,
+                    'contentLength': 0,
+                    'detectionConfidence': 'low'
+                }
+            }
+            record_analysis_error(result['status'])
+            analysis_record = Analysis(
+                user_id=current_user.id,
+                filename=filename,
+                score=0,
+                file_object_name=None,
+                full_result=compact_result(result)
             )
             db.add(analysis_record)
             db.commit()
-            return analysis_record.full_result
+            attach_analysis(profiler, analysis_record.id)
+            return result
 
         if not text_content.strip():
+            result = {
+                'fileName': filename,
+                'score': 0,
+                'status': 'empty_file',
+                'isValid': False,
+                'workType': 'Не определен',
+                'fileType': 'empty',
+                'detectedType': 'unknown',
+                'sectionsFound': [],
+                'sectionsMissing': [],
+                'errors': ['Не удалось извлечь текст из файла'],
+                'warnings': [],
+                'recommendations': ['Файл должен содержать текст'],
+                'structureDetails': {
+                    'totalSectionsChecked': 0,
+                    'requiredSectionsFound': 0,
+                    'totalRequiredSections': 0,
+                    'contentLength': 0,
+                    'detectionConfidence': 'low'
+                }
+            }
+            record_analysis_error(result['status'])
             analysis_record = Analysis(
                 user_id=current_user.id,
                 filename=filename,
                 score=0,
                 file_object_name=None,
-                full_result={
-                    'fileName': filename,
-                    'score': 0,
-                    'status': 'empty_file',
-                    'isValid': False,
-                    'workType': 'Не определен',
-                    'fileType': 'empty',
-                    'detectedType': 'unknown',
-                    'sectionsFound': [],
-                    'sectionsMissing': [],
-                    'errors': ['Не удалось извлечь текст из файла'],
-                    'warnings': [],
-                    'recommendations': ['Файл должен содержать текст'],
-                    'structureDetails': {
-                        'totalSectionsChecked': 0,
-                        'requiredSectionsFound': 0,
-                        'totalRequiredSections': 0,
-                        'contentLength': 0,
-                        'detectionConfidence': 'low'
-                    }
-                }
+                full_result=compact_result(result)
             )
             db.add(analysis_record)
             db.commit()
-            return analysis_record.full_result
+            attach_analysis(profiler, analysis_record.id)
+            return result
 
+        report("analysing")
         analysis_result = analyze_work_structure(text_content, filename, work_type)
+        signature = find_similar_documents(db, analysis_result, text_content, current_user.id)
         score = analysis_result.get('score', 0)
 
         report_object_name = None
         if minio_service:
             try:
+                report("rendering")
                 user_full_name = f"{current_user.first_name} {current_user.last_name}"
                 pdf_bytes = generate_report_pdf(analysis_result, user_full_name)
                 report_object_name = f"reports/{current_user.id}/{uuid.uuid4()}.pdf"
@@ -586,16 +509,22 @@ async def analyze_file(
             filename=filename,
             score=score,
             file_object_name=report_object_name,
-            full_result=analysis_result
+            full_result=compact_result(analysis_result),
+            extracted_text=text_content
         )
 
         db.add(analysis_record)
+        db.flush()
+        index_signature(db, analysis_record.id, signature)
         db.commit()
         db.refresh(analysis_record)
+        attach_analysis(profiler, analysis_record.id)
+        report("stored", analysisId=analysis_record.id)
 
         return analysis_result
 
     except Exception as e:
+        record_analysis_error('exception')
         logger.error(f"Error analyzing file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка при анализе файла: {str(e)}")
 
@@ -623,13 +552,18 @@ def get_my_uploads(
         raise HTTPException(status_code=400, detail="min_score не может быть больше max_score")
 
     offset = (page - 1) * limit
-    query = db.query(Analysis).filter(Analysis.user_id == current_user.id)
+    query = (
+        db.query(Analysis)
+        .options(load_only(Analysis.id, Analysis.filename, Analysis.score, Analysis.created_at, Analysis.file_object_name))
+        .filter(Analysis.user_id == current_user.id, Analysis.deleted_at.is_(None))
+    )
     
     if search: query = query.filter(Analysis.filename.ilike(f"%{search}%"))
     if min_score is not None: query = query.filter(Analysis.score >= min_score)
     if max_score is not None: query = query.filter(Analysis.score <= max_score)
     
-    total = query.count()
+    # query.count() оборачивает запрос со всеми колонками модели в подзапрос
+    total = query.with_entities(func.count(Analysis.id)).scalar()
     
     sort_column = getattr(Analysis, sort_by)
     query = query.order_by(sort_column.desc() if sort_order == "desc" else sort_column.asc())
@@ -660,13 +594,16 @@ def get_my_uploads(
         }
     }
 
-@router.get("/upload/{upload_id}/details")
+@router.get("/upload/{upload_id}/details", response_model=AnalysisResult, response_model_exclude_unset=True)
 def get_upload_details(
     upload_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    upload = db.query(Analysis).filter(Analysis.id == upload_id).first()
+    # full_result отложен и загружается только если клиенту нужен ответ
+    upload = db.query(Analysis).filter(Analysis.id == upload_id, Analysis.deleted_at.is_(None)).first()
     
     if not upload:
         raise HTTPException(status_code=404, detail="Запись не найдена")
@@ -677,10 +614,55 @@ def get_upload_details(
             detail="У вас нет доступа к этому анализу"
         )
     
+    etag = make_etag("analysis", upload.id, upload.result_version)
+    cached = etag_matches(request, etag)
+    record_cache("details_etag", cached)
+    if cached:
+        return not_modified(etag, DETAILS_MAX_AGE)
+    
     if not upload.full_result:
         raise HTTPException(status_code=404, detail="Детали анализа не найдены")
     
-    return upload.full_result
+    response.headers.update(cache_headers(etag, DETAILS_MAX_AGE))
+    return expand_result(upload.full_result)
+
+@router.get("/uploads/details", response_model=BatchDetailsResponse, response_model_exclude_unset=True)
+def get_uploads_details_batch(
+    ids: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Детали нескольких анализов одним запросом: ids=1,2,3."""
+    try:
+        upload_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids должен содержать числа через запятую")
+    if not upload_ids:
+        raise HTTPException(status_code=400, detail="Не указаны ids")
+    if len(upload_ids) > BATCH_DETAILS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Можно запросить не более {BATCH_DETAILS_LIMIT} записей за раз")
+
+    uploads = {
+        upload.id: upload
+        for upload in db.query(Analysis)
+        .options(undefer(Analysis.full_result))
+        .filter(Analysis.id.in_(upload_ids), Analysis.deleted_at.is_(None))
+        .all()
+    }
+
+    results, errors = {}, {}
+    for upload_id in upload_ids:
+        upload = uploads.get(upload_id)
+        if upload is None:
+            errors[upload_id] = {"status": 404, "detail": "Запись не найдена"}
+        elif current_user.role != "admin" and upload.user_id != current_user.id:
+            errors[upload_id] = {"status": 403, "detail": "У вас нет доступа к этому анализу"}
+        elif not upload.full_result:
+            errors[upload_id] = {"status": 404, "detail": "Детали анализа не найдены"}
+        else:
+            results[upload_id] = expand_result(upload.full_result)
+
+    return {"results": results, "errors": errors}
 
 @router.delete("/upload/{upload_id}")
 def delete_upload(
@@ -688,7 +670,7 @@ def delete_upload(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    upload = db.query(Analysis).filter(Analysis.id == upload_id).first()
+    upload = db.query(Analysis).filter(Analysis.id == upload_id, Analysis.deleted_at.is_(None)).first()
     
     if not upload:
         raise HTTPException(status_code=404, detail="Запись не найдена")
@@ -700,13 +682,8 @@ def delete_upload(
         )
     
     try:
-        if upload.file_object_name and minio_service:
-            try:
-                minio_service.delete_file(upload.file_object_name)
-            except Exception as minio_err:
-                logger.warning(f"Не удалось удалить файл из MinIO: {minio_err}")
-
-        db.delete(upload)
+        # Файл отчёта и сама строка удаляются фоновым purger'ом
+        upload.deleted_at = datetime.utcnow()
         db.commit()
         return {"message": "Запись успешно удалена"}
     except Exception as e:
@@ -714,14 +691,53 @@ def delete_upload(
         logger.error(f"Error deleting upload {upload_id}: {e}")
         raise HTTPException(status_code=500, detail="Ошибка при удалении записи")
 
+@router.post("/uploads/bulk-delete")
+def bulk_delete_uploads(
+    request: BulkDeleteRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Помечает удалёнными несколько анализов или все анализы пользователя."""
+    if not request.ids and request.user_id is None:
+        raise HTTPException(status_code=400, detail="Укажите ids или user_id")
+    if request.ids and len(request.ids) > BULK_DELETE_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Можно удалить не более {BULK_DELETE_LIMIT} записей за раз")
+    if request.user_id is not None and current_user.role != "admin" and request.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="У вас нет прав на удаление чужих анализов")
+
+    not_found, forbidden = [], []
+    query = db.query(Analysis).filter(Analysis.deleted_at.is_(None))
+    if request.user_id is not None:
+        query = query.filter(Analysis.user_id == request.user_id)
+    if request.ids:
+        ids = list(dict.fromkeys(request.ids))
+        owners = dict(query.filter(Analysis.id.in_(ids)).with_entities(Analysis.id, Analysis.user_id).all())
+        not_found = [i for i in ids if i not in owners]
+        if current_user.role != "admin":
+            forbidden = [i for i, owner in owners.items() if owner != current_user.id]
+        allowed = [i for i in owners if i not in forbidden]
+        query = query.filter(Analysis.id.in_(allowed))
+
+    try:
+        deleted = soft_delete_analyses(db, query)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error bulk deleting uploads: {e}")
+        raise HTTPException(status_code=500, detail="Ошибка при удалении записей")
+
+    return {"deleted": deleted, "notFound": not_found, "forbidden": forbidden}
+
 @router.get("/upload/{upload_id}/download-url")
 def get_file_download_url(
     upload_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Возвращает временную ссылку для скачивания оригинального файла из MinIO."""
-    upload = db.query(Analysis).filter(Analysis.id == upload_id).first()
+    upload = db.query(Analysis).filter(Analysis.id == upload_id, Analysis.deleted_at.is_(None)).first()
 
     if not upload:
         raise HTTPException(status_code=404, detail="Запись не найдена")
@@ -735,139 +751,186 @@ def get_file_download_url(
     if not minio_service:
         raise HTTPException(status_code=503, detail="Сервис хранилища недоступен")
 
+    # Ссылка подписывается началом окна и живёт час, поэтому в пределах
+    # окна она одинакова и остаётся действительной ещё как минимум полчаса
+    window_start, seconds_left = download_url_window()
+    etag = make_etag("download", upload.id, upload.file_object_name, int(window_start.timestamp()))
+    cached = etag_matches(request, etag)
+    record_cache("download_url_etag", cached)
+    if cached:
+        return not_modified(etag, seconds_left)
+
     try:
-        url = minio_service.get_presigned_url(upload.file_object_name, expires_hours=1)
+        url = minio_service.get_presigned_url(upload.file_object_name, expires_hours=1, request_date=window_start)
         base_name = upload.filename.rsplit(".", 1)[0] if "." in upload.filename else upload.filename
         report_filename = f"report_{base_name}.pdf"
+        response.headers.update(cache_headers(etag, seconds_left))
         return {"download_url": url, "filename": report_filename}
     except Exception as e:
         logger.error(f"Ошибка получения ссылки для скачивания: {e}")
         raise HTTPException(status_code=500, detail="Ошибка при получении ссылки для скачивания")
 
-@router.post("/analyze-multiple")
+@router.post("/analyze-multiple", response_model=MultipleAnalysisResponse, response_model_exclude_unset=True)
 async def analyze_multiple_files(
+    request: Request,
     files: list[UploadFile] = File(...),
     work_type: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    slot: AdmissionSlot = Depends(admit_analysis),
+    profiler: Optional[SamplingProfiler] = Depends(profile_request)
 ):
+    uploads = [(file.filename, file.content_type, await file.read()) for file in files]
+    run = partial(analyze_uploads, uploads, work_type, current_user, profiler)
+    if wants_event_stream(request):
+        return event_stream(run, MultipleAnalysisResponse, profiler, slot)
+    return await run_in_threadpool(run_profiled, profiler, run, db)
+
+def analyze_uploads(uploads: list[tuple], work_type: str, current_user: User, profiler: Optional[SamplingProfiler], db: Session) -> dict:
     try:
-        logger.info(f"User {current_user.id} is analyzing {len(files)} files")
+        logger.info(f"User {current_user.id} is analyzing {len(uploads)} files")
 
-        if not files:
+        if not uploads:
             raise HTTPException(status_code=400, detail="Файлы не указаны")
 
+        report("uploaded", files=len(uploads), size=sum(len(content) for _, _, content in uploads))
         results = []
         analysis_records = []
+        signatures = []
+
+        for i, (filename, content_type, file_content) in enumerate(uploads):
+            report("file", i, len(uploads), fileName=filename)
+            with span("file", filename=filename or ""):
+                file_content_type = content_type or ""
+                text_content = ""
+
+                if file_content_type == 'application/pdf' or filename.lower().endswith('.pdf'):
+                    text_content = extract_text_from_pdf(file_content)
+                elif file_content_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document','application/msword'] or filename.lower().endswith(('.doc', '.docx')):
+                    text_content = extract_text_from_docx(file_content)
+                elif file_content_type == 'text/plain' or filename.lower().endswith('.txt'):
+                    text_content = extract_text_from_txt(file_content)
+                elif file_content_type.startswith('image/') or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff')):
+                    text_content = extract_text_from_image(file_content)
+                else:
+                    continue
 
-        for file in files:
-            file_content = await file.read()
-            filename = file.filename
-            file_content_type = file.content_type or ""
-            text_content = ""
-
-            if file_content_type == 'application/pdf' or filename.lower().endswith('.pdf'):
-                text_content = extract_text_from_pdf(file_content)
-            elif file_content_type in ['application/vnd.openxmlformats-officedocument.wordprocessingml.document','application/msword'] or filename.lower().endswith(('.doc', '.docx')):
-                text_content = extract_text_from_docx(file_content)
-            elif file_content_type == 'text/plain' or filename.lower().endswith('.txt'):
-                text_content = extract_text_from_txt(file_content)
-            elif file_content_type.startswith('image/') or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff')):
-                text_content = extract_text_from_image(file_content)
-            else:
-                continue
-
-            if not text_content.strip():
-                analysis_result = {
-                    'fileName': filename,
-                    'score': 0,
-                    'status': 'empty_file',
-                    'isValid': False,
-                    'workType': 'Не определен',
-                    'fileType': 'empty',
-                    'detectedType': 'unknown',
-                    'sectionsFound': [],
-                    'sectionsMissing': [],
-                    'errors': ['Не удалось извлечь текст из файла'],
-                    'warnings': [],
-                    'recommendations': ['Файл должен содержать текст'],
-                    'structureDetails': {
-                        'totalSectionsChecked': 0,
-                        'requiredSectionsFound': 0,
-                        'totalRequiredSections': 0,
-                        'contentLength': 0,
-                        'detectionConfidence': 'low'
+                if not text_content.strip():
+                    analysis_result = {
+                        'fileName': filename,
+                        'score': 0,
+                        'status': 'empty_file',
+                        'isValid': False,
+                        'workType': 'Не определен',
+                        'fileType': 'empty',
+                        'detectedType': 'unknown',
+                        'sectionsFound': [],
+                        'sectionsMissing': [],
+                        'errors': ['Не удалось извлечь текст из файла'],
+                        'warnings': [],
+                        'recommendations': ['Файл должен содержать текст'],
+                        'structureDetails': {
+                            'totalSectionsChecked': 0,
+                            'requiredSectionsFound': 0,
+                            'totalRequiredSections': 0,
+                            'contentLength': 0,
+                            'detectionConfidence': 'low'
+                        }
                     }
-                }
-            else:
-                analysis_result = analyze_work_structure(text_content, filename, work_type)
-
-            score = analysis_result.get('score', 0)
-            analysis_record = Analysis(
-                user_id=current_user.id,
-                filename=filename,
-                score=score,
-                full_result=analysis_result
-            )
-            db.add(analysis_record)
-            analysis_records.append(analysis_record)
-            results.append(analysis_result)
+                    record_analysis_error(analysis_result['status'])
+                    signature = None
+                else:
+                    analysis_result = analyze_work_structure(text_content, filename, work_type)
+                    signature = find_similar_documents(db, analysis_result, text_content, current_user.id)
 
+                score = analysis_result.get('score', 0)
+                analysis_record = Analysis(
+                    user_id=current_user.id,
+                    filename=filename,
+                    score=score,
+                    full_result=compact_result(analysis_result),
+                    extracted_text=text_content
+                )
+                db.add(analysis_record)
+                analysis_records.append(analysis_record)
+                signatures.append(signature)
+                results.append(analysis_result)
+
+        # Подписи попадают в индекс, когда у записей появились id
+        db.flush()
+        for analysis_record, signature in zip(analysis_records, signatures):
+            index_signature(db, analysis_record.id, signature)
         db.commit()
+        if analysis_records:
+            attach_analysis(profiler, analysis_records[0].id)
+        report("stored", analysisIds=[analysis_record.id for analysis_record in analysis_records])
 
         return {
-            "totalFiles": len(files),
+            "totalFiles": len(uploads),
             "processedFiles": len(results),
             "results": results
         }
 
     except Exception as e:
         db.rollback()
+        record_analysis_error('exception')
         logger.error(f"Error analyzing multiple files: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка при анализе файлов: {str(e)}")
 
-@router.post("/analyze-screenshots")
+@router.post("/analyze-screenshots", response_model=AnalysisResult, response_model_exclude_unset=True)
 async def analyze_screenshots(
+    request: Request,
     files: list[UploadFile] = File(...),
     work_type: str = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    slot: AdmissionSlot = Depends(admit_analysis),
+    profiler: Optional[SamplingProfiler] = Depends(profile_request)
 ):
+    uploads = [(file.filename, file.content_type, await file.read()) for file in files]
+    run = partial(analyze_screenshot_uploads, uploads, work_type, current_user, profiler)
+    if wants_event_stream(request):
+        return event_stream(run, AnalysisResult, profiler, slot)
+    return await run_in_threadpool(run_profiled, profiler, run, db)
+
+def analyze_screenshot_uploads(uploads: list[tuple], work_type: str, current_user: User, profiler: Optional[SamplingProfiler], db: Session) -> dict:
+    """Скриншоты uploads — список (filename, content_type, content) — как один документ."""
     try:
-        logger.info(f"User {current_user.id} is analyzing {len(files)} screenshots as combined document")
+        logger.info(f"User {current_user.id} is analyzing {len(uploads)} screenshots as combined document")
 
-        if not files:
+        if not uploads:
             raise HTTPException(status_code=400, detail="Скриншоты не указаны")
 
+        report("uploaded", files=len(uploads), size=sum(len(content) for _, _, content in uploads))
         combined_text = ""
         valid_files = []
         invalid_files = []
 
-        for file in files:
-            try:
-                content = await file.read()
-                filename = file.filename
-                
-                if not (file.content_type.startswith('image/') or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff'))):
+        for i, (filename, content_type, content) in enumerate(uploads):
+            report("ocr", i, len(uploads), fileName=filename)
+            with span("file", filename=filename or ""):
+                try:
+                    if not (content_type.startswith('image/') or filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff'))):
+                        invalid_files.append(filename)
+                        continue
+
+                    text_content = extract_text_from_image(content)
+
+                    if text_content.strip():
+                        combined_text += f"\n\n{text_content}"
+                        valid_files.append(filename)
+                        logger.info(f"Extracted {len(text_content)} chars from {filename}")
+                    else:
+                        invalid_files.append(filename)
+                        logger.warning(f"No text found in {filename}")
+
+                except Exception as e:
+                    logger.error(f"Error processing screenshot {filename}: {str(e)}")
                     invalid_files.append(filename)
                     continue
 
-                text_content = extract_text_from_image(content)
-                
-                if text_content.strip():
-                    combined_text += f"\n\n{text_content}"
-                    valid_files.append(filename)
-                    logger.info(f"Extracted {len(text_content)} chars from {filename}")
-                else:
-                    invalid_files.append(filename)
-                    logger.warning(f"No text found in {filename}")
-
-            except Exception as e:
-                logger.error(f"Error processing screenshot {file.filename}: {str(e)}")
-                invalid_files.append(file.filename)
-                continue
-
         if not combined_text.strip():
+            record_analysis_error('no_text_in_screenshots')
             raise HTTPException(
                 status_code=400, 
                 detail="Не удалось распознать текст ни на одном из скриншотов. Убедитесь, что скриншоты содержат четкий текст."
@@ -875,10 +938,11 @@ async def analyze_screenshots(
 
         main_filename = valid_files[0] if valid_files else "combined_screenshots"
         
+        report("analysing")
         analysis_result = analyze_work_structure(combined_text, main_filename, work_type)
         
         analysis_result['fileDetails'] = {
-            'totalScreenshots': len(files),
+            'totalScreenshots': len(uploads),
             'validScreenshots': len(valid_files),
             'invalidScreenshots': len(invalid_files),
             'validFiles': valid_files,
@@ -886,17 +950,23 @@ async def analyze_screenshots(
             'combinedTextLength': len(combined_text)
         }
 
+        signature = find_similar_documents(db, analysis_result, combined_text, current_user.id)
         score = analysis_result.get('score', 0)
         analysis_record = Analysis(
             user_id=current_user.id,
-            filename=f"combined_screenshots_{len(files)}_files",
+            filename=f"combined_screenshots_{len(uploads)}_files",
             score=score,
-            full_result=analysis_result
+            full_result=compact_result(analysis_result),
+            extracted_text=combined_text
         )
 
         db.add(analysis_record)
+        db.flush()
+        index_signature(db, analysis_record.id, signature)
         db.commit()
         db.refresh(analysis_record)
+        attach_analysis(profiler, analysis_record.id)
+        report("stored", analysisId=analysis_record.id)
 
         return analysis_result
 
@@ -905,8 +975,18 @@ async def analyze_screenshots(
         logger.error(f"Error analyzing screenshots: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
+        record_analysis_error('exception')
         raise HTTPException(status_code=500, detail=f"Ошибка при анализе скриншотов: {str(e)}")
 
+def filter_analyses(query, search: str = None, min_score: int = None, max_score: int = None, user_id: int = None):
+    """Фильтры списка анализов, общие для админских эндпоинтов."""
+    query = query.filter(Analysis.deleted_at.is_(None))
+    if search: query = query.filter(Analysis.filename.ilike(f"%{search}%"))
+    if min_score is not None: query = query.filter(Analysis.score >= min_score)
+    if max_score is not None: query = query.filter(Analysis.score <= max_score)
+    if user_id is not None: query = query.filter(Analysis.user_id == user_id)
+    return query
+
 @router.get("/all-analyses")
 def get_all_analyses(
     page: int = 1,
@@ -926,14 +1006,13 @@ def get_all_analyses(
     if sort_order not in ["asc", "desc"]: sort_order = "desc"
     
     offset = (page - 1) * limit
-    query = db.query(Analysis)
-    
-    if search: query = query.filter(Analysis.filename.ilike(f"%{search}%"))
-    if min_score is not None: query = query.filter(Analysis.score >= min_score)
-    if max_score is not None: query = query.filter(Analysis.score <= max_score)
-    if user_id is not None: query = query.filter(Analysis.user_id == user_id)
+    query = db.query(Analysis).options(
+        load_only(Analysis.id, Analysis.user_id, Analysis.filename, Analysis.score, Analysis.created_at)
+    )
+    query = filter_analyses(query, search, min_score, max_score, user_id)
     
-    total = query.count()
+    # query.count() оборачивает запрос со всеми колонками модели в подзапрос
+    total = query.with_entities(func.count(Analysis.id)).scalar()
     
     sort_column = getattr(Analysis, sort_by)
     query = query.order_by(sort_column.desc() if sort_order == "desc" else sort_column.asc())
@@ -6,6 +6,7 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional
 from .security import require_role
 from .dependencies import get_current_user
+from .purger import soft_delete_user_analyses
 import re
 from .config import (
     JWT_SECRET_KEY, 
@@ -232,6 +233,7 @@ def update_profile(
 
 @router.delete("/profile")
 def delete_profile(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    soft_delete_user_analyses(db, current_user.id)
     db.delete(current_user)
     db.commit()
     
@@ -279,6 +281,7 @@ def delete_any_user(
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
+    soft_delete_user_analyses(db, user.id)
     db.delete(user)
     db.commit()
     return {"message": "Пользователь успешно удален"}
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""Синтетический корпус учебных работ для бенчмарков.
+
+Документы генерируются детерминированно (фиксированный seed), размеры
+близки к реальным: лабораторная — несколько страниц, диплом — десятки.
+"""
+import os
+import random
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+
+# Примерный объём текста в символах для каждого типа работы
+WORK_SIZES = {
+    'lab_report': 6_000,
+    'essay': 12_000,
+    'course_work': 35_000,
+    'thesis': 90_000,
+}
+
+HEADINGS = {
+    'lab_report': ['Лабораторная работа № 3', 'Цель работы', 'Задание', 'Теоретическая часть', 'Ход работы', 'Расчеты', 'Вывод'],
+    'essay': ['Реферат', 'Введение', 'Основная часть', 'Заключение', 'Список литературы'],
+    'course_work': ['Курсовая работа', 'Содержание', 'Введение', 'Глава 1. Теоретическая часть', 'Глава 2. Практическая часть', 'Заключение', 'Список литературы', 'Приложение А'],
+    'thesis': ['Дипломная работа', 'Аннотация', 'Содержание', 'Введение', 'Глава 1', 'Глава 2', 'Глава 3', 'Глава 4', 'Заключение', 'Список литературы', 'Приложение А'],
+}
+
+WORDS = (
+    "анализ метод система данные результат исследование модель процесс "
+    "значение таблица рисунок расчет эксперимент структура алгоритм оценка "
+    "параметр требование измерение точность погрешность функция method data "
+    "result model analysis"
+).split()
+
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial.ttf",
+]
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+    sentence = " ".join(words).capitalize()
+    if rng.random() < 0.15:
+        sentence += f" (см. рис. {rng.randint(1, 9)}.{rng.randint(1, 9)})"
+    if rng.random() < 0.1:
+        sentence += f" [{rng.randint(1, 40)}]"
+    return sentence + "."
+
+def generate_paragraphs(work_type: str, seed: int = 0) -> list[str]:
+    """Список абзацев: заголовки разделов, между ними обычный текст."""
+    rng = random.Random(f"{work_type}-{seed}")
+    target = WORK_SIZES[work_type]
+    headings = HEADINGS[work_type]
+    per_section = target // len(headings)
+
+    paragraphs = []
+    for heading in headings:
+        paragraphs.append(heading)
+        size = 0
+        step = 1
+        while size < per_section:
+            text = f"{step}. " + " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+            paragraphs.append(text)
+            size += len(text)
+            step += 1
+    return paragraphs
+
+def make_txt(paragraphs: list[str]) -> bytes:
+    return "\n".join(paragraphs).encode("utf-8")
+
+def make_docx(paragraphs: list[str]) -> bytes:
+    import docx
+    document = docx.Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def _font_path():
+    return next((p for p in FONT_PATHS if os.path.exists(p)), None)
+
+def make_pdf(paragraphs: list[str]) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    font_name = "Helvetica"
+    path = _font_path()
+    if path:
+        pdfmetrics.registerFont(TTFont("BenchSans", path))
+        font_name = "BenchSans"
+
+    buffer = BytesIO()
+    style = ParagraphStyle("Body", fontName=font_name, fontSize=11, leading=15)
+    SimpleDocTemplate(buffer, pagesize=A4).build([Paragraph(p, style) for p in paragraphs])
+    return buffer.getvalue()
+
+def make_png(paragraphs: list[str], width: int = 1280, lines: int = 40) -> bytes:
+    """Скриншот страницы: первые строки текста, отрисованные на белом фоне."""
+    path = _font_path()
+    font = ImageFont.truetype(path, 18) if path else ImageFont.load_default()
+    line_height = 26
+    image = Image.new("RGB", (width, lines * line_height + 40), "white")
+    draw = ImageDraw.Draw(image)
+
+    y = 20
+    text_lines = []
+    for paragraph in paragraphs:
+        while paragraph and len(text_lines) < lines:
+            text_lines.append(paragraph[:110])
+            paragraph = paragraph[110:]
+        if len(text_lines) >= lines:
+            break
+    for line in text_lines:
+        draw.text((20, y), line, fill="black", font=font)
+        y += line_height
+
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+FORMATS = {
+    'txt': make_txt,
+    'docx': make_docx,
+    'pdf': make_pdf,
+    'png': make_png,
+}
+
+def build_corpus(seed: int = 0) -> dict:
+    """Возвращает {work_type: {'text': str, 'txt': bytes, 'docx': ..., 'pdf': ..., 'png': ...}}."""
+    corpus = {}
+    for work_type in WORK_SIZES:
+        paragraphs = generate_paragraphs(work_type, seed)
+        documents = {'text': "\n".join(paragraphs)}
+        for fmt, maker in FORMATS.items():
+            documents[fmt] = maker(paragraphs)
+        corpus[work_type] = documents
+    return corpus
@@ -0,0 +1,76 @@
+"""Сравнение PDF-бэкендов на синтетическом корпусе: скорость и точность.
+
+Точность считается двумя способами: F1 по мешку слов относительно
+исходного текста и доля разделов шаблона, найденных так же, как в
+исходном тексте (плюс разница итоговой оценки).
+
+    python -m backend.benchmarks.pdf_backends --repeat 10 --save pdf.json
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+from collections import Counter
+from .corpus import build_corpus
+from .pipeline import measure
+from .. import analyze
+from ..pdf_backends import PDF_BACKENDS
+
+WORD = re.compile(r"\w+")
+
+def word_f1(extracted: str, reference: str) -> float:
+    got = Counter(WORD.findall(extracted.lower()))
+    expected = Counter(WORD.findall(reference.lower()))
+    common = sum((got & expected).values())
+    if not common:
+        return 0.0
+    precision = common / sum(got.values())
+    recall = common / sum(expected.values())
+    return 2 * precision * recall / (precision + recall)
+
+def section_agreement(extracted: str, reference: str, work_type: str) -> tuple[float, int]:
+    got = analyze.analyze_work_structure(extracted, "document.pdf", work_type)
+    expected = analyze.analyze_work_structure(reference, "document.pdf", work_type)
+    pairs = list(zip(got['sectionsFound'], expected['sectionsFound']))
+    same = sum(1 for a, b in pairs if a['found'] == b['found'])
+    return same / len(pairs) if pairs else 1.0, got['score'] - expected['score']
+
+def run(repeat: int, seed: int = 0) -> dict:
+    corpus = build_corpus(seed)
+    results = {}
+    for name, backend in PDF_BACKENDS.items():
+        if not backend.available():
+            print(f"{name:10s} не установлен, пропущен", file=sys.stderr)
+            continue
+        for work_type, docs in corpus.items():
+            pdf = docs['pdf']
+            stats = measure(lambda b=backend, d=pdf: b.extract(d), len(pdf), repeat)
+            extracted = backend.extract(pdf)
+            agreement, score_delta = section_agreement(extracted, docs['text'], work_type)
+            stats.update({
+                "word_f1": round(word_f1(extracted, docs['text']), 4),
+                "section_agreement": round(agreement, 3),
+                "score_delta": score_delta,
+            })
+            results[f"{name}/{work_type}"] = stats
+            print(f"{name + '/' + work_type:25s} p50={stats['p50_ms']:>9.2f} ms  peak={stats['peak_kb']:>9.1f} KiB  "
+                  f"F1={stats['word_f1']:.3f}  sections={stats['section_agreement']:.2f}  "
+                  f"score{score_delta:+d}", file=sys.stderr)
+    return {"repeat": repeat, "seed": seed, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение бэкендов извлечения текста из PDF")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    report = run(args.repeat, args.seed)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Бенчмарк этапов анализа: извлечение текста, определение типа, анализ,
+OCR и генерация PDF-отчёта.
+
+Для каждого этапа и каждого типа работы считаются p50/p99, пропускная
+способность и пиковая память (tracemalloc). Результат можно сохранить
+как базовую линию и сравнить с ней на другом коммите:
+
+    python -m backend.benchmarks.pipeline --save baseline.json
+    python -m backend.benchmarks.pipeline --compare baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from .corpus import build_corpus
+from .. import analyze, similarity
+from ..ocr_service import ocr_service
+
+def _tesseract_available() -> bool:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    index = min(len(sorted_samples) - 1, max(0, round(q * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+def measure(fn, payload_size: int, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+
+    # Память меряется отдельным прогоном: tracemalloc сильно искажает время
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean = sum(samples) / len(samples)
+    return {
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(mean * 1000, 3),
+        "ops_per_s": round(1 / mean, 2) if mean else None,
+        "mb_per_s": round(payload_size / mean / 1e6, 2) if mean else None,
+        "peak_kb": round(peak / 1024, 1),
+        "payload_bytes": payload_size,
+    }
+
+def build_stages(corpus: dict, with_ocr: bool) -> dict:
+    """Имя этапа -> (функция, размер входных данных)."""
+    stages = {}
+    for work_type, docs in corpus.items():
+        text = docs['text']
+        analysis = analyze.analyze_work_structure(text, f"{work_type}.txt")
+        stages[f"extract_txt/{work_type}"] = (lambda d=docs['txt']: analyze.extract_text_from_txt(d), len(docs['txt']))
+        stages[f"extract_docx/{work_type}"] = (lambda d=docs['docx']: analyze.extract_text_from_docx(d), len(docs['docx']))
+        stages[f"extract_docx_model/{work_type}"] = (lambda d=docs['docx']: analyze.extract_text_from_docx_model(d), len(docs['docx']))
+        stages[f"extract_pdf/{work_type}"] = (lambda d=docs['pdf']: analyze.extract_text_from_pdf(d), len(docs['pdf']))
+        if with_ocr:
+            stages[f"extract_image/{work_type}"] = (lambda d=docs['png']: analyze.extract_text_from_image(d), len(docs['png']))
+            stages[f"ocr_recognize/{work_type}"] = (lambda d=docs['png']: ocr_service.recognize_text(d), len(docs['png']))
+        stages[f"detect_work_type/{work_type}"] = (lambda t=text: analyze.detect_work_type("document.txt", t), len(text.encode("utf-8")))
+        stages[f"analyze_work_structure/{work_type}"] = (lambda t=text: analyze.analyze_work_structure(t, "document.txt"), len(text.encode("utf-8")))
+        stages[f"similarity_signature/{work_type}"] = (lambda t=text: similarity.compute_signature(t), len(text.encode("utf-8")))
+        stages[f"generate_report_pdf/{work_type}"] = (lambda a=analysis: analyze.generate_report_pdf(a, "Иван Иванов"), 0)
+    return stages
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def run(repeat: int, stage_filter: str = None, seed: int = 0) -> dict:
+    with_ocr = _tesseract_available()
+    corpus = build_corpus(seed)
+    results = {}
+    for name, (fn, size) in build_stages(corpus, with_ocr).items():
+        if stage_filter and stage_filter not in name:
+            continue
+        # OCR на порядки медленнее остальных этапов
+        stage_repeat = max(3, repeat // 10) if name.startswith(("ocr_", "extract_image")) else repeat
+        results[name] = measure(fn, size, stage_repeat)
+        print(f"{name:45s} p50={results[name]['p50_ms']:>10.3f} ms  p99={results[name]['p99_ms']:>10.3f} ms  "
+              f"peak={results[name]['peak_kb']:>10.1f} KiB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "seed": seed,
+            "ocr": with_ocr,
+        },
+        "results": results,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Возвращает список этапов, p50 которых вырос больше чем на threshold."""
+    regressions = []
+    for name, stats in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["p50_ms"]:
+            continue
+        change = stats["p50_ms"] / base["p50_ms"] - 1
+        marker = ""
+        if change > threshold:
+            marker = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:45s} {base['p50_ms']:>10.3f} -> {stats['p50_ms']:>10.3f} ms  ({change:+.1%}){marker}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк этапов анализа учебных работ")
+    parser.add_argument("--repeat", type=int, default=20, help="число замеров на этап")
+    parser.add_argument("--stage", help="запускать только этапы, содержащие подстроку")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="сохранить результат в JSON")
+    parser.add_argument("--compare", help="сравнить с сохранённой базовой линией")
+    parser.add_argument("--threshold", type=float, default=0.15, help="допустимый рост p50 (доля)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    report = run(args.repeat, args.stage, args.seed)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+    elif not args.save:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
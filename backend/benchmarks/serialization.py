@@ -0,0 +1,70 @@
+"""Бенчмарк сериализации результата анализа и размера ответа.
+
+Сравнивает прежний путь FastAPI (jsonable_encoder + json) с типизированной
+моделью и orjson, а также размер тела без сжатия, с gzip и brotli.
+
+    python -m backend.benchmarks.serialization [--repeat 2000]
+"""
+import argparse
+import gzip
+import json
+import time
+import orjson
+from fastapi.encoders import jsonable_encoder
+from ..analyze import analyze_work_structure
+from ..compression import brotli
+from ..schemas import AnalysisResult, MultipleAnalysisResponse
+
+THESIS_PARAGRAPH = (
+    "Глава {n}. Исследование методов анализа структуры учебных работ. "
+    "В данной главе рассматриваются подходы к автоматической проверке, "
+    "приводятся расчеты (см. рис. {n}.1 и таблица {n}.2) и ссылки [{n}]. "
+)
+
+def build_thesis_text(chars: int = 120_000) -> str:
+    parts = ["Дипломная работа\nАннотация\nСодержание\nВведение\n"]
+    n = 1
+    while sum(len(p) for p in parts) < chars:
+        parts.append(THESIS_PARAGRAPH.format(n=n % 4 + 1))
+        n += 1
+    parts.append("\nЗаключение\nСписок литературы\nПриложение\n")
+    return "".join(parts)
+
+def _time(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def run(repeat: int) -> dict:
+    single = analyze_work_structure(build_thesis_text(), "thesis.pdf")
+    multiple = {"totalFiles": 20, "processedFiles": 20, "results": [single] * 20}
+    report = {}
+
+    for name, payload, model in (("thesis", single, AnalysisResult), ("multiple_20", multiple, MultipleAnalysisResponse)):
+        def baseline():
+            return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        def typed():
+            value = model.model_validate(payload)
+            return orjson.dumps(value.model_dump(mode="json", exclude_unset=True))
+
+        body = typed()
+        sizes = {"identity": len(body), "gzip": len(gzip.compress(body, 6))}
+        if brotli is not None:
+            sizes["br"] = len(brotli.compress(body, quality=5))
+        report[name] = {
+            "baseline_us": round(_time(baseline, repeat), 1),
+            "typed_orjson_us": round(_time(typed, repeat), 1),
+            "bytes": sizes,
+        }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
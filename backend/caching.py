@@ -0,0 +1,46 @@
+"""ETag и Cache-Control для неизменяемых ресурсов анализа."""
+import hashlib
+from datetime import datetime, timezone
+from fastapi import Request, Response
+
+# Увеличивается, когда меняется формат ответа API, чтобы сбросить кэши клиентов
+RESPONSE_VERSION = 1
+DETAILS_MAX_AGE = 3600
+DOWNLOAD_URL_WINDOW = 1800
+
+def make_etag(*parts) -> str:
+    """Строгий ETag из частей идентификатора ресурса."""
+    raw = "-".join(str(p) for p in (RESPONSE_VERSION, *parts))
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверяет If-None-Match (слабое сравнение, как требует RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def cache_headers(etag: str, max_age: int) -> dict:
+    # Vary: Authorization — чтобы кэш браузера не отдал ответ другому пользователю
+    return {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "Authorization",
+    }
+
+def not_modified(etag: str, max_age: int) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, max_age))
+
+def download_url_window(now: datetime = None) -> tuple[datetime, int]:
+    """Начало текущего окна подписи ссылок и число секунд до его конца.
+
+    Внутри окна presigned URL подписывается одной и той же датой, поэтому
+    ссылка не меняется и её можно кэшировать.
+    """
+    now = now or datetime.now(timezone.utc)
+    timestamp = int(now.timestamp())
+    start = timestamp - timestamp % DOWNLOAD_URL_WINDOW
+    return datetime.fromtimestamp(start, timezone.utc), start + DOWNLOAD_URL_WINDOW - timestamp
@@ -0,0 +1,128 @@
+"""Сжатие ответов gzip/brotli с выбором по заголовку Accept-Encoding."""
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Уже сжатые форматы и потоки событий не сжимаются повторно
+SKIP_CONTENT_TYPES = ("application/gzip", "application/pdf", "application/zip", "image/", "text/event-stream")
+
+class _GzipCompressor:
+    def __init__(self, level: int = 6):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+class _BrotliCompressor:
+    def __init__(self, quality: int = 5):
+        self._obj = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+COMPRESSORS = {"gzip": _GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = _BrotliCompressor
+
+def negotiate_encoding(accept_encoding: str):
+    """Выбирает br или gzip с учётом q-значений клиента."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token] = quality
+    candidates = [e for e in ("br", "gzip") if e in COMPRESSORS and accepted.get(e, 0) > 0]
+    return max(candidates, key=lambda e: accepted[e]) if candidates else None
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(self.app, encoding, self.minimum_size)
+        await responder(scope, receive, send)
+
+class _CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.initial_message = None
+        self.started = False
+        self.skip = False
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Заголовки отправляются вместе с первым куском тела
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.skip = "content-encoding" in headers or content_type.startswith(SKIP_CONTENT_TYPES)
+            return
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.started:
+            if self.compressor is None:
+                await self.send(message)
+                return
+            data = self.compressor.compress(body)
+            if not more_body:
+                data += self.compressor.finish()
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+            return
+
+        self.started = True
+        if self.skip or (not more_body and len(body) < self.minimum_size):
+            await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        self.compressor = COMPRESSORS[self.encoding]()
+        data = self.compressor.compress(body)
+        if more_body:
+            del headers["Content-Length"]
+        else:
+            data += self.compressor.finish()
+            headers["Content-Length"] = str(len(data))
+        await self.send(self.initial_message)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
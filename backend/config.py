@@ -15,6 +15,63 @@ MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY",)
 MINIO_BUCKET = os.getenv("MINIO_BUCKET", "study-reports")
 MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
+# minio — настоящий MinIO/S3, memory — хранилище в памяти для локальных и нагрузочных прогонов
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "minio")
+
+PURGE_INTERVAL_SECONDS = int(os.getenv("PURGE_INTERVAL_SECONDS", 60))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 500))
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+
+# Если задан, /api/metrics требует заголовок Authorization: Bearer <METRICS_TOKEN>
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Доля запросов анализа, которые профилируются сэмплирующим профилировщиком (0 — выключено)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", 120))
+
+# none — трассировка выключена, file — спаны в TRACE_FILE, otlp — в OTLP/HTTP коллектор
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.05))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "study-report")
+
+# Контроль допуска для /api/analyze*: лимиты одновременных анализов и очередь ожидания
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", os.cpu_count() or 2))
+ADMISSION_USER_MAX_CONCURRENT = int(os.getenv("ADMISSION_USER_MAX_CONCURRENT", 2))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 32))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", 15))
+
+# auto — лучший из установленных, либо pdftotext, pypdf2, pypdf, pdfminer
+PDF_BACKEND = os.getenv("PDF_BACKEND", "auto")
+
+# OCR страниц PDF без текстового слоя; OCR_PDF_MAX_PAGES=0 выключает распознавание
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", 300))
+OCR_PDF_MAX_PAGES = int(os.getenv("OCR_PDF_MAX_PAGES", 50))
+OCR_PDF_TIME_BUDGET_SECONDS = float(os.getenv("OCR_PDF_TIME_BUDGET_SECONDS", 120))
+OCR_PDF_WORKERS = int(os.getenv("OCR_PDF_WORKERS", os.cpu_count() or 2))
+
+# Как часто воркер проверяет в БД, не вышла ли новая версия шаблонов
+TEMPLATE_REFRESH_SECONDS = float(os.getenv("TEMPLATE_REFRESH_SECONDS", 5))
+
+# Пакетный пересчёт оценок (python -m backend.rescore)
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", 200))
+RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", os.cpu_count() or 2))
+
+# Поиск почти одинаковых работ: минимальное сходство (доля общих шинглов) и число работ в результате
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.8))
+SIMILARITY_TOP_N = int(os.getenv("SIMILARITY_TOP_N", 5))
+
+# Ход анализа (Accept: text/event-stream): минимальный интервал между событиями одного этапа и пинг молчащего потока
+PROGRESS_MIN_INTERVAL_MS = int(os.getenv("PROGRESS_MIN_INTERVAL_MS", 100))
+PROGRESS_HEARTBEAT_SECONDS = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", 15))
+
+# Загрузка файлов из браузера прямо в хранилище частями (presigned multipart)
+UPLOAD_PART_SIZE_MB = int(os.getenv("UPLOAD_PART_SIZE_MB", 8))
+UPLOAD_MAX_SIZE_MB = int(os.getenv("UPLOAD_MAX_SIZE_MB", 200))
+UPLOAD_SESSION_HOURS = int(os.getenv("UPLOAD_SESSION_HOURS", 24))
 
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL не задан в .env")
\ No newline at end of file
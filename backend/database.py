@@ -1,16 +1,59 @@
-from sqlalchemy import create_engine, Column, Integer, String, JSON, ForeignKey, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy import create_engine, event, Column, Integer, SmallInteger, BigInteger, String, JSON, ForeignKey, DateTime, Date, Text, LargeBinary, Computed, Index, text
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship, deferred
 from datetime import datetime
 from .config import DATABASE_URL
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.pool import QueuePool
+from .metrics import DB_POOL_WAIT_SECONDS, DB_QUERY_SECONDS
+from .tracing import start_span, end_span
 import logging
+import time
 
 logger = logging.getLogger("database")
 
-engine = create_engine(DATABASE_URL)
+class TimedQueuePool(QueuePool):
+    """QueuePool, который замеряет ожидание свободного соединения."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool)
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    span = start_span("db.query", **{"db.statement": statement[:500]})
+    conn.info.setdefault("query_start", []).append((time.perf_counter(), span))
+
+@event.listens_for(engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    start, span = conn.info["query_start"].pop()
+    DB_QUERY_SECONDS.observe(time.perf_counter() - start)
+    end_span(span)
+
+@event.listens_for(engine, "handle_error")
+def _drop_query_timer(context):
+    # after_cursor_execute не вызывается для упавшего запроса
+    stack = context.connection.info.get("query_start") if context.connection is not None else None
+    if stack:
+        _, span = stack.pop()
+        if span is not None:
+            span.error = str(context.original_exception)
+        end_span(span)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('russian', coalesce(filename, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(filename, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(extracted_text, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(extracted_text, '')), 'B')"
+)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -25,19 +68,217 @@ class User(Base):
 
 class Analysis(Base):
     __tablename__ = "analyses"
+    __table_args__ = (
+        Index("ix_analyses_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     filename = Column(String, nullable=False)
     score = Column(Integer, default=0)
     user = relationship("User", back_populates="analyses")
-    full_result = Column(JSONB, nullable=True)
+    # Тяжёлые колонки не загружаются, пока к ним явно не обратились
+    full_result = deferred(Column(JSONB, nullable=True))
     file_object_name = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    extracted_text = deferred(Column(Text, nullable=True))
+    # Увеличивается при каждой перезаписи full_result, входит в ETag
+    result_version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Мягкое удаление: строку и файл отчёта позже удаляет фоновый purger
+    deleted_at = Column(DateTime, nullable=True, index=True)
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True)))
+
+class AnalysisDailyStats(Base):
+    """Дневные агрегаты по анализам, поддерживаются триггером на таблице analyses."""
+    __tablename__ = "analysis_daily_stats"
+    __table_args__ = (
+        Index("ix_analysis_daily_stats_user_day", "user_id", "day"),
+    )
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+    detected_type = Column(String, primary_key=True)
+    score_bucket = Column(SmallInteger, primary_key=True)
+    analyses_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(BigInteger, nullable=False, default=0)
+
+class RequestProfile(Base):
+    """Профиль запроса, снятый сэмплирующим профилировщиком (folded stacks)."""
+    __tablename__ = "request_profiles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey("analyses.id", ondelete="CASCADE"), nullable=True, index=True)
+    user_id = Column(Integer, nullable=True)
+    path = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    duration_ms = Column(Integer, nullable=False)
+    interval_ms = Column(Integer, nullable=False)
+    samples = Column(Integer, nullable=False)
+    folded = deferred(Column(Text, nullable=False))
+
+class WorkTemplate(Base):
+    """Шаблон типа работы в одной версии набора шаблонов.
+
+    Любое изменение создаёт новую версию, в которую копируются все
+    шаблоны; строки старых версий не меняются.
+    """
+    __tablename__ = "work_templates"
+
+    version = Column(Integer, primary_key=True)
+    work_type = Column(String(32), primary_key=True)
+    definition = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    created_by = Column(Integer, nullable=True)
+
+class UploadSession(Base):
+    """Загрузка файла из браузера прямо в хранилище частями (см. uploads).
+
+    Статусы: pending — части загружаются, finalizing — идёт сборка и анализ,
+    completed — объект собран, но анализ не завершился, analyzed — готово.
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    object_name = Column(String, nullable=False)
+    upload_id = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    status = Column(String(16), nullable=False, default="pending")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class DocumentSignature(Base):
+    """MinHash-подпись извлечённого текста анализа (см. similarity)."""
+    __tablename__ = "document_signatures"
+
+    analysis_id = Column(Integer, ForeignKey("analyses.id", ondelete="CASCADE"), primary_key=True)
+    signature = Column(LargeBinary, nullable=False)
+
+class LshBucket(Base):
+    """LSH-индекс подписей: хеш каждой полосы подписи."""
+    __tablename__ = "lsh_buckets"
+
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    analysis_id = Column(Integer, ForeignKey("analyses.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+class RescoreJob(Base):
+    """Пакетный пересчёт оценок; last_id позволяет продолжить прерванную задачу."""
+    __tablename__ = "rescore_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="running")
+    template_version = Column(Integer, nullable=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    created_by = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+
+ANALYSIS_STATS_TRIGGER = """
+CREATE OR REPLACE FUNCTION analysis_stats_apply(p_created timestamp, p_user integer, p_result jsonb, p_score integer, p_delta integer)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO analysis_daily_stats AS s (day, user_id, detected_type, score_bucket, analyses_count, score_sum)
+    VALUES (
+        COALESCE(p_created, now())::date,
+        COALESCE(p_user, 0),
+        COALESCE(p_result->>'detectedType', 'unknown'),
+        LEAST(GREATEST(COALESCE(p_score, 0), 0) / 10, 9),
+        p_delta,
+        p_delta * COALESCE(p_score, 0)
+    )
+    ON CONFLICT (day, user_id, detected_type, score_bucket) DO UPDATE
+    SET analyses_count = s.analyses_count + EXCLUDED.analyses_count,
+        score_sum = s.score_sum + EXCLUDED.score_sum;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION analysis_stats_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (OLD.created_at::date, OLD.user_id, OLD.full_result->>'detectedType', OLD.score, OLD.deleted_at IS NULL)
+       IS NOT DISTINCT FROM
+       (NEW.created_at::date, NEW.user_id, NEW.full_result->>'detectedType', NEW.score, NEW.deleted_at IS NULL) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        IF OLD.deleted_at IS NULL THEN
+            PERFORM analysis_stats_apply(OLD.created_at, OLD.user_id, OLD.full_result, OLD.score, -1);
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        IF NEW.deleted_at IS NULL THEN
+            PERFORM analysis_stats_apply(NEW.created_at, NEW.user_id, NEW.full_result, NEW.score, 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS analyses_stats ON analyses;
+CREATE TRIGGER analyses_stats
+AFTER INSERT OR DELETE OR UPDATE OF created_at, user_id, score, full_result, deleted_at ON analyses
+FOR EACH ROW EXECUTE FUNCTION analysis_stats_trigger();
+"""
+
+# Первичное заполнение агрегатов выполняется один раз, пока таблица пуста
+ANALYSIS_STATS_BACKFILL = """
+INSERT INTO analysis_daily_stats (day, user_id, detected_type, score_bucket, analyses_count, score_sum)
+SELECT COALESCE(created_at, now())::date,
+       COALESCE(user_id, 0),
+       COALESCE(full_result->>'detectedType', 'unknown'),
+       LEAST(GREATEST(COALESCE(score, 0), 0) / 10, 9),
+       count(*),
+       sum(COALESCE(score, 0))
+FROM analyses
+WHERE deleted_at IS NULL
+  AND NOT EXISTS (SELECT 1 FROM analysis_daily_stats)
+GROUP BY 1, 2, 3, 4
+"""
+
+# create_all не меняет уже существующие таблицы, поэтому новые колонки
+# и индексы добавляются идемпотентными DDL-командами.
+SCHEMA_UPGRADES = [
+    # Несколько воркеров могут стартовать одновременно
+    "SELECT pg_advisory_xact_lock(7240001)",
+    "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS extracted_text TEXT",
+    f"ALTER TABLE analyses ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_analyses_search_vector ON analyses USING GIN (search_vector)",
+    "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP",
+    "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS result_version INTEGER NOT NULL DEFAULT 1",
+    "CREATE INDEX IF NOT EXISTS ix_analyses_deleted_at ON analyses (deleted_at)",
+    # Текст и так сжимается TOAST; lz4 (PostgreSQL 14+) распаковывается быстрее pglz,
+    # что заметно при пакетном пересчёте оценок
+    """
+    DO $$
+    BEGIN
+        IF current_setting('server_version_num')::int >= 140000 THEN
+            ALTER TABLE analyses ALTER COLUMN extracted_text SET COMPRESSION lz4;
+        END IF;
+    EXCEPTION WHEN feature_not_supported THEN
+        NULL;
+    END $$
+    """,
+    ANALYSIS_STATS_TRIGGER,
+    ANALYSIS_STATS_BACKFILL,
+]
 
 def run_migrations():
-    """Создаёт таблицы, если их ещё нет."""
+    """Создаёт таблицы, если их ещё нет, и применяет обновления схемы."""
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
     logger.info("Таблицы созданы (или уже существовали)")
 
 def get_db():
@@ -45,4 +286,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
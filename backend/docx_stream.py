@@ -0,0 +1,95 @@
+"""Потоковое извлечение текста из DOCX без построения модели python-docx.
+
+XML-части читаются прямо из zip-архива через iterparse, обработанные
+абзацы и таблицы сразу удаляются из дерева, поэтому память не растёт
+с длиной документа. Кроме основного текста извлекаются ячейки таблиц,
+колонтитулы, сноски и надписи (текстовые поля): в них часто оказываются
+заголовки разделов. Абзац надписи вложен в прогон внешнего абзаца и
+выдаётся отдельным блоком перед ним; запасная VML-копия надписи
+(mc:Fallback) пропускается, чтобы текст не повторялся.
+"""
+import re
+import zipfile
+from io import BytesIO
+from typing import Iterator
+from xml.etree.ElementTree import iterparse
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+P, T, TAB, BR, CR, TBL, TC = W + "p", W + "t", W + "tab", W + "br", W + "cr", W + "tbl", W + "tc"
+FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+MAIN_PART = "word/document.xml"
+HEADER_PART = re.compile(r"word/header\d*\.xml$")
+FOOTER_PART = re.compile(r"word/footer\d*\.xml$")
+NOTE_PARTS = ("word/footnotes.xml", "word/endnotes.xml")
+
+def _iter_part_blocks(stream, keep_empty: bool) -> Iterator[str]:
+    """Абзацы вне таблиц и ячейки таблиц одной XML-части в порядке документа."""
+    path = []
+    # Стек абзацев: абзац надписи открывается внутри ещё не законченного абзаца
+    paragraphs = []
+    cells = []
+    fallback = 0
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            path.append(elem)
+            if tag == P:
+                paragraphs.append([])
+            elif tag == TC:
+                cells.append([])
+            elif tag == FALLBACK:
+                fallback += 1
+            continue
+
+        path.pop()
+        if tag == T:
+            if paragraphs:
+                paragraphs[-1].append(elem.text or "")
+        elif tag == TAB:
+            if paragraphs:
+                paragraphs[-1].append("\t")
+        elif tag in (BR, CR):
+            if paragraphs:
+                paragraphs[-1].append("\n")
+        elif tag == P:
+            text = "".join(paragraphs.pop())
+            if fallback:
+                pass
+            elif cells:
+                cells[-1].append(text)
+            elif text or keep_empty:
+                yield text
+        elif tag == TC:
+            text = "\n".join(t for t in cells.pop() if t)
+            if fallback:
+                pass
+            elif cells:
+                cells[-1].append(text)
+            elif text:
+                yield text
+        elif tag == FALLBACK:
+            fallback -= 1
+
+        # Готовые абзацы и таблицы верхнего уровня больше не нужны
+        if tag in (P, TBL) and not cells and path:
+            path[-1].clear()
+
+def iter_docx_blocks(file_content: bytes) -> Iterator[str]:
+    """Колонтитулы, основной текст, сноски и нижние колонтитулы по порядку."""
+    with zipfile.ZipFile(BytesIO(file_content)) as archive:
+        names = archive.namelist()
+        if MAIN_PART not in names:
+            raise ValueError(f"В архиве нет {MAIN_PART}")
+        parts = (
+            [(n, False) for n in sorted(names) if HEADER_PART.match(n)]
+            + [(MAIN_PART, True)]
+            + [(n, False) for n in NOTE_PARTS if n in names]
+            + [(n, False) for n in sorted(names) if FOOTER_PART.match(n)]
+        )
+        for name, keep_empty in parts:
+            with archive.open(name) as stream:
+                yield from _iter_part_blocks(stream, keep_empty)
+
+def extract_docx_text(file_content: bytes) -> str:
+    return "\n".join(iter_docx_blocks(file_content))
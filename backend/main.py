@@ -1,17 +1,41 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
+import threading
 from .auth import router as auth_router
 from .analyze import router as analyze_router
+from .search import router as search_router
+from .admin_stats import router as admin_stats_router
+from .admin_export import router as admin_export_router
+from .reconcile import router as reconcile_router
 from .jwt_middleware import JWTMiddleware
+from .compression import CompressionMiddleware
+from .metrics import MetricsMiddleware, router as metrics_router
+from .profiling import router as profiling_router
+from .template_store import router as templates_router, seed_templates
+from .rescore import router as rescore_router
+from .similarity import router as similarity_router
+from .uploads import router as uploads_router
+from .tracing import TracingMiddleware, install_log_trace_ids, start_trace_exporter
 from .database import run_migrations
+from .config import COMPRESSION_MIN_SIZE
+from .result_format import compact_stored_results
+from .purger import start_purger
 
-logging.basicConfig(level=logging.INFO)
-app = FastAPI(title="Report Analyzer API")
+install_log_trace_ids()
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:[%(trace_id)s] %(message)s")
+app = FastAPI(title="Report Analyzer API", default_response_class=ORJSONResponse)
 
 @app.on_event("startup")
 def on_startup():
     run_migrations()
+    seed_templates()
+    threading.Thread(target=compact_stored_results, name="compact-results", daemon=True).start()
+    start_purger()
+    start_trace_exporter()
+
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
 
 app.add_middleware(
     JWTMiddleware,
@@ -20,6 +44,7 @@ app.add_middleware(
         "/api/register",
         "/api/health",
         "/api/refresh",
+        "/api/metrics",
         "/docs",
         "/openapi.json"
     ]
@@ -38,8 +63,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 app.include_router(auth_router)
 app.include_router(analyze_router)
+app.include_router(search_router)
+app.include_router(admin_stats_router)
+app.include_router(admin_export_router)
+app.include_router(reconcile_router)
+app.include_router(metrics_router)
+app.include_router(profiling_router)
+app.include_router(templates_router)
+app.include_router(rescore_router)
+app.include_router(similarity_router)
+app.include_router(uploads_router)
 
 @app.get("/api/health")
 def health():
@@ -0,0 +1,109 @@
+"""Метрики Prometheus: время этапов анализа, ожидание пула БД, задержки
+запросов по маршрутам, попадания в кэш и ошибки анализа.
+
+При запуске uvicorn с несколькими воркерами нужно задать
+PROMETHEUS_MULTIPROC_DIR, тогда /api/metrics собирает данные всех процессов.
+"""
+import os
+import time
+from contextlib import contextmanager
+from fastapi import APIRouter, HTTPException, Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from .config import METRICS_TOKEN
+from .tracing import span
+
+router = APIRouter(prefix="/api", tags=["Metrics"])
+
+# От миллисекунд (regex, SQL) до минут (OCR десятков скриншотов)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+STAGE_SECONDS = Histogram(
+    "analyzer_stage_seconds", "Время этапа обработки документа", ["stage"], buckets=STAGE_BUCKETS
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds", "Ожидание соединения из пула БД", buckets=FAST_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Время выполнения SQL-запроса", buckets=FAST_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ["method", "route", "status"], buckets=STAGE_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Обращения к кэшам", ["cache", "result"]
+)
+ANALYSIS_ERRORS = Counter(
+    "analysis_errors_total", "Анализы, завершившиеся ошибкой, по статусу", ["status"]
+)
+ADMISSION_ACTIVE = Gauge(
+    "admission_active_requests", "Анализы, выполняющиеся сейчас", multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth", "Анализы, ожидающие свободного слота", multiprocess_mode="livesum"
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Время ожидания в очереди на анализ", buckets=STAGE_BUCKETS
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "Запросы на анализ, отклонённые контролем допуска", ["reason"]
+)
+
+@contextmanager
+def timed(stage: str):
+    """Таймер этапа: работает и как декоратор, и как контекстный менеджер.
+    Заодно открывает одноимённый спан, если запрос трассируется."""
+    start = time.perf_counter()
+    with span(stage):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+def record_analysis_error(status: str):
+    ANALYSIS_ERRORS.labels(status=status).inc()
+
+class MetricsMiddleware:
+    """Замеряет время запросов по шаблону маршрута, а не по фактическому пути."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=str(status_code),
+            ).observe(time.perf_counter() - start)
+
+@router.get("/metrics")
+def metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Неверный токен метрик")
+
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
@@ -1,8 +1,16 @@
+import hashlib
 import logging
+import threading
+import uuid
 from io import BytesIO
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from minio import Minio
+from minio.datatypes import Part
 from minio.error import S3Error
-from .config import MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET, MINIO_SECURE
+from minio.deleteobjects import DeleteObject
+from .metrics import timed
+from .config import MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET, MINIO_SECURE, STORAGE_BACKEND
 
 logger = logging.getLogger("minio_service")
 
@@ -30,6 +38,7 @@ class MinioService:
             logger.error(f"Ошибка при проверке/создании бакета: {e}")
             raise
 
+    @timed("storage_upload")
     def upload_file(self, object_name: str, file_data: bytes, content_type: str = "application/octet-stream") -> str:
         """
         Загружает файл в MinIO.
@@ -49,22 +58,25 @@ class MinioService:
             logger.error(f"Ошибка загрузки файла в MinIO: {e}")
             raise
 
-    def get_presigned_url(self, object_name: str, expires_hours: int = 1) -> str:
+    @timed("storage_presign")
+    def get_presigned_url(self, object_name: str, expires_hours: int = 1, request_date=None) -> str:
         """
         Возвращает временную ссылку для скачивания файла.
+        При одинаковом request_date ссылка получается одинаковой.
         """
-        from datetime import timedelta
         try:
             url = self.client.presigned_get_object(
                 bucket_name=self.bucket,
                 object_name=object_name,
                 expires=timedelta(hours=expires_hours),
+                request_date=request_date,
             )
             return url
         except S3Error as e:
             logger.error(f"Ошибка получения presigned URL: {e}")
             raise
 
+    @timed("storage_delete")
     def delete_file(self, object_name: str):
         """Удаляет файл из MinIO."""
         try:
@@ -74,6 +86,35 @@ class MinioService:
             logger.error(f"Ошибка удаления файла из MinIO: {e}")
             raise
 
+    @timed("storage_delete")
+    def delete_files(self, object_names: list[str]) -> list[str]:
+        """
+        Удаляет несколько файлов одним запросом remove_objects.
+        Возвращает имена объектов, которые удалить не удалось.
+        """
+        if not object_names:
+            return []
+        errors = self.client.remove_objects(
+            self.bucket,
+            (DeleteObject(name) for name in object_names),
+        )
+        # remove_objects ленивый: запросы уходят только при переборе ошибок
+        failed = []
+        for error in errors:
+            logger.error(f"Ошибка удаления '{error.object_name}' из MinIO: {error.message}")
+            failed.append(error.object_name)
+        logger.info(f"Удалено файлов из MinIO: {len(object_names) - len(failed)}")
+        return failed
+
+    def iter_objects(self, prefix: str = ""):
+        """
+        Потоково перебирает объекты бакета с указанным префиксом.
+        S3 отдаёт ключи в лексикографическом порядке байтов UTF-8.
+        """
+        for obj in self.client.list_objects(self.bucket, prefix=prefix, recursive=True):
+            if not obj.is_dir:
+                yield obj
+
     def file_exists(self, object_name: str) -> bool:
         """Проверяет существование файла в MinIO."""
         try:
@@ -82,9 +123,155 @@ class MinioService:
         except S3Error:
             return False
 
+    @timed("storage_download")
+    def get_file(self, object_name: str) -> bytes:
+        """Читает файл из MinIO целиком."""
+        response = self.client.get_object(self.bucket, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    # Загрузка частями напрямую из браузера. У minio-py нет публичного API для
+    # presigned multipart, поэтому используются методы клиента с подчёркиванием
+    # (стабильны в 7.x, версия закреплена в requirements.txt).
+
+    @timed("storage_multipart")
+    def create_multipart_upload(self, object_name: str, content_type: str = "application/octet-stream") -> str:
+        """Начинает загрузку частями. Возвращает upload_id."""
+        try:
+            return self.client._create_multipart_upload(self.bucket, object_name, {"Content-Type": content_type})
+        except S3Error as e:
+            logger.error(f"Ошибка создания загрузки частями в MinIO: {e}")
+            raise
+
+    @timed("storage_presign")
+    def get_presigned_part_url(self, object_name: str, upload_id: str, part_number: int, expires_hours: int = 1) -> str:
+        """Временная ссылка для PUT одной части: клиент отправляет её прямо в MinIO."""
+        return self.client.get_presigned_url(
+            "PUT",
+            self.bucket,
+            object_name,
+            expires=timedelta(hours=expires_hours),
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)},
+        )
+
+    def list_parts(self, object_name: str, upload_id: str) -> list[Part]:
+        """Уже загруженные части (номер, ETag, размер)."""
+        parts = []
+        marker = None
+        while True:
+            result = self.client._list_parts(self.bucket, object_name, upload_id, part_number_marker=marker)
+            parts.extend(result.parts)
+            if not result.is_truncated:
+                return parts
+            marker = result.next_part_number_marker
+
+    @timed("storage_multipart")
+    def complete_multipart_upload(self, object_name: str, upload_id: str, parts: list[Part]) -> str:
+        """Собирает объект из частей, перечисленных по возрастанию номера."""
+        try:
+            self.client._complete_multipart_upload(self.bucket, object_name, upload_id, parts)
+            logger.info(f"Файл '{object_name}' собран из {len(parts)} частей")
+            return object_name
+        except S3Error as e:
+            logger.error(f"Ошибка завершения загрузки частями в MinIO: {e}")
+            raise
+
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        """Отменяет загрузку и удаляет её части; уже отменённая загрузка не ошибка."""
+        try:
+            self.client._abort_multipart_upload(self.bucket, object_name, upload_id)
+        except S3Error as e:
+            if e.code != "NoSuchUpload":
+                logger.error(f"Ошибка отмены загрузки частями в MinIO: {e}")
+                raise
+
+
+class InMemoryStorageService:
+    """
+    Хранилище в памяти процесса с тем же интерфейсом, что у MinioService.
+    Используется для локального запуска и нагрузочного тестирования без MinIO.
+    """
+
+    def __init__(self):
+        self.bucket = MINIO_BUCKET
+        self._objects = {}
+        self._uploads = {}
+        self._lock = threading.Lock()
+        logger.info("Используется хранилище в памяти")
+
+    def upload_file(self, object_name: str, file_data: bytes, content_type: str = "application/octet-stream") -> str:
+        with self._lock:
+            self._objects[object_name] = (bytes(file_data), content_type, datetime.now(timezone.utc))
+        return object_name
+
+    def get_presigned_url(self, object_name: str, expires_hours: int = 1, request_date=None) -> str:
+        return f"memory://{self.bucket}/{object_name}"
+
+    def delete_file(self, object_name: str):
+        with self._lock:
+            self._objects.pop(object_name, None)
+
+    def delete_files(self, object_names: list[str]) -> list[str]:
+        with self._lock:
+            for name in object_names:
+                self._objects.pop(name, None)
+        return []
+
+    def iter_objects(self, prefix: str = ""):
+        with self._lock:
+            items = sorted((name, meta[2]) for name, meta in self._objects.items() if name.startswith(prefix))
+        for name, last_modified in items:
+            yield SimpleNamespace(object_name=name, last_modified=last_modified, is_dir=False)
+
+    def file_exists(self, object_name: str) -> bool:
+        return object_name in self._objects
+
+    def get_file(self, object_name: str) -> bytes:
+        with self._lock:
+            if object_name not in self._objects:
+                raise KeyError(object_name)
+            return self._objects[object_name][0]
+
+    def create_multipart_upload(self, object_name: str, content_type: str = "application/octet-stream") -> str:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = (object_name, content_type, {})
+        return upload_id
+
+    def get_presigned_part_url(self, object_name: str, upload_id: str, part_number: int, expires_hours: int = 1) -> str:
+        return f"memory://{self.bucket}/{object_name}?uploadId={upload_id}&partNumber={part_number}"
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Заменяет PUT по ссылке из get_presigned_part_url. Возвращает ETag части."""
+        etag = hashlib.md5(data).hexdigest()
+        with self._lock:
+            self._uploads[upload_id][2][part_number] = (bytes(data), etag, datetime.now(timezone.utc))
+        return etag
+
+    def list_parts(self, object_name: str, upload_id: str) -> list[Part]:
+        with self._lock:
+            if upload_id not in self._uploads:
+                raise KeyError(upload_id)
+            parts = self._uploads[upload_id][2]
+            return [Part(number, etag, modified, len(data)) for number, (data, etag, modified) in sorted(parts.items())]
+
+    def complete_multipart_upload(self, object_name: str, upload_id: str, parts: list[Part]) -> str:
+        with self._lock:
+            _, content_type, uploaded = self._uploads.pop(upload_id)
+            data = b"".join(uploaded[part.part_number][0] for part in parts)
+            self._objects[object_name] = (data, content_type, datetime.now(timezone.utc))
+        return object_name
+
+    def abort_multipart_upload(self, object_name: str, upload_id: str):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+
 
 try:
-    minio_service = MinioService()
+    minio_service = InMemoryStorageService() if STORAGE_BACKEND == "memory" else MinioService()
 except Exception as e:
     logger.error(f"Не удалось инициализировать MinIO: {e}")
     minio_service = None
@@ -2,6 +2,7 @@ import logging
 from io import BytesIO
 import pytesseract
 from PIL import Image, ImageEnhance, ImageFilter
+from .metrics import timed
 
 logger = logging.getLogger("ocr")
 
@@ -9,14 +10,16 @@ class OCRService:
     def __init__(self):
         self.supported_languages = ['rus', 'eng']
     
-    def recognize_text(self, image_bytes: bytes) -> str: 
+    @timed("ocr")
+    def recognize_text(self, image_bytes: bytes, timeout: float = 0) -> str: 
+        """timeout — сколько секунд дать tesseract (0 — без ограничения)."""
         try:
-            return self._tesseract_ocr(image_bytes) 
+            return self._tesseract_ocr(image_bytes, timeout) 
         except Exception as e:
             logger.error(f"OCR error: {e}")
             return ""
     
-    def _tesseract_ocr(self, image_bytes: bytes) -> str:
+    def _tesseract_ocr(self, image_bytes: bytes, timeout: float = 0) -> str:
         """Tesseract OCR с улучшением качества изображения"""
         try:
             image = Image.open(BytesIO(image_bytes))
@@ -25,7 +28,7 @@ class OCRService:
             
             custom_config = r'--oem 3 --psm 6 -l rus+eng'
             
-            text = pytesseract.image_to_string(processed_image, config=custom_config)
+            text = pytesseract.image_to_string(processed_image, config=custom_config, timeout=timeout)
             
             logger.info(f"Tesseract recognized {len(text)} characters")
             return text.strip()
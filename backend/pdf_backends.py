@@ -0,0 +1,126 @@
+"""Сменные бэкенды извлечения текста из PDF.
+
+PDF_BACKEND выбирает бэкенд явно (pdftotext, pypdf2, pypdf, pdfminer) или
+auto — первый доступный в порядке PDF_BACKEND_PREFERENCE. Всё, кроме
+PyPDF2, необязательно: pypdf и pdfminer.six ставятся через pip, pdftotext
+входит в poppler-utils. Сравнение скорости и точности:
+
+    python -m backend.benchmarks.pdf_backends
+"""
+import logging
+import shutil
+from abc import ABC, abstractmethod
+import subprocess
+from io import BytesIO
+import PyPDF2
+from .progress import report
+from .config import PDF_BACKEND
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+try:
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+except ImportError:
+    pdfminer_extract_text = None
+
+logger = logging.getLogger("pdf_backends")
+
+PDFTOTEXT_TIMEOUT_SECONDS = 60
+
+class PdfBackend(ABC):
+    name = ""
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    def extract_pages(self, file_content: bytes) -> list[str]:
+        """Текст каждой страницы; страницы без текстового слоя дают пустую строку."""
+
+    def extract(self, file_content: bytes) -> str:
+        return "".join(page + "\n" for page in self.extract_pages(file_content))
+
+class PyPDF2Backend(PdfBackend):
+    name = "pypdf2"
+
+    def extract_pages(self, file_content: bytes) -> list[str]:
+        reader = PyPDF2.PdfReader(BytesIO(file_content))
+        return _extract_page_texts(reader.pages)
+
+class PypdfBackend(PdfBackend):
+    name = "pypdf"
+
+    def available(self) -> bool:
+        return pypdf is not None
+
+    def extract_pages(self, file_content: bytes) -> list[str]:
+        reader = pypdf.PdfReader(BytesIO(file_content))
+        return _extract_page_texts(reader.pages)
+
+class PdfminerBackend(PdfBackend):
+    name = "pdfminer"
+
+    def available(self) -> bool:
+        return pdfminer_extract_text is not None
+
+    def extract_pages(self, file_content: bytes) -> list[str]:
+        return _split_pages(pdfminer_extract_text(BytesIO(file_content)))
+
+class PdftotextBackend(PdfBackend):
+    """Бинарник pdftotext из poppler: документ передаётся через stdin."""
+    name = "pdftotext"
+
+    def available(self) -> bool:
+        return shutil.which("pdftotext") is not None
+
+    def extract_pages(self, file_content: bytes) -> list[str]:
+        completed = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", "-", "-"],
+            input=file_content,
+            capture_output=True,
+            timeout=PDFTOTEXT_TIMEOUT_SECONDS,
+            check=True
+        )
+        return _split_pages(completed.stdout.decode("utf-8", errors="replace"))
+
+def _extract_page_texts(pages) -> list[str]:
+    """Постраничное извлечение PyPDF2 и pypdf с отчётом о ходе (progress.report)."""
+    total = len(pages)
+    texts = []
+    for page in pages:
+        # extract_text() у PyPDF2 3.0 иногда возвращает None для пустых страниц
+        texts.append(page.extract_text() or "")
+        report("extracting", len(texts), total)
+    return texts
+
+def _split_pages(text: str) -> list[str]:
+    """pdfminer и pdftotext завершают каждую страницу символом перевода формата."""
+    pages = text.split("\f")
+    if len(pages) > 1 and not pages[-1].strip():
+        pages.pop()
+    return pages
+
+PDF_BACKENDS = {backend.name: backend for backend in (
+    PdftotextBackend(), PypdfBackend(), PdfminerBackend(), PyPDF2Backend()
+)}
+
+# auto остаётся на PyPDF2, с которым сервис работал до сих пор: остальные
+# бэкенды включаются через PDF_BACKEND после замеров benchmarks/pdf_backends.py
+# на своём окружении, и порядок здесь стоит менять только по их результатам
+PDF_BACKEND_PREFERENCE = ("pypdf2", "pdftotext", "pypdf", "pdfminer")
+
+def select_backend(name: str = PDF_BACKEND) -> PdfBackend:
+    if name != "auto":
+        backend = PDF_BACKENDS.get(name)
+        if backend is None:
+            raise ValueError(f"Неизвестный PDF_BACKEND: {name}")
+        if not backend.available():
+            raise ValueError(f"PDF-бэкенд {name} не установлен")
+        return backend
+    return next(PDF_BACKENDS[n] for n in PDF_BACKEND_PREFERENCE if PDF_BACKENDS[n].available())
+
+pdf_backend = select_backend()
+logger.info(f"Извлечение текста из PDF: {pdf_backend.name}")
@@ -0,0 +1,252 @@
+"""OCR страниц PDF без текстового слоя (сканы).
+
+После обычного извлечения страницы, на которых почти нет текста,
+распознаются в пуле процессов, и их текст встаёт на место пустых страниц.
+Страница растрируется pdftoppm из poppler с разрешением OCR_PDF_DPI, а если
+его нет, берётся самое крупное встроенное в страницу изображение (скан),
+масштабированное к тому же разрешению.
+
+Стоимость ограничена: не больше OCR_PDF_MAX_PAGES страниц на документ и
+не дольше OCR_PDF_TIME_BUDGET_SECONDS; не успевшие страницы остаются пустыми.
+Срок передаётся и в процессы пула: pdftoppm и tesseract получают таймаут по
+остатку бюджета, поэтому уже начатые страницы не занимают пул дольше него.
+OCR — дополнение к текстовому слою: любая ошибка здесь оставляет страницы
+такими, какими их извлёк бэкенд PDF.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Optional
+import PyPDF2
+from PyPDF2.filters import _xobj_to_image
+from PIL import Image
+from .ocr_service import ocr_service
+from .metrics import timed
+from .progress import report
+from .config import OCR_PDF_DPI, OCR_PDF_MAX_PAGES, OCR_PDF_TIME_BUDGET_SECONDS, OCR_PDF_WORKERS
+
+logger = logging.getLogger("pdf_ocr")
+
+# Страница с меньшим числом непробельных символов считается сканом
+MIN_TEXT_CHARS = 10
+PDFTOPPM_TIMEOUT_SECONDS = 60
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: форк процесса с потоками (purger, экспорт трасс) может унаследовать захваченные блокировки
+            _pool = ProcessPoolExecutor(max_workers=OCR_PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def pages_without_text(pages: list[str]) -> list[int]:
+    return [i for i, text in enumerate(pages) if len("".join(text.split())) < MIN_TEXT_CHARS]
+
+def _render_page(pdf_path: str, page_number: int, timeout: float = PDFTOPPM_TIMEOUT_SECONDS) -> bytes:
+    """Растрирует одну страницу (нумерация с 1) через pdftoppm в PNG."""
+    completed = subprocess.run(
+        ["pdftoppm", "-r", str(OCR_PDF_DPI), "-f", str(page_number), "-l", str(page_number), "-png", "-gray", pdf_path],
+        capture_output=True,
+        timeout=timeout,
+        check=True
+    )
+    return completed.stdout
+
+def _xobject_to_image(x_object) -> Optional[Image.Image]:
+    extension, data = _xobj_to_image(x_object)
+    if extension is not None:
+        return Image.open(BytesIO(data))
+    # При цепочке фильтров PyPDF2 не собирает файл изображения, но отдаёт декодированные пиксели
+    mode = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}.get(x_object.get("/ColorSpace"))
+    size = (x_object.get("/Width", 0), x_object.get("/Height", 0))
+    if mode and x_object.get("/BitsPerComponent") == 8 and len(data) == size[0] * size[1] * len(mode):
+        return Image.frombytes(mode, size, data)
+    return None
+
+def _iter_xobject_images(resources, depth: int = 0):
+    """Изображения из ресурсов страницы, включая вложенные Form XObject.
+
+    page.images в PyPDF2 3.0 не заходит в формы, а многие генераторы PDF
+    (в том числе reportlab) кладут скан страницы именно в форму.
+    """
+    if depth > 3 or resources is None:
+        return
+    resources = resources.get_object()
+    if "/XObject" not in resources:
+        return
+    x_objects = resources["/XObject"].get_object()
+    for name in x_objects:
+        x_object = x_objects[name].get_object()
+        subtype = x_object.get("/Subtype")
+        if subtype == "/Image":
+            image = _xobject_to_image(x_object)
+            if image is not None:
+                yield image
+        elif subtype == "/Form":
+            yield from _iter_xobject_images(x_object.get("/Resources"), depth + 1)
+
+def _embedded_page_image(page) -> Optional[bytes]:
+    """Самое крупное изображение страницы, приведённое к OCR_PDF_DPI, в PNG."""
+    try:
+        images = list(_iter_xobject_images(page.get("/Resources")))
+    except Exception as e:
+        logger.warning(f"Не удалось извлечь изображения страницы: {e}")
+        return None
+    if not images:
+        return None
+
+    image = max(images, key=lambda im: im.width * im.height)
+    page_width_inches = float(page.mediabox.width) / 72
+    if page_width_inches > 0:
+        dpi = image.width / page_width_inches
+        # Tesseract хуже всего работает на мелких сканах; сильно крупные только замедляют его
+        if dpi < OCR_PDF_DPI * 0.75 or dpi > OCR_PDF_DPI * 2:
+            scale = OCR_PDF_DPI / dpi
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+    buffer = BytesIO()
+    image.convert("L").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _ocr_page(page_number: int, image_bytes: Optional[bytes], pdf_path: Optional[str], deadline: float) -> str:
+    """Выполняется в процессе пула; deadline — time.time(), после которого страница не нужна."""
+    try:
+        if time.time() >= deadline:
+            return ""
+        if image_bytes is None:
+            image_bytes = _render_page(pdf_path, page_number, min(PDFTOPPM_TIMEOUT_SECONDS, deadline - time.time()))
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return ""
+        return ocr_service.recognize_text(image_bytes, timeout=remaining)
+    except Exception as e:
+        logger.error(f"OCR страницы {page_number} не удался: {e}")
+        return ""
+
+def _submit(tasks: list[tuple], deadline: float) -> dict:
+    """Отправляет страницы в пул; упавший пул пересоздаётся один раз."""
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return {pool.submit(_ocr_page, *task, deadline): task[0] - 1 for task in tasks}
+        except BrokenProcessPool as e:
+            logger.error(f"Пул OCR упал, будет пересоздан: {e}")
+            _reset_pool()
+            if attempt:
+                raise
+
+def _unlink_when_done(path: str, futures) -> None:
+    """Удаляет временный PDF, когда завершатся все задачи, которые могут его читать."""
+    pending = [future for future in futures if not future.done()]
+    if not pending:
+        os.unlink(path)
+        return
+    lock = threading.Lock()
+    left = [len(pending)]
+
+    def on_done(_):
+        with lock:
+            left[0] -= 1
+            last = left[0] == 0
+        if last:
+            try:
+                os.unlink(path)
+            except OSError as e:
+                logger.warning(f"Не удалось удалить временный PDF {path}: {e}")
+
+    for future in pending:
+        future.add_done_callback(on_done)
+
+@timed("ocr_pdf")
+def ocr_missing_pages(file_content: bytes, pages: list[str]) -> list[str]:
+    """Возвращает страницы, в которых пустые страницы заменены результатом OCR.
+
+    При любой ошибке возвращает исходные страницы.
+    """
+    try:
+        return _recognize_missing_pages(file_content, pages)
+    except Exception as e:
+        logger.error(f"OCR страниц PDF не удался, используется текстовый слой: {e}")
+        return pages
+
+def _recognize_missing_pages(file_content: bytes, pages: list[str]) -> list[str]:
+    missing = pages_without_text(pages)
+    if not missing or OCR_PDF_MAX_PAGES <= 0:
+        return pages
+    if len(missing) > OCR_PDF_MAX_PAGES:
+        logger.warning(f"Страниц без текста {len(missing)}, распознаются первые {OCR_PDF_MAX_PAGES}")
+        missing = missing[:OCR_PDF_MAX_PAGES]
+
+    deadline = time.monotonic() + OCR_PDF_TIME_BUDGET_SECONDS
+    # Процессы пула сверяются с time.time(): общий отсчёт monotonic между процессами не гарантирован
+    worker_deadline = time.time() + OCR_PDF_TIME_BUDGET_SECONDS
+    pdf_path = None
+    futures = {}
+    try:
+        if shutil.which("pdftoppm"):
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                f.write(file_content)
+                pdf_path = f.name
+            tasks = [(i + 1, None, pdf_path) for i in missing]
+        else:
+            reader = PyPDF2.PdfReader(BytesIO(file_content))
+            tasks = []
+            for i in missing:
+                if time.monotonic() > deadline:
+                    break
+                image_bytes = _embedded_page_image(reader.pages[i])
+                if image_bytes is not None:
+                    tasks.append((i + 1, image_bytes, None))
+        if not tasks:
+            return pages
+
+        futures = _submit(tasks, worker_deadline)
+        done = []
+        report("ocr", 0, len(futures))
+        try:
+            for future in as_completed(futures, timeout=max(0, deadline - time.monotonic())):
+                done.append(future)
+                report("ocr", len(done), len(futures))
+        except FuturesTimeoutError:
+            for future in futures:
+                if not future.done():
+                    future.cancel()
+            logger.warning(f"Бюджет OCR исчерпан: распознано {len(done)} из {len(futures)} страниц")
+
+        result = list(pages)
+        recognized = 0
+        for future in done:
+            try:
+                text = future.result()
+            except BrokenProcessPool as e:
+                logger.error(f"Пул OCR упал, будет пересоздан: {e}")
+                _reset_pool()
+                continue
+            if text:
+                result[futures[future]] = text
+                recognized += 1
+        logger.info(f"OCR PDF: распознано {recognized} страниц без текстового слоя")
+        return result
+    finally:
+        if pdf_path:
+            # Начатые страницы дорабатывают до своего таймаута и ещё читают файл
+            _unlink_when_done(pdf_path, futures)
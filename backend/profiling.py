@@ -0,0 +1,192 @@
+"""Профилирование отдельных запросов по требованию администратора.
+
+Запрос профилируется, если администратор прислал заголовок X-Profile: 1
+или если он попал в случайную выборку PROFILE_SAMPLE_RATE. Фоновый поток
+раз в PROFILE_INTERVAL_MS снимает стек потока, выполняющего анализ, и
+копит счётчики в формате folded stacks (flamegraph.pl, speedscope).
+Когда профилирование выключено, запрос платит только за одно сравнение.
+"""
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from .database import RequestProfile, SessionLocal, User, get_db
+from .dependencies import get_current_user
+from .security import require_role
+from .config import PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+logger = logging.getLogger("profiling")
+
+PROFILE_HEADER = "X-Profile"
+MAX_STACK_DEPTH = 128
+
+# Доля профилируемых запросов, админ может поменять её без перезапуска
+sample_rate = PROFILE_SAMPLE_RATE
+
+class SamplingProfiler:
+    """Периодически снимает стек одного потока через sys._current_frames()."""
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.analysis_id = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        deadline = time.monotonic() + PROFILE_MAX_SECONDS
+        while not self._stop.wait(self.interval):
+            if time.monotonic() > deadline:
+                logger.warning("Профилирование прервано по лимиту PROFILE_MAX_SECONDS")
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[_fold(frame)] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def run_profiled(profiler: Optional[SamplingProfiler], fn, *args):
+    """Выполняет fn(*args), профилируя текущий поток (поток пула с анализом)."""
+    if profiler is not None:
+        profiler.thread_id = threading.get_ident()
+    return fn(*args)
+
+def attach_analysis(profiler: Optional[SamplingProfiler], analysis_id: int):
+    """Привязывает профиль к анализу; для непрофилируемых запросов ничего не делает."""
+    if profiler is not None and profiler.analysis_id is None:
+        profiler.analysis_id = analysis_id
+
+def _should_profile(request: Request, user: User) -> bool:
+    if request.headers.get(PROFILE_HEADER) == "1" and user.role == "admin":
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+async def profile_request(request: Request, current_user: User = Depends(get_current_user)):
+    """Зависимость для тяжёлых эндпоинтов: профилирует запрос, если он выбран.
+
+    Сэмплы снимаются с потока пула, в котором эндпоинт выполняет анализ
+    через run_profiled, поэтому стеки параллельных запросов в профиль не
+    попадают. Профиль записывается в БД тоже в потоке пула.
+    """
+    if not _should_profile(request, current_user):
+        yield None
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        await run_in_threadpool(_save_profile, profiler, request.url.path, current_user.id)
+
+def _save_profile(profiler: SamplingProfiler, path: str, user_id: int):
+    db = SessionLocal()
+    try:
+        db.add(RequestProfile(
+            analysis_id=profiler.analysis_id,
+            user_id=user_id,
+            path=path,
+            duration_ms=int(profiler.duration * 1000),
+            interval_ms=int(profiler.interval * 1000),
+            samples=profiler.samples,
+            folded=profiler.folded()
+        ))
+        db.commit()
+        logger.info(f"Профиль запроса {path} сохранён: {profiler.samples} сэмплов, анализ {profiler.analysis_id}")
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Не удалось сохранить профиль запроса {path}: {e}")
+    finally:
+        db.close()
+
+class ProfilingSettings(BaseModel):
+    sampleRate: float = Field(ge=0, le=1)
+
+@router.get("/profiling")
+def get_profiling_settings(current_user: User = Depends(require_role("admin"))):
+    return {"sampleRate": sample_rate, "intervalMs": PROFILE_INTERVAL_MS, "header": PROFILE_HEADER}
+
+@router.put("/profiling")
+def update_profiling_settings(
+    settings: ProfilingSettings,
+    current_user: User = Depends(require_role("admin"))
+):
+    """Меняет долю профилируемых запросов в этом процессе до перезапуска."""
+    global sample_rate
+    sample_rate = settings.sampleRate
+    logger.info(f"Админ {current_user.id} установил долю профилирования {sample_rate}")
+    return {"sampleRate": sample_rate}
+
+@router.get("/profiles")
+def list_profiles(
+    analysis_id: int = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    query = db.query(RequestProfile)
+    if analysis_id is not None:
+        query = query.filter(RequestProfile.analysis_id == analysis_id)
+    profiles = query.order_by(RequestProfile.created_at.desc()).limit(min(max(limit, 1), 500)).all()
+    return [
+        {
+            "id": p.id,
+            "analysisId": p.analysis_id,
+            "userId": p.user_id,
+            "path": p.path,
+            "createdAt": p.created_at.isoformat() if p.created_at else None,
+            "durationMs": p.duration_ms,
+            "intervalMs": p.interval_ms,
+            "samples": p.samples
+        }
+        for p in profiles
+    ]
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Отдаёт профиль в формате folded stacks для flamegraph.pl или speedscope."""
+    profile = db.query(RequestProfile).filter(RequestProfile.id == profile_id).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return Response(
+        profile.folded,
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile_{profile.id}.folded"'}
+    )
@@ -0,0 +1,140 @@
+"""Ход долгого анализа в виде Server-Sent Events.
+
+Если клиент прислал Accept: text/event-stream, эндпоинт анализа отвечает
+потоком событий вместо одного JSON:
+
+    event: progress
+    data: {"stage": "extracting", "current": 12, "total": 60, "elapsedMs": 840}
+
+    event: result
+    data: {...тот же результат, что и в обычном ответе...}
+
+Ошибка приходит событием error с полями status и detail. Этапы: uploaded,
+extracting, ocr, file (анализ нескольких файлов), analysing, rendering,
+stored; current в событии — сколько страниц, изображений или файлов
+этапа уже готово из total. Сам анализ выполняется в потоке пула, а код этапов вызывает
+report(), который без открытого потока стоит одного чтения contextvar.
+Промежуточные события со счётчиком отправляются не чаще раза в
+PROGRESS_MIN_INTERVAL_MS для каждого этапа.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from .database import SessionLocal
+from .profiling import run_profiled
+from .config import PROGRESS_MIN_INTERVAL_MS, PROGRESS_HEARTBEAT_SECONDS
+
+logger = logging.getLogger("progress")
+
+EVENT_STREAM = "text/event-stream"
+HEARTBEAT = b": ping\n\n"
+
+# Анализ, клиент которого отключился, доводится до конца; ссылки на задачи
+# держатся здесь, иначе сборщик мусора может удалить их раньше времени
+_running = set()
+
+class ProgressChannel:
+    """Очередь событий одного ответа; report() вызывается из потока анализа."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.started = time.monotonic()
+        self.last_sent = {}
+
+    def emit(self, event: str, data: dict):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+_channel: ContextVar[Optional[ProgressChannel]] = ContextVar("progress_channel", default=None)
+
+def report(stage: str, current: int = None, total: int = None, **fields):
+    """Сообщает об этапе анализа, если клиент подписан на ход анализа."""
+    channel = _channel.get()
+    if channel is None:
+        return
+    now = time.monotonic()
+    if current is not None and total is not None and current < total:
+        if (now - channel.last_sent.get(stage, float("-inf"))) * 1000 < PROGRESS_MIN_INTERVAL_MS:
+            return
+        channel.last_sent[stage] = now
+    data = {"stage": stage}
+    if current is not None:
+        data["current"] = current
+    if total is not None:
+        data["total"] = total
+    data.update(fields)
+    data["elapsedMs"] = int((now - channel.started) * 1000)
+    channel.emit("progress", data)
+
+def wants_event_stream(request: Request) -> bool:
+    return EVENT_STREAM in request.headers.get("accept", "")
+
+def _frame(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+def event_stream(run: Callable, response_model=None, profiler=None, slot=None) -> StreamingResponse:
+    """Выполняет run(db) в потоке пула и отдаёт события хода анализа и результат.
+
+    У анализа своя сессия БД: если клиент закроет соединение, анализ
+    доработает и сохранится, а сессия запроса к тому времени уже закрыта.
+    Слот допуска (admission) запроса освобождается только после анализа.
+    """
+    channel = ProgressChannel(asyncio.get_running_loop())
+    context = contextvars.copy_context()
+    context.run(_channel.set, channel)
+
+    def target():
+        db = SessionLocal()
+        try:
+            return run_profiled(profiler, run, db)
+        finally:
+            db.close()
+
+    async def execute():
+        try:
+            result = await run_in_threadpool(context.run, target)
+            if response_model is not None:
+                result = response_model.model_validate(result).model_dump(mode="json", exclude_unset=True)
+            channel.emit("result", result)
+        except HTTPException as e:
+            channel.emit("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Ошибка в потоке хода анализа: {e}")
+            channel.emit("error", {"status": 500, "detail": str(e)})
+        finally:
+            channel.close()
+
+    task = asyncio.create_task(execute())
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    if slot is not None:
+        slot.hold_until(task)
+
+    async def frames():
+        while True:
+            try:
+                item = await asyncio.wait_for(channel.queue.get(), PROGRESS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Комментарий SSE не даёт прокси закрыть молчащее соединение
+                yield HEARTBEAT
+                continue
+            if item is None:
+                break
+            yield _frame(*item)
+        await task
+
+    return StreamingResponse(
+        frames(),
+        media_type=EVENT_STREAM,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
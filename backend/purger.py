@@ -0,0 +1,143 @@
+"""Фоновое удаление мягко удалённых анализов.
+
+Строки с заполненным deleted_at служат очередью: purger забирает их
+пачками, удаляет файлы отчётов из MinIO одним remove_objects на пачку
+и только после этого физически удаляет строки из БД. Заодно он убирает
+просроченные сессии загрузки (uploads): отменяет незавершённые загрузки
+частями и удаляет собранные, но не проанализированные файлы.
+"""
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .database import SessionLocal, Analysis, UploadSession
+from .minio_service import minio_service
+from .config import PURGE_INTERVAL_SECONDS, PURGE_BATCH_SIZE
+
+logger = logging.getLogger("purger")
+
+def soft_delete_analyses(db: Session, query) -> int:
+    """Помечает выбранные анализы удалёнными, не трогая хранилище."""
+    count = query.filter(Analysis.deleted_at.is_(None)).update(
+        {Analysis.deleted_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    return count
+
+def soft_delete_user_analyses(db: Session, user_id: int) -> int:
+    """Помечает удалёнными все анализы пользователя и отвязывает их от него,
+    чтобы строку пользователя можно было удалить сразу."""
+    count = db.query(Analysis).filter(Analysis.user_id == user_id).update(
+        {
+            Analysis.deleted_at: func.coalesce(Analysis.deleted_at, datetime.utcnow()),
+            Analysis.user_id: None
+        },
+        synchronize_session=False
+    )
+    return count
+
+def purge_batch(batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Обрабатывает одну пачку удалённых анализов. Возвращает число удалённых строк."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Analysis.id, Analysis.file_object_name)
+            .filter(Analysis.deleted_at.isnot(None))
+            .order_by(Analysis.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            return 0
+
+        object_names = [row.file_object_name for row in rows if row.file_object_name]
+        failed = set()
+        if object_names:
+            if not minio_service:
+                # Без хранилища удаляем только строки без файлов, остальные ждут
+                failed = set(object_names)
+            else:
+                failed = set(minio_service.delete_files(object_names))
+
+        ids = [row.id for row in rows if row.file_object_name not in failed]
+        if ids:
+            db.query(Analysis).filter(Analysis.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        return len(ids)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def purge_deleted_analyses(batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Удаляет все накопившиеся мягко удалённые анализы пачками."""
+    total = 0
+    while True:
+        purged = purge_batch(batch_size)
+        total += purged
+        if purged < batch_size:
+            break
+    if total:
+        logger.info(f"Окончательно удалено анализов: {total}")
+    return total
+
+def purge_expired_uploads(batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Удаляет просроченные сессии загрузки вместе с частями и файлами в хранилище."""
+    if not minio_service:
+        return 0
+    db = SessionLocal()
+    try:
+        sessions = (
+            db.query(UploadSession)
+            .filter(UploadSession.expires_at < datetime.utcnow())
+            .order_by(UploadSession.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not sessions:
+            return 0
+
+        # После анализа файл уже удалён, у остальных могли остаться части или собранный объект
+        leftovers = [session for session in sessions if session.status != "analyzed"]
+        failed = set()
+        for session in leftovers:
+            try:
+                minio_service.abort_multipart_upload(session.object_name, session.upload_id)
+            except Exception as e:
+                logger.warning(f"Не удалось отменить загрузку {session.id}: {e}")
+                failed.add(session.object_name)
+        failed.update(minio_service.delete_files([s.object_name for s in leftovers if s.object_name not in failed]))
+
+        ids = [session.id for session in sessions if session.object_name not in failed]
+        if ids:
+            db.query(UploadSession).filter(UploadSession.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        if ids:
+            logger.info(f"Удалено просроченных сессий загрузки: {len(ids)}")
+        return len(ids)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _purge_loop(stop_event: threading.Event):
+    while not stop_event.wait(PURGE_INTERVAL_SECONDS):
+        try:
+            purge_deleted_analyses()
+        except Exception as e:
+            logger.error(f"Ошибка фонового удаления анализов: {e}")
+        try:
+            purge_expired_uploads()
+        except Exception as e:
+            logger.error(f"Ошибка удаления просроченных сессий загрузки: {e}")
+
+def start_purger() -> threading.Event:
+    """Запускает фоновый поток purger'а. Возвращает событие для его остановки."""
+    stop_event = threading.Event()
+    threading.Thread(target=_purge_loop, args=(stop_event,), name="purger", daemon=True).start()
+    return stop_event
@@ -0,0 +1,175 @@
+"""Сверка файлов отчётов в MinIO с записями Analysis.
+
+Обе стороны читаются потоково в одинаковом порядке (list_objects отдаёт
+ключи по байтам, в БД сортировка идёт по COLLATE "C") и сравниваются
+слиянием, поэтому ни список объектов, ни выборка из БД целиком в память
+не загружаются.
+
+Запуск из командной строки:
+    python -m backend.reconcile [--delete-orphans] [--clear-dangling]
+"""
+import argparse
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import collate
+from .database import SessionLocal, Analysis, User
+from .minio_service import minio_service
+from .security import require_role
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+logger = logging.getLogger("reconcile")
+
+REPORTS_PREFIX = "reports/"
+BATCH_SIZE = 1000
+SAMPLE_SIZE = 100
+
+def _iter_references(db):
+    query = (
+        db.query(Analysis.id, Analysis.file_object_name, Analysis.deleted_at)
+        .filter(Analysis.file_object_name.like(f"{REPORTS_PREFIX}%"))
+        .order_by(collate(Analysis.file_object_name, "C"), Analysis.id)
+        .yield_per(BATCH_SIZE)
+    )
+    for row in query:
+        yield row
+
+class _Batch:
+    """Накапливает элементы и сбрасывает их обработчику пачками."""
+
+    def __init__(self, handler, size: int = BATCH_SIZE):
+        self.handler = handler
+        self.size = size
+        self.items = []
+
+    def add(self, item):
+        self.items.append(item)
+        if len(self.items) >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self.items:
+            self.handler(self.items)
+            self.items = []
+
+def reconcile_storage(delete_orphans: bool = False, clear_dangling: bool = False, min_age_minutes: int = 60) -> dict:
+    """Находит объекты без записей в БД и записи со ссылками на несуществующие объекты."""
+    if not minio_service:
+        raise RuntimeError("Сервис хранилища недоступен")
+
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=min_age_minutes)
+    report = {
+        "objectsScanned": 0,
+        "referencesScanned": 0,
+        "orphanObjects": 0,
+        "orphansDeleted": 0,
+        "recentObjectsSkipped": 0,
+        "danglingReferences": 0,
+        "danglingCleared": 0,
+        "orphanSample": [],
+        "danglingSample": [],
+        "dryRun": not (delete_orphans or clear_dangling),
+    }
+
+    db = SessionLocal()
+    # Отдельная сессия для записи, чтобы не прерывать серверный курсор чтения
+    write_db = SessionLocal()
+
+    def remove_orphans(names):
+        failed = minio_service.delete_files(names)
+        report["orphansDeleted"] += len(names) - len(failed)
+
+    def clear_references(ids):
+        write_db.query(Analysis).filter(Analysis.id.in_(ids)).update(
+            {Analysis.file_object_name: None}, synchronize_session=False
+        )
+        write_db.commit()
+        report["danglingCleared"] += len(ids)
+
+    orphans = _Batch(remove_orphans)
+    dangling = _Batch(clear_references)
+
+    def on_orphan(obj):
+        if obj.last_modified and obj.last_modified > cutoff:
+            report["recentObjectsSkipped"] += 1
+            return
+        report["orphanObjects"] += 1
+        if len(report["orphanSample"]) < SAMPLE_SIZE:
+            report["orphanSample"].append(obj.object_name)
+        if delete_orphans:
+            orphans.add(obj.object_name)
+
+    def on_dangling(ref):
+        # Мягко удалённые записи всё равно уберёт purger
+        if ref.deleted_at is not None:
+            return
+        report["danglingReferences"] += 1
+        if len(report["danglingSample"]) < SAMPLE_SIZE:
+            report["danglingSample"].append({"id": ref.id, "file_object_name": ref.file_object_name})
+        if clear_dangling:
+            dangling.add(ref.id)
+
+    try:
+        objects = minio_service.iter_objects(REPORTS_PREFIX)
+        references = _iter_references(db)
+        obj = next(objects, None)
+        ref = next(references, None)
+        matched = False
+
+        while obj is not None or ref is not None:
+            if ref is None or (obj is not None and obj.object_name < ref.file_object_name):
+                report["objectsScanned"] += 1
+                if not matched:
+                    on_orphan(obj)
+                obj, matched = next(objects, None), False
+            elif obj is None or ref.file_object_name < obj.object_name:
+                report["referencesScanned"] += 1
+                on_dangling(ref)
+                ref = next(references, None)
+            else:
+                # На один объект может ссылаться несколько записей
+                report["referencesScanned"] += 1
+                matched = True
+                ref = next(references, None)
+
+        orphans.flush()
+        dangling.flush()
+    finally:
+        db.close()
+        write_db.close()
+
+    logger.info(
+        f"Сверка хранилища: сирот {report['orphanObjects']} (удалено {report['orphansDeleted']}), "
+        f"битых ссылок {report['danglingReferences']} (очищено {report['danglingCleared']})"
+    )
+    return report
+
+@router.post("/reconcile")
+def run_reconcile(
+    delete_orphans: bool = False,
+    clear_dangling: bool = False,
+    min_age_minutes: int = 60,
+    current_user: User = Depends(require_role("admin"))
+):
+    """Запускает сверку хранилища. По умолчанию только формирует отчёт."""
+    if min_age_minutes < 0:
+        raise HTTPException(status_code=400, detail="min_age_minutes должен быть >= 0")
+    try:
+        return reconcile_storage(delete_orphans, clear_dangling, min_age_minutes)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка файлов отчётов в MinIO с базой данных")
+    parser.add_argument("--delete-orphans", action="store_true", help="удалить объекты без записей в БД")
+    parser.add_argument("--clear-dangling", action="store_true", help="очистить ссылки на отсутствующие объекты")
+    parser.add_argument("--min-age-minutes", type=int, default=60, help="не трогать объекты моложе указанного возраста")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = reconcile_storage(args.delete_orphans, args.clear_dangling, args.min_age_minutes)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""Пакетный пересчёт оценок по сохранённому тексту.
+
+После изменения шаблонов или правил старые Analysis.score устаревают.
+Задача читает анализы пачками по возрастанию id (текст уже извлечён при
+анализе и хранится в Analysis.extracted_text, так что файлы заново не
+разбираются и не распознаются), прогоняет analyze_work_structure в пуле
+процессов и записывает изменившиеся оценки одним UPDATE на пачку. PDF-отчёты
+перегенерируются вторым проходом по пулу только для изменившихся анализов. Вместе
+с пачкой в той же транзакции сохраняется last_id задачи, поэтому
+прерванную задачу можно продолжить с места остановки. Тип работы остаётся
+прежним, только если его выбрал пользователь; для остальных анализов он
+определяется заново по ключевым словам текущей версии шаблонов.
+
+Запуск из командной строки:
+    python -m backend.rescore [--resume JOB_ID] [--batch-size N] [--workers N] [--no-reports]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from .database import SessionLocal, Analysis, RescoreJob, User, engine, get_db
+from .analyze import analyze_work_structure, detect_work_type, generate_report_pdf
+from .minio_service import minio_service
+from .result_format import compact_result, expand_result
+from .rules import detection_keywords
+from .template_store import template_store
+from .security import require_role
+from .config import RESCORE_BATCH_SIZE, RESCORE_WORKERS
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+logger = logging.getLogger("rescore")
+
+# Не больше одной задачи пересчёта на всю базу
+RESCORE_LOCK_ID = 7240003
+
+def _init_worker(version: int, templates: dict):
+    logging.disable(logging.INFO)
+    template_store.pin(version, templates)
+
+def _work_type_for(analysis_id: int, filename: str, content: str, stored_type: Optional[str], source: Optional[str], detection: Optional[list]) -> Optional[str]:
+    """Тип, с которым пересчитывается анализ, или None, если его нужно определить заново.
+
+    Тип сохраняется, только если его выбрал пользователь. В старых
+    результатах нет workTypeSource: тип считается выбранным пользователем,
+    если детектор той версии шаблонов (detection) определил бы другой.
+    """
+    if not stored_type or stored_type == 'unknown':
+        return None
+    if source is None:
+        source = 'detected' if detect_work_type(filename, content, detection=detection) == stored_type else 'user'
+    if source != 'user':
+        return None
+    if stored_type not in template_store.current().templates:
+        # Выбранного шаблона в текущей версии нет: оценка по запасному шаблону с прежним типом вводила бы в заблуждение
+        logging.getLogger("rescore").warning(f"Шаблона {stored_type} анализа {analysis_id} больше нет, тип определяется заново")
+        return None
+    return stored_type
+
+def _rescore_one(task: tuple) -> Optional[dict]:
+    """Выполняется в процессе пула: новый результат анализа."""
+    analysis_id, filename, content = task[:3]
+    try:
+        work_type = _work_type_for(*task)
+        return analyze_work_structure(content, filename, work_type)
+    except Exception as e:
+        logging.getLogger("rescore").error(f"Не удалось пересчитать анализ {analysis_id}: {e}")
+        return None
+
+def _render_report(task: tuple) -> Optional[bytes]:
+    """Выполняется в процессе пула: PDF-отчёт по новому результату."""
+    analysis_id, result, user_full_name = task
+    try:
+        return generate_report_pdf(result, user_full_name)
+    except Exception as e:
+        logging.getLogger("rescore").warning(f"Не удалось сформировать PDF-отчёт анализа {analysis_id}: {e}")
+        return None
+
+def _job_report(job: RescoreJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "templateVersion": job.template_version,
+        "lastId": job.last_id,
+        "processed": job.processed,
+        "updated": job.updated,
+        "unchanged": job.unchanged,
+        "failed": job.failed,
+        "createdAt": job.created_at.isoformat() if job.created_at else None,
+        "updatedAt": job.updated_at.isoformat() if job.updated_at else None,
+        "finishedAt": job.finished_at.isoformat() if job.finished_at else None,
+        "error": job.error
+    }
+
+def create_job(db: Session, user_id: int = None) -> RescoreJob:
+    job = RescoreJob(status="pending", created_by=user_id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def _rescore_batch(db: Session, job: RescoreJob, pool: ProcessPoolExecutor, workers: int, batch_size: int, reports: bool) -> bool:
+    """Одна пачка. Возвращает False, когда анализов больше нет."""
+    rows = (
+        db.query(
+            Analysis.id, Analysis.filename, Analysis.extracted_text, Analysis.full_result,
+            Analysis.score, Analysis.result_version, Analysis.file_object_name,
+            User.first_name, User.last_name
+        )
+        .outerjoin(User, User.id == Analysis.user_id)
+        .filter(
+            Analysis.id > job.last_id,
+            Analysis.deleted_at.is_(None),
+            Analysis.full_result.isnot(None),
+            func.length(func.btrim(Analysis.extracted_text)) > 0
+        )
+        .order_by(Analysis.id)
+        .limit(batch_size)
+        .all()
+    )
+    if not rows:
+        return False
+
+    tasks = []
+    stored_results = []
+    detections = {}
+    for row in rows:
+        stored = expand_result(row.full_result)
+        stored_results.append(stored)
+        detection = None
+        if 'workTypeSource' not in stored:
+            # Старый результат: тип сверяется с детектором версии шаблонов, которой он получен
+            version = row.full_result.get('templateVersion')
+            if version not in detections:
+                templates = template_store.templates(version) if version is not None else None
+                detections[version] = detection_keywords(templates) if templates else None
+            detection = detections[version]
+        tasks.append((row.id, stored.get('fileName') or row.filename, row.extracted_text, stored.get('detectedType'), stored.get('workTypeSource'), detection))
+
+    updates = []
+    report_tasks = []
+    report_objects = []
+    chunksize = max(1, len(tasks) // (workers * 4))
+    for row, stored, analysed in zip(rows, stored_results, pool.map(_rescore_one, tasks, chunksize=chunksize)):
+        if analysed is None:
+            job.failed += 1
+            continue
+        # Поля, которые добавляет эндпоинт (например, fileDetails скриншотов), сохраняются
+        result = {**stored, **analysed}
+        full_result = compact_result(result, job.template_version)
+        if result['score'] == row.score and full_result == row.full_result:
+            job.unchanged += 1
+            continue
+        if reports and row.file_object_name and minio_service:
+            report_tasks.append((row.id, analysed, f"{row.first_name or ''} {row.last_name or ''}".strip()))
+            report_objects.append(row.file_object_name)
+        updates.append({
+            'id': row.id,
+            'score': result['score'],
+            'full_result': full_result,
+            'result_version': row.result_version + 1
+        })
+
+    chunksize = max(1, len(report_tasks) // (workers * 4))
+    for (analysis_id, _, _), object_name, report in zip(report_tasks, report_objects, pool.map(_render_report, report_tasks, chunksize=chunksize)):
+        if report is None:
+            continue
+        try:
+            minio_service.upload_file(object_name, report, "application/pdf")
+        except Exception as e:
+            logger.warning(f"Не удалось обновить PDF-отчёт анализа {analysis_id}: {e}")
+
+    if updates:
+        db.execute(update(Analysis), updates)
+    job.processed += len(rows)
+    job.updated += len(updates)
+    job.last_id = rows[-1].id
+    job.updated_at = datetime.utcnow()
+    db.commit()
+    return True
+
+def _try_lock():
+    """Соединение, захватившее блокировку пересчёта, или None, если она занята.
+
+    Блокировка сессионная: её снимает _release_lock, а не закрытие
+    соединения, которое лишь возвращает его в пул.
+    """
+    conn = engine.connect()
+    try:
+        locked = conn.execute(select(func.pg_try_advisory_lock(RESCORE_LOCK_ID))).scalar()
+        # Блокировка переживает транзакцию; соединение не остаётся idle in transaction
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not locked:
+        conn.close()
+        return None
+    return conn
+
+def _release_lock(lock_conn):
+    try:
+        lock_conn.execute(select(func.pg_advisory_unlock(RESCORE_LOCK_ID)))
+        lock_conn.commit()
+    except Exception as e:
+        # Соединение, которое не удалось разблокировать, не должно вернуться в пул с блокировкой
+        logger.error(f"Не удалось снять блокировку пересчёта: {e}")
+        lock_conn.invalidate()
+    finally:
+        lock_conn.close()
+
+def run_rescore(job_id: int = None, batch_size: int = RESCORE_BATCH_SIZE, workers: int = RESCORE_WORKERS, reports: bool = True, lock_conn=None) -> dict:
+    """Выполняет новую задачу или продолжает задачу job_id с сохранённого места.
+
+    lock_conn — соединение с уже захваченной блокировкой (см. start_rescore);
+    run_rescore снимает её по завершении.
+    """
+    if lock_conn is None:
+        lock_conn = _try_lock()
+        if lock_conn is None:
+            raise RuntimeError("Пересчёт оценок уже выполняется")
+    db = SessionLocal()
+    pool = None
+    job = None
+    try:
+        job = db.get(RescoreJob, job_id) if job_id is not None else create_job(db)
+        if job is None:
+            raise ValueError(f"Задача пересчёта {job_id} не найдена")
+        if job.status == "finished":
+            return _job_report(job)
+
+        compiled = template_store.refresh()
+        if job.template_version is not None and job.template_version != compiled.version:
+            logger.warning(f"Задача {job.id} начата с шаблонами версии {job.template_version}, продолжается с версией {compiled.version}")
+        job.template_version = compiled.version
+        job.status = "running"
+        job.error = None
+        db.commit()
+        logger.info(f"Пересчёт оценок {job.id}: с id > {job.last_id}, шаблоны версии {compiled.version}")
+
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(compiled.version, compiled.templates)
+        )
+        while _rescore_batch(db, job, pool, workers, batch_size, reports):
+            logger.info(f"Пересчёт оценок {job.id}: обработано {job.processed}, изменено {job.updated}, до id {job.last_id}")
+
+        job.status = "finished"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"Пересчёт оценок {job.id} завершён: обработано {job.processed}, изменено {job.updated}, ошибок {job.failed}")
+        return _job_report(job)
+    except Exception as e:
+        db.rollback()
+        if job is not None:
+            # Пачка, на которой произошла ошибка, не сохранена и будет повторена при продолжении
+            job.status = "failed"
+            job.error = str(e)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+        logger.error(f"Пересчёт оценок прерван: {e}")
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        db.close()
+        _release_lock(lock_conn)
+
+def _rescore_in_background(job_id: int, reports: bool, lock_conn):
+    try:
+        run_rescore(job_id, reports=reports, lock_conn=lock_conn)
+    except Exception:
+        # Ошибка уже записана в задачу и в лог
+        pass
+
+def _start_in_background(job: RescoreJob, reports: bool, lock_conn):
+    try:
+        threading.Thread(target=_rescore_in_background, args=(job.id, reports, lock_conn), name=f"rescore-{job.id}", daemon=True).start()
+    except Exception:
+        _release_lock(lock_conn)
+        raise
+
+@router.post("/rescore", status_code=202)
+def start_rescore(
+    reports: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Запускает пересчёт оценок всех анализов в фоне.
+
+    Блокировка берётся до создания задачи: из двух одновременных запусков
+    второй получает 409, а не задачу, которая никогда не начнётся.
+    """
+    lock_conn = _try_lock()
+    if lock_conn is None:
+        raise HTTPException(status_code=409, detail="Пересчёт оценок уже выполняется")
+    try:
+        job = create_job(db, current_user.id)
+    except Exception:
+        _release_lock(lock_conn)
+        raise
+    _start_in_background(job, reports, lock_conn)
+    logger.info(f"Админ {current_user.id} запустил пересчёт оценок {job.id}")
+    return _job_report(job)
+
+@router.post("/rescore/{job_id}/resume", status_code=202)
+def resume_rescore(
+    job_id: int,
+    reports: bool = True,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    job = db.get(RescoreJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача пересчёта не найдена")
+    if job.status == "finished":
+        raise HTTPException(status_code=400, detail="Задача пересчёта уже завершена")
+    lock_conn = _try_lock()
+    if lock_conn is None:
+        raise HTTPException(status_code=409, detail="Пересчёт оценок уже выполняется")
+    _start_in_background(job, reports, lock_conn)
+    return _job_report(job)
+
+@router.get("/rescore")
+def list_rescore_jobs(
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    jobs = db.query(RescoreJob).order_by(RescoreJob.id.desc()).limit(min(max(limit, 1), 100)).all()
+    return [_job_report(job) for job in jobs]
+
+@router.get("/rescore/{job_id}")
+def get_rescore_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    job = db.get(RescoreJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача пересчёта не найдена")
+    return _job_report(job)
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересчёт оценок анализов по сохранённому тексту")
+    parser.add_argument("--resume", type=int, help="продолжить прерванную задачу с указанным id")
+    parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=RESCORE_WORKERS)
+    parser.add_argument("--no-reports", action="store_true", help="не перегенерировать PDF-отчёты в MinIO")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_rescore(args.resume, args.batch_size, args.workers, not args.no_reports)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
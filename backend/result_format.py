@@ -0,0 +1,145 @@
+"""Компактный формат хранения Analysis.full_result.
+
+Вместо полного описания каждого раздела (с названием и всем списком
+регулярных выражений шаблона) в БД хранятся только id раздела и флаг
+found, а также ссылка на версию шаблона. При чтении результат
+разворачивается обратно в тот же вид, который возвращает API.
+"""
+import logging
+from sqlalchemy import update
+from .database import SessionLocal, Analysis
+from .work_templates import DEFAULT_TEMPLATE
+from .template_store import get_template, template_store
+
+logger = logging.getLogger("result_format")
+
+RESULT_FORMAT_VERSION = 1
+LIST_FIELDS = ('errors', 'warnings', 'recommendations')
+EMPTY_STRUCTURE_DETAILS = {
+    'totalSectionsChecked': 0,
+    'requiredSectionsFound': 0,
+    'totalRequiredSections': 0,
+    'contentLength': 0,
+    'detectionConfidence': 'low'
+}
+
+def _template_key(detected_type: str, version: int) -> str:
+    return detected_type if get_template(detected_type, version) else DEFAULT_TEMPLATE
+
+def _expand_sections(template: dict, flags: list) -> tuple[list, list]:
+    known = {s['id']: (s, False) for s in template['required_sections']}
+    known.update({s['id']: (s, True) for s in template.get('optional_sections', [])})
+
+    sections_found, sections_missing = [], []
+    for section_id, found in flags:
+        section, optional = known[section_id]
+        entry = {**section, 'found': bool(found)}
+        if optional:
+            entry['optional'] = True
+        elif not found:
+            sections_missing.append(section['name'])
+        sections_found.append(entry)
+    return sections_found, sections_missing
+
+def compact_result(result: dict, template_version: int = None) -> dict:
+    """Сжимает результат анализа для хранения в БД.
+
+    По умолчанию используется текущая версия шаблонов. Если результат нельзя
+    восстановить без потерь (например, разделы не совпадают с шаблоном или
+    шаблоны успели смениться после анализа), он возвращается без изменений.
+    """
+    if not result or 'formatVersion' in result:
+        return result
+    if template_version is None:
+        template_version = template_store.current().version
+
+    compact = {'formatVersion': RESULT_FORMAT_VERSION}
+    sections = result.get('sectionsFound') or []
+    if sections:
+        template = get_template(_template_key(result.get('detectedType'), template_version), template_version)
+        if template is None:
+            return result
+        flags = [[s.get('id'), int(bool(s.get('found')))] for s in sections]
+        try:
+            expanded = _expand_sections(template, flags)
+        except KeyError:
+            return result
+        if expanded != (sections, result.get('sectionsMissing') or []):
+            return result
+        compact['templateVersion'] = template_version
+        compact['sections'] = flags
+    elif result.get('sectionsMissing'):
+        return result
+
+    for key, value in result.items():
+        if key in ('sectionsFound', 'sectionsMissing'):
+            continue
+        if key in LIST_FIELDS and value == []:
+            continue
+        if key == 'structureDetails' and value == EMPTY_STRUCTURE_DETAILS:
+            continue
+        compact[key] = value
+    return compact
+
+def expand_result(stored: dict) -> dict:
+    """Разворачивает сохранённый результат в формат ответа API."""
+    if not stored or 'formatVersion' not in stored:
+        return stored
+
+    result = {k: v for k, v in stored.items() if k not in ('formatVersion', 'templateVersion', 'sections')}
+    for key in LIST_FIELDS:
+        result.setdefault(key, [])
+    result.setdefault('structureDetails', dict(EMPTY_STRUCTURE_DETAILS))
+
+    sections_found, sections_missing = [], []
+    flags = stored.get('sections')
+    if flags:
+        version = stored.get('templateVersion')
+        template = get_template(_template_key(stored.get('detectedType'), version), version)
+        if template is None:
+            logger.warning(f"Неизвестная версия шаблона: {version}")
+            sections_found = [{'id': sid, 'name': sid, 'patterns': [], 'found': bool(found)} for sid, found in flags]
+        else:
+            sections_found, sections_missing = _expand_sections(template, flags)
+    result['sectionsFound'] = sections_found
+    result['sectionsMissing'] = sections_missing
+    return result
+
+def compact_stored_results(batch_size: int = 500) -> int:
+    """Переводит сохранённые ранее результаты в компактный формат пачками."""
+    converted = 0
+    last_id = 0
+    try:
+        while True:
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(Analysis.id, Analysis.full_result)
+                    .filter(
+                        Analysis.id > last_id,
+                        Analysis.full_result.isnot(None),
+                        ~Analysis.full_result.has_key('formatVersion')
+                    )
+                    .order_by(Analysis.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                updates = []
+                for row in rows:
+                    compact = compact_result(row.full_result)
+                    if compact is not row.full_result:
+                        updates.append({'id': row.id, 'full_result': compact})
+                if updates:
+                    db.execute(update(Analysis), updates)
+                    db.commit()
+                    converted += len(updates)
+            finally:
+                db.close()
+    except Exception as e:
+        logger.error(f"Ошибка при сжатии сохранённых результатов: {e}")
+    logger.info(f"Переведено в компактный формат записей: {converted}")
+    return converted
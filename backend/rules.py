@@ -0,0 +1,266 @@
+"""Правила анализа над индексом документа.
+
+Текст нормализуется один раз в DocumentIndex: нижний регистр и схлопнутые
+пробелы. Шаблоны разделов, ключевые слова типов работ и условия правил
+разворачиваются в литералы, и каждый литерал ищется в документе не больше
+одного раза, сколько бы правил и шаблонов на него ни ссылалось, поэтому
+стоимость растёт с числом разных литералов, а не с числом правил. Шаблоны,
+которые нельзя развернуть в литералы, проверяются отдельным re.search, как
+раньше.
+
+Один проход по тексту со всеми литералами сразу (префиксное регулярное
+выражение) на встроенных шаблонах (~100 литералов) вдвое медленнее: поиск
+подстроки в str идёт на C и останавливается на первом вхождении, а
+регулярное выражение проходит весь текст в движке re.
+
+Правила (Rule) декларативны: условие над индексом плюс сообщение
+(ошибка, предупреждение, рекомендация) и/или бонус к оценке.
+"""
+import re
+from abc import ABC, abstractmethod
+from functools import cached_property, lru_cache
+from typing import Iterable, Optional
+
+REGEX_META = set(".^$*+?{}()|\\[]")
+# Шаблон с символьными классами разворачивается не более чем в столько литералов
+MAX_LITERAL_VARIANTS = 64
+
+@lru_cache(maxsize=4096)
+def pattern_literals(pattern: str) -> Optional[tuple]:
+    """Разворачивает регулярное выражение без учёта регистра в набор литералов
+    для нормализованного текста или возвращает None, если это невозможно.
+
+    Поддерживаются обычные символы, экранированные символы, \\s+ (пробел)
+    и простые классы вида [1-4] или [ая].
+    """
+    variants = [""]
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if pattern.startswith(r"\s+", i):
+            piece, i = [" "], i + 3
+        elif ch == "\\":
+            if i + 1 >= len(pattern) or pattern[i + 1] not in REGEX_META | {"-", "/"}:
+                return None
+            piece, i = [pattern[i + 1]], i + 2
+        elif ch == "[":
+            end = pattern.find("]", i)
+            piece = _expand_class(pattern[i + 1:end]) if end > i else None
+            if piece is None:
+                return None
+            i = end + 1
+        elif ch in REGEX_META or ch.isspace():
+            # Одиночный пробел в шаблоне означает ровно один пробел, а не любую их последовательность
+            return None
+        else:
+            piece, i = [ch], i + 1
+        if i < len(pattern) and pattern[i] in "*+?{":
+            return None
+        variants = [v + p.lower() for v in variants for p in piece]
+        if len(variants) > MAX_LITERAL_VARIANTS:
+            return None
+    # Нормализованный текст не начинается и не заканчивается пробелом
+    if not variants[0] or variants[0][0] == " " or variants[0][-1] == " ":
+        return None
+    return tuple(variants)
+
+class CompiledPattern:
+    """Шаблон раздела, разобранный один раз: литералы или скомпилированное выражение."""
+    __slots__ = ("pattern", "literals", "regex")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.literals = pattern_literals(pattern)
+        # re.error для некорректного выражения поднимается здесь, а не при анализе
+        self.regex = re.compile(pattern, re.IGNORECASE) if self.literals is None else None
+
+compile_pattern = lru_cache(maxsize=4096)(CompiledPattern)
+
+def _expand_class(body: str) -> Optional[list[str]]:
+    if not body or body[0] == "^" or "\\" in body:
+        return None
+    chars = []
+    i = 0
+    while i < len(body):
+        if i + 2 < len(body) and body[i + 1] == "-":
+            start, end = ord(body[i]), ord(body[i + 2])
+            if end < start or end - start > MAX_LITERAL_VARIANTS:
+                return None
+            chars.extend(chr(c) for c in range(start, end + 1))
+            i += 3
+        else:
+            chars.append(body[i])
+            i += 1
+    return chars
+
+# Признаки, которые нельзя выразить литералами: (выражение, по какому тексту искать)
+FEATURES = {
+    'numbered_steps': (re.compile(r'\d+\.\s+|\n\s*\d+\)'), 'text'),
+    'citations': (re.compile(r'\[\d+\]|\([А-Яа-я]+\s*,\s*\d{4}\)'), 'text'),
+    'page_refs': (re.compile(r'\bстр\.\s*\d+|\bс\.\s*\d+|\bpage\s*\d+'), 'lower'),
+    'decimal_numbers': (re.compile(r'\d+\.\d+|[a-zA-Z]\.\d+'), 'text'),
+}
+
+class DocumentIndex:
+    """Текст документа, нормализованный один раз для всех проверок."""
+
+    def __init__(self, content: str):
+        self.text = content
+        self.length = len(content)
+        self.lower = content.lower()
+        self._literals = {}
+        self._features = {}
+
+    @cached_property
+    def normalized(self) -> str:
+        # str.split() и \s в re считают пробельными одни и те же символы
+        return " ".join(self.lower.split())
+
+    def has_literal(self, literal: str) -> bool:
+        found = self._literals.get(literal)
+        if found is None:
+            # Литерал без пробелов одинаково входит в текст до и после нормализации
+            found = literal in (self.normalized if " " in literal else self.lower)
+            self._literals[literal] = found
+        return found
+
+    def count(self, pattern: str) -> int:
+        """Число непересекающихся вхождений шаблона без учёта регистра."""
+        literals = pattern_literals(pattern)
+        if literals is not None:
+            return sum((self.normalized if " " in l else self.lower).count(l) for l in literals)
+        return len(re.findall(pattern, self.lower))
+
+    def matches(self, pattern) -> bool:
+        """Есть ли в тексте совпадение шаблона (строки или CompiledPattern) без учёта регистра."""
+        if not isinstance(pattern, CompiledPattern):
+            pattern = compile_pattern(pattern)
+        if pattern.literals is not None:
+            return any(self.has_literal(l) for l in pattern.literals)
+        return pattern.regex.search(self.text) is not None
+
+    def matches_any(self, patterns: Iterable) -> bool:
+        return any(self.matches(p) for p in patterns)
+
+    def feature(self, name: str) -> bool:
+        if name not in self._features:
+            regex, source = FEATURES[name]
+            self._features[name] = regex.search(self.lower if source == 'lower' else self.text) is not None
+        return self._features[name]
+
+class Condition(ABC):
+    patterns: tuple = ()
+
+    @abstractmethod
+    def __call__(self, index: DocumentIndex) -> bool:
+        ...
+
+class Contains(Condition):
+    def __init__(self, *patterns: str):
+        self.patterns = patterns
+
+    def __call__(self, index):
+        return index.matches_any(self.patterns)
+
+class CountBelow(Condition):
+    def __init__(self, limit: int, *patterns: str):
+        self.limit = limit
+        self.patterns = patterns
+
+    def __call__(self, index):
+        return sum(index.count(p) for p in self.patterns) < self.limit
+
+class HasFeature(Condition):
+    def __init__(self, name: str):
+        self.name = name
+
+    def __call__(self, index):
+        return index.feature(self.name)
+
+class LengthBelow(Condition):
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def __call__(self, index):
+        return index.length < self.limit
+
+class LengthAbove(Condition):
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    def __call__(self, index):
+        return index.length > self.limit
+
+class Not(Condition):
+    def __init__(self, condition: Condition):
+        self.condition = condition
+        self.patterns = condition.patterns
+
+    def __call__(self, index):
+        return not self.condition(index)
+
+class Rule:
+    """Если условие выполнено для документа подходящего типа, в результат
+    добавляется сообщение в список severity и/или бонус к оценке."""
+
+    def __init__(self, id: str, condition: Condition, work_types=None, severity: str = None, message: str = None, bonus: int = 0):
+        self.id = id
+        self.condition = condition
+        self.work_types = frozenset(work_types) if work_types else None
+        self.severity = severity
+        self.message = message
+        self.bonus = bonus
+
+    def applies(self, work_type: str) -> bool:
+        return self.work_types is None or work_type in self.work_types
+
+# Ключевые слова для определения типа работы, проверяются по порядку. Шаблон
+# может задать свои в поле keywords (так определяются и новые типы работ)
+WORK_TYPE_KEYWORDS = {
+    'course_work': ['курсовая', 'coursework', 'course_work'],
+    'lab_report': ['лабораторная', 'lab', 'отчет', 'laboratory'],
+    'essay': ['реферат', 'эссе', 'essay'],
+    'thesis': ['диплом', 'thesis', 'вкр', 'дипломная']
+}
+
+STRUCTURE_RULES = [
+    Rule('lab_numbered_steps', Not(HasFeature('numbered_steps')), {'lab_report'}, 'warnings',
+         "Рекомендуется оформить ход работы в виде нумерованных шагов"),
+    Rule('lab_experiment', Not(Contains('эксперимент', 'опыт', 'исследование', 'результат')), {'lab_report'}, 'warnings',
+         "Рекомендуется добавить описание эксперимента или исследований"),
+    Rule('course_volume', LengthBelow(8000), {'course_work'}, 'warnings',
+         "Объем курсовой работы может быть недостаточным (рекомендуется 10-30 страниц)"),
+    Rule('course_citations', Not(HasFeature('citations')), {'course_work'}, 'recommendations',
+         "Рекомендуется добавить ссылки на литературу в тексте"),
+    Rule('thesis_volume', LengthBelow(20000), {'thesis'}, 'errors',
+         "Объем дипломной работы недостаточен (рекомендуется 40-80 страниц)"),
+    Rule('thesis_chapters', CountBelow(2, r'глава\s+[1-4]'), {'thesis'}, 'errors',
+         "Дипломная работа должна содержать не менее 2 глав"),
+]
+
+BONUS_RULES = [
+    Rule('page_refs', HasFeature('page_refs'), bonus=5),
+    Rule('figures', Contains(r'рис\.', 'рисунок', 'таблица', 'table', 'figure'), bonus=5),
+    Rule('numbers', HasFeature('decimal_numbers'), bonus=10),
+    Rule('thesis_long', LengthAbove(40000), {'thesis'}, bonus=5),
+    Rule('course_long', LengthAbove(15000), {'course_work'}, bonus=5),
+]
+
+def detection_keywords(templates: dict) -> list[tuple[str, tuple]]:
+    """Типы работ и их ключевые слова в порядке проверки: встроенные типы
+    в порядке WORK_TYPE_KEYWORDS, затем добавленные через шаблоны."""
+    order = [t for t in WORK_TYPE_KEYWORDS if t in templates] + [t for t in templates if t not in WORK_TYPE_KEYWORDS]
+    detection = []
+    for work_type in order:
+        keywords = templates[work_type].get('keywords') or WORK_TYPE_KEYWORDS.get(work_type)
+        if keywords:
+            detection.append((work_type, tuple(keywords)))
+    return detection
+
+def apply_rules(index: DocumentIndex, analysis_result: dict, work_type: str):
+    for rule in STRUCTURE_RULES:
+        if rule.applies(work_type) and rule.condition(index):
+            analysis_result[rule.severity].append(rule.message)
+
+def rules_bonus(index: DocumentIndex, work_type: str) -> int:
+    return sum(rule.bonus for rule in BONUS_RULES if rule.applies(work_type) and rule.condition(index))
@@ -0,0 +1,64 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+
+class SectionResult(BaseModel):
+    id: str
+    name: str
+    patterns: list[str] = []
+    found: bool
+    optional: Optional[bool] = None
+
+class StructureDetails(BaseModel):
+    totalSectionsChecked: int = 0
+    requiredSectionsFound: int = 0
+    totalRequiredSections: int = 0
+    contentLength: int = 0
+    detectionConfidence: str = "low"
+
+class FileDetails(BaseModel):
+    totalScreenshots: int
+    validScreenshots: int
+    invalidScreenshots: int
+    validFiles: list[str]
+    invalidFiles: list[str]
+    combinedTextLength: int
+
+class SimilarDocument(BaseModel):
+    analysisId: int
+    similarity: float
+    ownSubmission: bool
+
+class AnalysisResult(BaseModel):
+    # Старые записи могут содержать поля, которых нет в схеме
+    model_config = ConfigDict(extra="allow")
+
+    fileName: str
+    fileType: str
+    workType: str
+    detectedType: str
+    # user — тип указан при загрузке, detected — определён по тексту
+    workTypeSource: Optional[str] = None
+    isValid: bool
+    score: int
+    status: Optional[str] = None
+    sectionsFound: list[SectionResult] = []
+    sectionsMissing: list[str] = []
+    errors: list[str] = []
+    warnings: list[str] = []
+    recommendations: list[str] = []
+    structureDetails: StructureDetails
+    fileDetails: Optional[FileDetails] = None
+    similarDocuments: Optional[list[SimilarDocument]] = None
+
+class MultipleAnalysisResponse(BaseModel):
+    totalFiles: int
+    processedFiles: int
+    results: list[AnalysisResult]
+
+class BatchDetailsError(BaseModel):
+    status: int
+    detail: str
+
+class BatchDetailsResponse(BaseModel):
+    results: dict[int, AnalysisResult]
+    errors: dict[int, BatchDetailsError]
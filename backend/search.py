@@ -0,0 +1,127 @@
+import html
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, desc
+from sqlalchemy.orm import Session
+from .database import Analysis, User, get_db
+from .dependencies import get_current_user
+
+router = APIRouter(prefix="/api", tags=["Search"])
+
+SEARCH_CONFIGS = ("russian", "english")
+# ts_headline выделяет совпадения символами из области частного использования:
+# текст работы экранируется уже после, и в сниппете нет разметки, кроме <mark>
+MARK_START = "\ue000"
+MARK_STOP = "\ue001"
+HEADLINE_OPTIONS = f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter= … "
+
+def build_ts_query(query: str):
+    """Объединяет запросы для русской и английской конфигураций через OR."""
+    ts_query = None
+    for config in SEARCH_CONFIGS:
+        part = func.websearch_to_tsquery(config, query)
+        ts_query = part if ts_query is None else ts_query.op("||")(part)
+    return ts_query
+
+def render_snippet(headline: str) -> str:
+    """Экранирует HTML в сниппете и заменяет маркеры совпадений на <mark>."""
+    return html.escape(headline).replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>")
+
+def build_snippets(db: Session, ids: list[int], q: str) -> dict:
+    """Сниппеты с подсветкой для строк страницы.
+
+    Строка подсвечивается в конфигурации, запрос которой в ней совпал:
+    следующая конфигурация пробуется только для строк, где предыдущая
+    ничего не выделила (например, английский текст или совпадение только
+    в имени файла).
+    """
+    # Маркеры, встречающиеся в самом тексте, убираются, чтобы не дать лишних <mark>
+    text = func.translate(func.coalesce(Analysis.extracted_text, ""), MARK_START + MARK_STOP, "")
+    headlines = {}
+    pending = ids
+    for config in SEARCH_CONFIGS:
+        if not pending:
+            break
+        rows = (
+            db.query(Analysis.id, func.ts_headline(config, text, func.websearch_to_tsquery(config, q), HEADLINE_OPTIONS))
+            .filter(Analysis.id.in_(pending))
+            .all()
+        )
+        for analysis_id, headline in rows:
+            if analysis_id not in headlines or MARK_START in headline:
+                headlines[analysis_id] = headline
+        pending = [analysis_id for analysis_id, headline in rows if MARK_START not in headline]
+    return {analysis_id: render_snippet(headline) for analysis_id, headline in headlines.items()}
+
+@router.get("/search")
+def search_analyses(
+    q: str,
+    page: int = 1,
+    limit: int = 10,
+    user_id: int = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Полнотекстовый поиск по содержимому загруженных работ."""
+    q = (q or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Поисковый запрос не может быть пустым")
+    if len(q) > 200:
+        raise HTTPException(status_code=400, detail="Поисковый запрос слишком длинный")
+    if page < 1: page = 1
+    if limit < 1 or limit > 50: limit = 10
+
+    if current_user.role != "admin":
+        user_id = current_user.id
+
+    ts_query = build_ts_query(q)
+    rank = func.ts_rank_cd(Analysis.search_vector, ts_query).label("rank")
+
+    query = db.query(Analysis.id).filter(
+        Analysis.search_vector.op("@@")(ts_query),
+        Analysis.deleted_at.is_(None)
+    )
+    if user_id is not None:
+        query = query.filter(Analysis.user_id == user_id)
+
+    total = query.count()
+
+    rows = (
+        query.with_entities(
+            Analysis.id,
+            Analysis.user_id,
+            Analysis.filename,
+            Analysis.score,
+            Analysis.created_at,
+            Analysis.file_object_name,
+            rank,
+        )
+        .order_by(desc("rank"), Analysis.created_at.desc())
+        .offset((page - 1) * limit)
+        .limit(limit)
+        .all()
+    )
+
+    # ts_headline дорогой, поэтому сниппеты строятся только для текущей страницы
+    snippets = build_snippets(db, [row.id for row in rows], q) if rows else {}
+
+    return {
+        "items": [
+            {
+                "id": row.id,
+                "user_id": row.user_id,
+                "filename": row.filename,
+                "score": row.score,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "has_file": bool(row.file_object_name),
+                "rank": round(float(row.rank), 4),
+                "snippet": snippets.get(row.id) or ""
+            }
+            for row in rows
+        ],
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "total_pages": (total + limit - 1) // limit,
+        "query": q,
+        "scope": "user" if user_id is not None else "all"
+    }
@@ -0,0 +1,338 @@
+"""Поиск почти одинаковых работ по MinHash-подписям и LSH-индексу.
+
+Текст разбивается на шинглы по SHINGLE_WORDS слов, и по ним строится
+MinHash-подпись из NUM_PERM значений. Используется хеширование одной
+перестановкой с уплотнением пустых корзин: одна хеш-функция на шингл
+вместо NUM_PERM, поэтому подпись дипломной работы считается за
+миллисекунды на чистом Python. Подпись делится на LSH_BANDS полос по
+LSH_ROWS значений, и хеш каждой полосы хранится в lsh_buckets. Кандидаты
+ищутся по первичному ключу (полоса, корзина), так что время поиска не
+зависит от числа сохранённых работ. Сходство кандидатов оценивается по
+доле совпавших значений подписей.
+
+При LSH_BANDS=16 и LSH_ROWS=8 пара с долей общих шинглов 0.8 попадает
+в кандидаты с вероятностью ~95%, а пара с долей 0.5 — ~6%.
+
+Подписи для анализов, загруженных до появления индекса:
+    python -m backend.similarity --backfill
+"""
+import argparse
+import hashlib
+import logging
+import re
+import struct
+import zlib
+from collections import defaultdict
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from .database import SessionLocal, Analysis, DocumentSignature, LshBucket, User, get_db
+from .metrics import timed
+from .security import require_role
+from .config import SIMILARITY_THRESHOLD, SIMILARITY_TOP_N
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+logger = logging.getLogger("similarity")
+
+WORD = re.compile(r"\w+")
+SHINGLE_WORDS = 5
+# Более короткие тексты совпадают случайно (титульные листы, шаблонные фразы)
+MIN_SHINGLES = 50
+NUM_PERM = 128
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+MASK64 = (1 << 64) - 1
+# Старшие 7 бит хеша шингла — номер корзины, остальные 57 — значение
+VALUE_BITS = 64 - (NUM_PERM - 1).bit_length()
+VALUE_MASK = (1 << VALUE_BITS) - 1
+# Больше любого значения; при уплотнении им же помечается расстояние до непустой корзины
+EMPTY = 1 << VALUE_BITS
+ROLLING_BASE = 1000003
+ROLLING_TOP = pow(ROLLING_BASE, SHINGLE_WORDS - 1, 1 << 64)
+SIGNATURE_FORMAT = f"<{NUM_PERM}Q"
+# Сколько кандидатов проверяется по подписям при одном поиске
+MAX_CANDIDATES = 100
+# Корзины с большим числом работ (общий шаблон текста) не дают пар для кластеров
+MAX_BUCKET_SIZE = 200
+
+def _mix(x: int) -> int:
+    """Финализатор splitmix64: равномерно перемешивает биты."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def _word_hashes(text: str) -> list[int]:
+    """Случайные 64-битные значения слов; каждое уникальное слово хешируется один раз."""
+    values = {}
+    hashes = []
+    for word in WORD.findall(text.lower()):
+        value = values.get(word)
+        if value is None:
+            value = values[word] = _mix(zlib.crc32(word.encode("utf-8")))
+        hashes.append(value)
+    return hashes
+
+@timed("similarity_signature")
+def compute_signature(text: str) -> Optional[list[int]]:
+    """MinHash-подпись текста или None, если текст слишком короткий.
+
+    Хеш шингла — скользящий полиномиальный хеш значений его слов, поэтому
+    на шингл приходится одно умножение; старшие биты хеша выбирают корзину,
+    младшие служат значением.
+    """
+    hashes = _word_hashes(text)
+    if len(hashes) - SHINGLE_WORDS + 1 < MIN_SHINGLES:
+        return None
+    bins = [EMPTY] * NUM_PERM
+    h = 0
+    for value in hashes[:SHINGLE_WORDS]:
+        h = (h * ROLLING_BASE + value) & MASK64
+    bins[h >> VALUE_BITS] = h & VALUE_MASK
+    for old, new in zip(hashes, hashes[SHINGLE_WORDS:]):
+        h = ((h - old * ROLLING_TOP) * ROLLING_BASE + new) & MASK64
+        i = h >> VALUE_BITS
+        value = h & VALUE_MASK
+        if value < bins[i]:
+            bins[i] = value
+    # Пустая корзина берёт значение ближайшей непустой справа, помеченное расстоянием до неё
+    signature = list(bins)
+    for i in range(NUM_PERM):
+        if bins[i] == EMPTY:
+            distance = 1
+            while bins[(i + distance) % NUM_PERM] == EMPTY:
+                distance += 1
+            signature[i] = bins[(i + distance) % NUM_PERM] + distance * EMPTY
+    return signature
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Оценка коэффициента Жаккара по доле совпавших значений подписей."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+def band_buckets(signature: list[int]) -> list[tuple[int, int]]:
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<{LSH_ROWS}Q", *rows), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+def pack_signature(signature: list[int]) -> bytes:
+    return struct.pack(SIGNATURE_FORMAT, *signature)
+
+def unpack_signature(data: bytes) -> list[int]:
+    return list(struct.unpack(SIGNATURE_FORMAT, data))
+
+def _signatures(db: Session, analysis_ids) -> dict:
+    rows = (
+        db.query(DocumentSignature.analysis_id, DocumentSignature.signature)
+        .join(Analysis, Analysis.id == DocumentSignature.analysis_id)
+        .filter(DocumentSignature.analysis_id.in_(analysis_ids), Analysis.deleted_at.is_(None))
+        .all()
+    )
+    return {row.analysis_id: unpack_signature(row.signature) for row in rows}
+
+def similar_analyses(db: Session, signature: list[int], exclude_id: int = None,
+                     threshold: float = SIMILARITY_THRESHOLD, limit: int = SIMILARITY_TOP_N) -> list[tuple[int, float]]:
+    """(id анализа, сходство) по убыванию сходства."""
+    query = (
+        db.query(LshBucket.analysis_id, func.count().label("bands"))
+        .filter(tuple_(LshBucket.band, LshBucket.bucket).in_(band_buckets(signature)))
+    )
+    if exclude_id is not None:
+        query = query.filter(LshBucket.analysis_id != exclude_id)
+    candidates = query.group_by(LshBucket.analysis_id).order_by(func.count().desc()).limit(MAX_CANDIDATES).all()
+    if not candidates:
+        return []
+    scored = [
+        (analysis_id, similarity(signature, other))
+        for analysis_id, other in _signatures(db, [c.analysis_id for c in candidates]).items()
+    ]
+    scored = [item for item in scored if item[1] >= threshold]
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+def find_similar_documents(db: Session, analysis_result: dict, content: str, user_id: int) -> Optional[list[int]]:
+    """Считает подпись текста и добавляет в результат похожие ранее загруженные работы.
+
+    Возвращает подпись, чтобы после сохранения анализа внести её в индекс.
+    """
+    signature = compute_signature(content)
+    if signature is None:
+        return None
+    try:
+        # Ошибка поиска не должна прерывать транзакцию, в которой сохраняется анализ
+        with db.begin_nested():
+            similar = similar_analyses(db, signature)
+            owners = dict(
+                db.query(Analysis.id, Analysis.user_id).filter(Analysis.id.in_([a for a, _ in similar])).all()
+            ) if similar else {}
+    except Exception as e:
+        logger.warning(f"Не удалось найти похожие работы: {e}")
+        return signature
+    if similar:
+        analysis_result['similarDocuments'] = [
+            {'analysisId': analysis_id, 'similarity': round(score, 3), 'ownSubmission': owners.get(analysis_id) == user_id}
+            for analysis_id, score in similar
+        ]
+        logger.info(f"Найдено похожих работ: {len(similar)}, максимальное сходство {similar[0][1]:.2f}")
+    return signature
+
+def index_signature(db: Session, analysis_id: int, signature: Optional[list[int]]):
+    """Добавляет подпись анализа в индекс в текущей транзакции."""
+    if signature is None:
+        return
+    db.add(DocumentSignature(analysis_id=analysis_id, signature=pack_signature(signature)))
+    db.add_all(LshBucket(band=band, bucket=bucket, analysis_id=analysis_id) for band, bucket in band_buckets(signature))
+
+def similarity_clusters(db: Session, threshold: float = SIMILARITY_THRESHOLD, min_size: int = 2) -> list[list[tuple[int, float]]]:
+    """Группы работ, связанных попарным сходством не ниже threshold."""
+    pairs = set()
+    buckets = (
+        db.query(func.array_agg(LshBucket.analysis_id))
+        .group_by(LshBucket.band, LshBucket.bucket)
+        .having(func.count() > 1, func.count() <= MAX_BUCKET_SIZE)
+        .yield_per(1000)
+    )
+    for (members,) in buckets:
+        members = sorted(members)
+        pairs.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+
+    ids = sorted({i for pair in pairs for i in pair})
+    signatures = {}
+    for start in range(0, len(ids), 1000):
+        signatures.update(_signatures(db, ids[start:start + 1000]))
+
+    parent = {}
+    def find(x):
+        while parent.get(x, x) != x:
+            x = parent[x]
+        return x
+
+    best = defaultdict(float)
+    for a, b in pairs:
+        if a not in signatures or b not in signatures:
+            continue
+        score = similarity(signatures[a], signatures[b])
+        if score >= threshold:
+            parent[find(a)] = find(b)
+            best[a] = max(best[a], score)
+            best[b] = max(best[b], score)
+
+    groups = defaultdict(list)
+    for analysis_id in best:
+        groups[find(analysis_id)].append((analysis_id, best[analysis_id]))
+    clusters = [sorted(group) for group in groups.values() if len(group) >= min_size]
+    clusters.sort(key=lambda group: (-len(group), group[0][0]))
+    return clusters
+
+def _describe(db: Session, analysis_ids) -> dict:
+    rows = (
+        db.query(Analysis.id, Analysis.user_id, Analysis.filename, Analysis.score, Analysis.created_at, User.email)
+        .outerjoin(User, User.id == Analysis.user_id)
+        .filter(Analysis.id.in_(analysis_ids))
+        .all()
+    )
+    return {
+        row.id: {
+            "analysisId": row.id,
+            "userId": row.user_id,
+            "userEmail": row.email,
+            "filename": row.filename,
+            "score": row.score,
+            "createdAt": row.created_at.isoformat() if row.created_at else None
+        }
+        for row in rows
+    }
+
+@router.get("/similarity/clusters")
+def get_similarity_clusters(
+    threshold: float = SIMILARITY_THRESHOLD,
+    min_size: int = 2,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Кластеры почти одинаковых работ, самые крупные первыми."""
+    if not 0 < threshold <= 1:
+        raise HTTPException(status_code=400, detail="threshold должен быть в диапазоне (0, 1]")
+    clusters = similarity_clusters(db, threshold, max(min_size, 2))
+    total = len(clusters)
+    clusters = clusters[:min(max(limit, 1), 500)]
+    details = _describe(db, [analysis_id for group in clusters for analysis_id, _ in group])
+    return {
+        "threshold": threshold,
+        "totalClusters": total,
+        "clusters": [
+            {
+                "size": len(group),
+                "users": len({details[a]["userId"] for a, _ in group if a in details}),
+                "analyses": [{**details[a], "similarity": round(score, 3)} for a, score in group if a in details]
+            }
+            for group in clusters
+        ]
+    }
+
+@router.get("/similarity/{analysis_id}")
+def get_similar_analyses(
+    analysis_id: int,
+    threshold: float = SIMILARITY_THRESHOLD,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    row = db.query(DocumentSignature.signature).filter(DocumentSignature.analysis_id == analysis_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Подпись анализа не найдена")
+    similar = similar_analyses(db, unpack_signature(row.signature), analysis_id, threshold, min(max(limit, 1), 100))
+    details = _describe(db, [a for a, _ in similar])
+    return [{**details[a], "similarity": round(score, 3)} for a, score in similar if a in details]
+
+def backfill_signatures(batch_size: int = 200) -> int:
+    """Строит подписи для анализов с сохранённым текстом, но без подписи."""
+    indexed = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = (
+                db.query(Analysis.id, Analysis.extracted_text)
+                .outerjoin(DocumentSignature, DocumentSignature.analysis_id == Analysis.id)
+                .filter(
+                    Analysis.id > last_id,
+                    Analysis.deleted_at.is_(None),
+                    Analysis.extracted_text.isnot(None),
+                    DocumentSignature.analysis_id.is_(None)
+                )
+                .order_by(Analysis.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            for row in rows:
+                signature = compute_signature(row.extracted_text)
+                if signature is not None:
+                    index_signature(db, row.id, signature)
+                    indexed += 1
+            db.commit()
+            logger.info(f"Подписи построены до id {last_id}, всего {indexed}")
+    finally:
+        db.close()
+    return indexed
+
+def main():
+    parser = argparse.ArgumentParser(description="Индекс почти одинаковых работ")
+    parser.add_argument("--backfill", action="store_true", help="построить подписи для старых анализов")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.backfill:
+        print(f"Построено подписей: {backfill_signatures(args.batch_size)}")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
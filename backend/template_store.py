@@ -0,0 +1,268 @@
+"""Шаблоны типов работ в БД с версиями и кешем скомпилированных шаблонов.
+
+Набор шаблонов версионируется целиком: каждое изменение через админские
+эндпоинты записывает новую версию со всеми шаблонами, поэтому компактные
+результаты (result_format) ссылаются на один номер версии. Воркер держит
+текущую версию уже разобранной (CompiledTemplates: литералы, выражения,
+ключевые слова типов) и не чаще раза в TEMPLATE_REFRESH_SECONDS
+проверяет в БД номер последней версии; перечитывает и компилирует шаблоны
+он только когда номер изменился. Старые версии неизменяемы и кешируются.
+"""
+import logging
+import re
+import threading
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Path
+from pydantic import BaseModel, Field
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from .database import SessionLocal, User, WorkTemplate, get_db
+from .rules import compile_pattern, detection_keywords
+from .security import require_role
+from .work_templates import DEFAULT_TEMPLATE, TEMPLATE_HISTORY, TEMPLATE_VERSION, WORK_TYPE_TEMPLATES
+from .config import TEMPLATE_REFRESH_SECONDS
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+logger = logging.getLogger("template_store")
+
+# Сериализует создание версий между воркерами
+TEMPLATE_LOCK_ID = 7240002
+WORK_TYPE_PATTERN = r"^[a-z][a-z0-9_]{0,31}$"
+
+class CompiledTemplate:
+    def __init__(self, template: dict):
+        self.name = template['name']
+        self.required = [(s, tuple(compile_pattern(p) for p in s['patterns'])) for s in template['required_sections']]
+        self.optional = [(s, tuple(compile_pattern(p) for p in s['patterns'])) for s in template.get('optional_sections', [])]
+
+class CompiledTemplates:
+    """Все шаблоны одной версии, готовые к анализу."""
+
+    def __init__(self, version: int, templates: dict):
+        self.version = version
+        self.templates = templates
+        self.by_type = {work_type: CompiledTemplate(t) for work_type, t in templates.items()}
+        self.detection = detection_keywords(templates)
+
+    def get(self, work_type: str) -> CompiledTemplate:
+        return self.by_type.get(work_type) or self.by_type[DEFAULT_TEMPLATE]
+
+def _load_version(db: Session, version: int) -> dict:
+    rows = db.query(WorkTemplate).filter(WorkTemplate.version == version).all()
+    return {row.work_type: row.definition for row in rows}
+
+class TemplateStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = CompiledTemplates(TEMPLATE_VERSION, WORK_TYPE_TEMPLATES)
+        # Версии не меняются после записи, поэтому кешируются без срока
+        self._history = dict(TEMPLATE_HISTORY)
+        self._checked_at = float("-inf")
+
+    def current(self) -> CompiledTemplates:
+        """Текущая версия; проверка БД не чаще раза в TEMPLATE_REFRESH_SECONDS.
+
+        Пока один поток перечитывает шаблоны, остальные не ждут его и
+        работают с предыдущей версией.
+        """
+        if time.monotonic() - self._checked_at >= TEMPLATE_REFRESH_SECONDS and self._lock.acquire(blocking=False):
+            try:
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._compiled
+
+    def refresh(self) -> CompiledTemplates:
+        with self._lock:
+            self._refresh()
+        return self._compiled
+
+    def _refresh(self):
+        self._checked_at = time.monotonic()
+        db = SessionLocal()
+        try:
+            version = db.query(func.max(WorkTemplate.version)).scalar()
+            if version is None or version == self._compiled.version:
+                return
+            templates = self._history.get(version) or _load_version(db, version)
+        except Exception as e:
+            logger.warning(f"Не удалось проверить версию шаблонов, используется версия {self._compiled.version}: {e}")
+            return
+        finally:
+            db.close()
+        self._history[version] = templates
+        self._compiled = CompiledTemplates(version, templates)
+        logger.info(f"Загружены шаблоны версии {version}: {', '.join(sorted(templates))}")
+
+    def pin(self, version: int, templates: dict):
+        """Фиксирует версию без обращений к БД (процессы пакетных задач)."""
+        self._history[version] = templates
+        self._compiled = CompiledTemplates(version, templates)
+        self._checked_at = float("inf")
+
+    def templates(self, version: int) -> Optional[dict]:
+        """Шаблоны указанной версии или None, если такой версии нет."""
+        templates = self._history.get(version)
+        if templates is None and version is not None:
+            db = SessionLocal()
+            try:
+                templates = _load_version(db, version) or None
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить шаблоны версии {version}: {e}")
+            finally:
+                db.close()
+            if templates is not None:
+                self._history[version] = templates
+        return templates
+
+template_store = TemplateStore()
+
+def get_template(work_type: str, version: int = None) -> Optional[dict]:
+    """Шаблон указанной (по умолчанию текущей) версии или None, если он неизвестен."""
+    templates = template_store.current().templates if version is None else template_store.templates(version)
+    if templates is None:
+        return None
+    return templates.get(work_type)
+
+def seed_templates():
+    """Записывает встроенные версии шаблонов, если таблица ещё пуста."""
+    with SessionLocal() as db:
+        db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": TEMPLATE_LOCK_ID})
+        if db.query(WorkTemplate.version).first() is None:
+            for version, templates in TEMPLATE_HISTORY.items():
+                db.add_all(WorkTemplate(version=version, work_type=work_type, definition=t) for work_type, t in templates.items())
+            db.commit()
+            logger.info(f"Встроенные шаблоны записаны в БД: версии {sorted(TEMPLATE_HISTORY)}")
+        else:
+            db.rollback()
+    template_store.refresh()
+
+def _create_version(db: Session, user_id: int, work_type: str, template: Optional[dict]) -> int:
+    """Новая версия: последняя версия с заменённым (или удалённым при None) шаблоном."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": TEMPLATE_LOCK_ID})
+    latest = db.query(func.max(WorkTemplate.version)).scalar() or 0
+    templates = _load_version(db, latest) if latest else dict(WORK_TYPE_TEMPLATES)
+    if template is None:
+        if work_type not in templates:
+            raise HTTPException(status_code=404, detail="Шаблон не найден")
+        del templates[work_type]
+    else:
+        templates[work_type] = template
+
+    version = latest + 1
+    db.add_all(WorkTemplate(version=version, work_type=t_type, definition=t, created_by=user_id) for t_type, t in templates.items())
+    db.commit()
+    logger.info(f"Админ {user_id} {'удалил' if template is None else 'сохранил'} шаблон {work_type}, версия шаблонов {version}")
+    # Этот воркер видит изменение сразу, остальные — при следующей проверке
+    template_store.refresh()
+    return version
+
+class SectionIn(BaseModel):
+    id: str = Field(min_length=1, max_length=64)
+    name: str = Field(min_length=1, max_length=200)
+    patterns: list[str] = Field(min_length=1)
+
+class TemplateIn(BaseModel):
+    name: str = Field(min_length=1, max_length=200)
+    required_sections: list[SectionIn] = Field(min_length=1)
+    optional_sections: list[SectionIn] = []
+    # Слова в имени файла или тексте, по которым определяется тип работы;
+    # без них встроенный тип определяется по WORK_TYPE_KEYWORDS, а новый —
+    # только если его указали явно (work_type в запросе анализа)
+    keywords: list[str] = []
+
+def _validate_template(template: TemplateIn) -> dict:
+    sections = template.required_sections + template.optional_sections
+    ids = [s.id for s in sections]
+    duplicates = sorted({i for i in ids if ids.count(i) > 1})
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Повторяющиеся id разделов: {', '.join(duplicates)}")
+    for section in sections:
+        for pattern in section.patterns:
+            try:
+                compile_pattern(pattern)
+            except re.error as e:
+                raise HTTPException(status_code=400, detail=f"Некорректное выражение в разделе {section.id}: {pattern!r} ({e})")
+    for keyword in template.keywords:
+        try:
+            compile_pattern(keyword)
+        except re.error as e:
+            raise HTTPException(status_code=400, detail=f"Некорректное ключевое слово: {keyword!r} ({e})")
+    definition = template.model_dump()
+    # Имя файла сравнивается с ключевыми словами в нижнем регистре
+    definition['keywords'] = list(dict.fromkeys(k.strip().lower() for k in template.keywords if k.strip()))
+    for key in ('optional_sections', 'keywords'):
+        if not definition[key]:
+            del definition[key]
+    return definition
+
+@router.get("/templates")
+def list_templates(current_user: User = Depends(require_role("admin"))):
+    compiled = template_store.current()
+    return {"version": compiled.version, "templates": compiled.templates}
+
+@router.get("/templates/versions")
+def list_template_versions(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    rows = (
+        db.query(
+            WorkTemplate.version,
+            func.min(WorkTemplate.created_at).label("created_at"),
+            func.min(WorkTemplate.created_by).label("created_by"),
+            func.array_agg(WorkTemplate.work_type).label("work_types")
+        )
+        .group_by(WorkTemplate.version)
+        .order_by(WorkTemplate.version.desc())
+        .limit(min(max(limit, 1), 500))
+        .all()
+    )
+    return [
+        {
+            "version": row.version,
+            "createdAt": row.created_at.isoformat() if row.created_at else None,
+            "createdBy": row.created_by,
+            "workTypes": sorted(row.work_types)
+        }
+        for row in rows
+    ]
+
+@router.get("/templates/{work_type}")
+def get_work_template(
+    work_type: str,
+    version: int = None,
+    current_user: User = Depends(require_role("admin"))
+):
+    template = get_template(work_type, version)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Шаблон не найден")
+    return {"version": version or template_store.current().version, "workType": work_type, "template": template}
+
+@router.put("/templates/{work_type}")
+def save_work_template(
+    template: TemplateIn,
+    work_type: str = Path(pattern=WORK_TYPE_PATTERN),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    """Создаёт или заменяет шаблон; результат — новая версия набора шаблонов.
+
+    Новый тип работы определяется автоматически только по своим keywords.
+    """
+    definition = _validate_template(template)
+    version = _create_version(db, current_user.id, work_type, definition)
+    return {"version": version, "workType": work_type, "template": definition}
+
+@router.delete("/templates/{work_type}")
+def delete_work_template(
+    work_type: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role("admin"))
+):
+    if work_type == DEFAULT_TEMPLATE:
+        raise HTTPException(status_code=400, detail="Шаблон по умолчанию удалить нельзя")
+    version = _create_version(db, current_user.id, work_type, None)
+    return {"version": version, "workType": work_type}
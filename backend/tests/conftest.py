@@ -0,0 +1,93 @@
+"""Общие настройки тестов.
+
+Тесты не требуют Postgres и MinIO: БД — временный файл SQLite, хранилище —
+в памяти. Переменные окружения задаются до импорта модулей backend, потому
+что config читает их при импорте.
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="study-report-tests-"), "test.db") + "?check_same_thread=false"
+os.environ["STORAGE_BACKEND"] = "memory"
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from backend import database
+from backend.database import Base, User
+
+@compiles(JSONB, "sqlite")
+def _jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+@compiles(TSVECTOR, "sqlite")
+def _tsvector_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+# search_vector в Postgres — вычисляемая колонка с to_tsvector, в SQLite её нет
+ANALYSES_DDL = """
+CREATE TABLE analyses (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER REFERENCES users (id),
+    filename TEXT NOT NULL,
+    score INTEGER,
+    full_result JSON,
+    file_object_name TEXT,
+    created_at DATETIME,
+    extracted_text TEXT,
+    result_version INTEGER NOT NULL DEFAULT 1,
+    deleted_at DATETIME,
+    search_vector TEXT
+)
+"""
+
+# Сессионные advisory-блокировки Postgres: id блокировки -> соединение DBAPI
+advisory_locks = {}
+
+@event.listens_for(database.engine, "connect")
+def _postgres_functions(dbapi_connection, connection_record):
+    """Функции Postgres, которые модули вызывают напрямую."""
+    def try_lock(lock_id):
+        return int(advisory_locks.setdefault(lock_id, dbapi_connection) is dbapi_connection)
+
+    def unlock(lock_id):
+        if advisory_locks.get(lock_id) is not dbapi_connection:
+            return 0
+        del advisory_locks[lock_id]
+        return 1
+
+    dbapi_connection.create_function("btrim", 1, lambda value: value.strip() if value is not None else None)
+    dbapi_connection.create_function("pg_try_advisory_lock", 1, try_lock)
+    dbapi_connection.create_function("pg_advisory_unlock", 1, unlock)
+    dbapi_connection.create_function("pg_advisory_xact_lock", 1, lambda lock_id: None)
+
+@pytest.fixture(scope="session")
+def engine():
+    with database.engine.begin() as conn:
+        Base.metadata.create_all(conn, tables=[t for t in Base.metadata.sorted_tables if t.name != "analyses"])
+        conn.exec_driver_sql(ANALYSES_DDL)
+    return database.engine
+
+@pytest.fixture
+def db(engine):
+    session = database.SessionLocal()
+    yield session
+    session.close()
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+def make_user(db, email: str = "student@example.com", role: str = "user") -> User:
+    user = User(first_name="Иван", last_name="Петров", email=email, hashed_password="x", role=role)
+    db.add(user)
+    db.commit()
+    return user
+
+@pytest.fixture
+def user(db):
+    return make_user(db)
+
+@pytest.fixture
+def admin(db):
+    return make_user(db, "admin@example.com", "admin")
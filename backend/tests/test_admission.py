@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from backend.admission import AdmissionController
+
+def controller(per_user: int = 2, queue_timeout: float = 5) -> AdmissionController:
+    return AdmissionController(max_concurrent=1, per_user=per_user, queue_size=4, queue_timeout=queue_timeout)
+
+def test_cancel_while_queued_frees_queue_place():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(1)
+        queued = asyncio.create_task(admission.acquire(2))
+        await asyncio.sleep(0)
+        assert len(admission.waiters) == 1
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert not admission.waiters
+        assert 2 not in admission.user_requests
+
+        admission.release(1, 0.1)
+        assert admission.active == 0
+        assert not admission.user_requests
+        # Слот не потерян: следующий запрос допускается сразу
+        await asyncio.wait_for(admission.acquire(3), 1)
+        assert admission.active == 1
+
+    asyncio.run(scenario())
+
+def test_cancel_after_slot_handed_over_passes_it_on():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(1)
+        cancelled = asyncio.create_task(admission.acquire(2))
+        next_in_line = asyncio.create_task(admission.acquire(3))
+        await asyncio.sleep(0)
+
+        # Слот уже передан первому ожидающему, но его задачу отменили раньше, чем она проснулась
+        admission.release(1, 0.1)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+        await asyncio.wait_for(next_in_line, 1)
+        assert admission.active == 1
+        assert dict(admission.user_requests) == {3: 1}
+        admission.release(3, 0.1)
+        assert admission.active == 0
+        assert not admission.user_requests
+
+    asyncio.run(scenario())
+
+def test_release_skips_dead_waiters():
+    async def scenario():
+        admission = controller()
+        await admission.acquire(1)
+        dead = asyncio.get_running_loop().create_future()
+        dead.cancel()
+        admission.waiters.append(dead)
+
+        admission.release(1, 0.1)
+        assert admission.active == 0
+        assert not admission.waiters
+
+    asyncio.run(scenario())
+
+def test_timeout_while_queued():
+    async def scenario():
+        admission = controller(queue_timeout=0.01)
+        await admission.acquire(1)
+        with pytest.raises(HTTPException) as error:
+            await admission.acquire(2)
+        assert error.value.status_code == 503
+        assert "Retry-After" in error.value.headers
+        assert not admission.waiters
+        assert dict(admission.user_requests) == {1: 1}
+
+        admission.release(1, 0.1)
+        assert admission.active == 0
+
+    asyncio.run(scenario())
+
+def test_user_limit_counts_queued_requests():
+    async def scenario():
+        admission = controller(per_user=2)
+        await admission.acquire(1)
+        queued = asyncio.create_task(admission.acquire(1))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as error:
+            await admission.acquire(1)
+        assert error.value.status_code == 429
+        assert "Retry-After" in error.value.headers
+        assert admission.user_requests[1] == 2
+
+        admission.release(1, 0.1)
+        await asyncio.wait_for(queued, 1)
+        admission.release(1, 0.1)
+        assert admission.active == 0
+        assert not admission.user_requests
+
+    asyncio.run(scenario())
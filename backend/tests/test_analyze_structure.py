@@ -0,0 +1,181 @@
+"""Результат analyze_work_structure на характерных текстах каждого типа работы.
+
+Ожидания сняты с версии до перехода на DocumentIndex и правила (rules.py):
+оптимизации правил не должны менять ни оценку, ни сообщения.
+"""
+import math
+import pytest
+from backend.analyze import analyze_work_structure
+from backend.benchmarks.corpus import generate_paragraphs
+from backend.template_store import CompiledTemplates, template_store
+from backend.work_templates import TEMPLATE_VERSION, WORK_TYPE_TEMPLATES
+
+CASES = {
+    'lab_report': ("\n".join(generate_paragraphs('lab_report')), 'lab-report.txt', None),
+    'essay': ("\n".join(generate_paragraphs('essay')), 'essay.txt', None),
+    'course_work': ("\n".join(generate_paragraphs('course_work')), 'course-work.txt', None),
+    'thesis': ("\n".join(generate_paragraphs('thesis')), 'thesis.txt', None),
+    'english_lab': ('Lab report\nObjective: measure the period of a pendulum.\nTask: repeat the experiment 10 times.\nProcedure\n1. Set up the pendulum.\n2. Measure 3.14 seconds.\nResults: see table 1.\n', 'pendulum.txt', None),
+    'short_unknown': ('Краткая заметка без структуры.', 'notes.txt', None),
+    'explicit_thesis': ('Введение\nГлава 1 Обзор\nЗаключение\nСписок литературы\n', 'work.txt', 'thesis'),
+    'unknown_type': ('Цель работы: проверить. Вывод: проверено.', 'x.txt', 'unknown_type'),
+}
+
+EXPECTED = {
+    'lab_report': {
+        'detectedType': 'lab_report',
+        'workType': 'Лабораторная работа',
+        'score': 95,
+        'isValid': True,
+        'found': [
+            'title',
+            'purpose',
+            'task',
+            'procedure',
+            'conclusion',
+            'theory',
+            'calculations',
+        ],
+        'sectionsMissing': [],
+        'errors': [],
+        'warnings': [],
+        'recommendations': [],
+    },
+    'essay': {
+        'detectedType': 'essay',
+        'workType': 'Реферат/Эссе',
+        'score': 95,
+        'isValid': True,
+        'found': ['title', 'introduction', 'main_part', 'conclusion', 'bibliography'],
+        'sectionsMissing': [],
+        'errors': [],
+        'warnings': [],
+        'recommendations': [],
+    },
+    'course_work': {
+        'detectedType': 'course_work',
+        'workType': 'Курсовая работа',
+        'score': 100,
+        'isValid': True,
+        'found': [
+            'title',
+            'contents',
+            'introduction',
+            'theory',
+            'practice',
+            'conclusion',
+            'bibliography',
+            'appendix',
+        ],
+        'sectionsMissing': [],
+        'errors': [],
+        'warnings': [],
+        'recommendations': [],
+    },
+    'thesis': {
+        'detectedType': 'thesis',
+        'workType': 'Дипломная работа',
+        'score': 100,
+        'isValid': True,
+        'found': [
+            'title',
+            'abstract',
+            'contents',
+            'introduction',
+            'chapters',
+            'conclusion',
+            'bibliography',
+            'appendix',
+        ],
+        'sectionsMissing': [],
+        'errors': [],
+        'warnings': [],
+        'recommendations': [],
+    },
+    'english_lab': {
+        'detectedType': 'lab_report',
+        'workType': 'Лабораторная работа',
+        'score': 95,
+        'isValid': True,
+        'found': ['title', 'purpose', 'task', 'procedure', 'conclusion'],
+        'sectionsMissing': [],
+        'errors': [],
+        'warnings': ['Рекомендуется добавить описание эксперимента или исследований'],
+        'recommendations': [
+            'Рекомендуется добавить: Теоретическая часть',
+            'Рекомендуется добавить: Расчеты',
+        ],
+    },
+    'short_unknown': {
+        'detectedType': 'lab_report',
+        'workType': 'Лабораторная работа',
+        'score': 0,
+        'isValid': False,
+        'found': [],
+        'sectionsMissing': ['Титульный лист/Название', 'Цель работы', 'Задание', 'Ход работы', 'Вывод'],
+        'errors': [
+            'Отсутствует обязательный раздел: Титульный лист/Название',
+            'Отсутствует обязательный раздел: Цель работы',
+            'Отсутствует обязательный раздел: Задание',
+            'Отсутствует обязательный раздел: Ход работы',
+            'Отсутствует обязательный раздел: Вывод',
+        ],
+        'warnings': [
+            'Рекомендуется оформить ход работы в виде нумерованных шагов',
+            'Рекомендуется добавить описание эксперимента или исследований',
+        ],
+        'recommendations': [
+            'Рекомендуется добавить: Теоретическая часть',
+            'Рекомендуется добавить: Расчеты',
+        ],
+    },
+    'explicit_thesis': {
+        'detectedType': 'thesis',
+        'workType': 'Дипломная работа',
+        'score': 10,
+        'isValid': False,
+        'found': ['introduction', 'chapters', 'conclusion', 'bibliography'],
+        'sectionsMissing': ['Титульный лист', 'Аннотация', 'Содержание', 'Приложения'],
+        'errors': [
+            'Отсутствует обязательный раздел: Титульный лист',
+            'Отсутствует обязательный раздел: Аннотация',
+            'Отсутствует обязательный раздел: Содержание',
+            'Отсутствует обязательный раздел: Приложения',
+            'Объем дипломной работы недостаточен (рекомендуется 40-80 страниц)',
+            'Дипломная работа должна содержать не менее 2 глав',
+        ],
+        'warnings': [],
+        'recommendations': [],
+    },
+    'unknown_type': {
+        'detectedType': 'unknown_type',
+        'workType': 'Лабораторная работа',
+        'score': 17,
+        'isValid': False,
+        'found': ['purpose', 'conclusion'],
+        'sectionsMissing': ['Титульный лист/Название', 'Задание', 'Ход работы'],
+        'errors': [
+            'Отсутствует обязательный раздел: Титульный лист/Название',
+            'Отсутствует обязательный раздел: Задание',
+            'Отсутствует обязательный раздел: Ход работы',
+        ],
+        'warnings': [],
+        'recommendations': [
+            'Рекомендуется добавить: Теоретическая часть',
+            'Рекомендуется добавить: Расчеты',
+        ],
+    },
+}
+
+@pytest.fixture(autouse=True)
+def builtin_templates(monkeypatch):
+    monkeypatch.setattr(template_store, "_compiled", CompiledTemplates(TEMPLATE_VERSION, WORK_TYPE_TEMPLATES))
+    monkeypatch.setattr(template_store, "_checked_at", math.inf)
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_analyze_work_structure(name):
+    content, filename, work_type = CASES[name]
+    result = analyze_work_structure(content, filename, work_type)
+    summary = {key: result[key] for key in ("detectedType", "workType", "score", "isValid", "sectionsMissing", "errors", "warnings", "recommendations")}
+    summary["found"] = [section["id"] for section in result["sectionsFound"] if section["found"]]
+    assert summary == EXPECTED[name]
@@ -0,0 +1,73 @@
+import zipfile
+from io import BytesIO
+import docx
+from backend.docx_stream import extract_docx_text, iter_docx_blocks
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape" '
+    'xmlns:v="urn:schemas-microsoft-com:vml"'
+)
+
+def paragraph(*runs: str) -> str:
+    return "<w:p>" + "".join(f"<w:r><w:t>{run}</w:t></w:r>" for run in runs) + "</w:p>"
+
+def part(root: str, body: str) -> str:
+    return f'<?xml version="1.0" encoding="UTF-8"?><w:{root} {NAMESPACES}>{body}</w:{root}>'
+
+def make_docx(body: str, **parts: str) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", part("document", f"<w:body>{body}</w:body>"))
+        for name, xml in parts.items():
+            archive.writestr(f"word/{name}.xml", xml)
+    return buffer.getvalue()
+
+def text_box(text: str) -> str:
+    """Надпись, как её сохраняет Word: wps-фигура и VML-копия для старых версий."""
+    content = f"<w:txbxContent>{paragraph(text)}</w:txbxContent>"
+    return (
+        "<w:r><mc:AlternateContent>"
+        f"<mc:Choice Requires=\"wps\"><w:drawing><wps:txbx>{content}</wps:txbx></w:drawing></mc:Choice>"
+        f"<mc:Fallback><w:pict><v:textbox>{content}</v:textbox></w:pict></mc:Fallback>"
+        "</mc:AlternateContent></w:r>"
+    )
+
+def test_parts_in_document_order():
+    content = make_docx(
+        paragraph("Введение") + paragraph("Основной текст"),
+        header2=part("hdr", paragraph("Колонтитул 2")),
+        header1=part("hdr", paragraph("Колонтитул 1")),
+        footer1=part("ftr", paragraph("Страница")),
+        footnotes=part("footnotes", f"<w:footnote>{paragraph('Сноска')}</w:footnote>"),
+    )
+    assert list(iter_docx_blocks(content)) == ["Колонтитул 1", "Колонтитул 2", "Введение", "Основной текст", "Сноска", "Страница"]
+
+def test_empty_paragraphs_kept_only_in_body():
+    content = make_docx(paragraph("Первый") + "<w:p/>" + paragraph("Второй"), header1=part("hdr", "<w:p/>" + paragraph("Шапка")))
+    assert extract_docx_text(content) == "Шапка\nПервый\n\nВторой"
+
+def test_runs_tabs_and_breaks():
+    content = make_docx("<w:p><w:r><w:t>Глава</w:t><w:tab/><w:t>1</w:t><w:br/><w:t>Обзор</w:t></w:r></w:p>")
+    assert extract_docx_text(content) == "Глава\t1\nОбзор"
+
+def test_table_cells_including_nested():
+    nested = f"<w:tbl><w:tr><w:tc>{paragraph('Вложенная')}</w:tc></w:tr></w:tbl>"
+    table = f"<w:tbl><w:tr><w:tc>{paragraph('Ячейка')}{paragraph('вторая строка')}</w:tc><w:tc>{nested}</w:tc></w:tr></w:tbl>"
+    content = make_docx(paragraph("До таблицы") + table + paragraph("После"))
+    assert list(iter_docx_blocks(content)) == ["До таблицы", "Ячейка\nвторая строка", "Вложенная", "После"]
+
+def test_text_box_inside_run():
+    body = f"<w:p><w:r><w:t>Начало </w:t></w:r>{text_box('Заключение')}<w:r><w:t>конец</w:t></w:r></w:p>"
+    # Текст надписи — отдельный блок, выдаётся один раз и не склеивается с абзацем вокруг
+    assert list(iter_docx_blocks(make_docx(body))) == ["Заключение", "Начало конец"]
+
+def test_matches_python_docx_for_plain_paragraphs():
+    document = docx.Document()
+    for text in ["Лабораторная работа № 1", "", "Цель работы", "Ход работы"]:
+        document.add_paragraph(text)
+    buffer = BytesIO()
+    document.save(buffer)
+    content = buffer.getvalue()
+    assert extract_docx_text(content) == "\n".join(p.text for p in docx.Document(BytesIO(content)).paragraphs)
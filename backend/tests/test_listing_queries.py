@@ -0,0 +1,89 @@
+"""Списки загрузок и анализов не читают из БД тяжёлые колонки."""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from backend.analyze import get_all_analyses, get_my_uploads
+from backend.database import Analysis
+
+HEAVY_COLUMNS = ("full_result", "extracted_text", "search_vector")
+
+@pytest.fixture
+def analyses(db, user):
+    started = datetime(2026, 1, 1)
+    full_result = {"score": 80, "sectionsFound": [{"id": f"section_{i}", "name": "Раздел " * 20, "found": True} for i in range(100)]}
+    db.add_all(
+        Analysis(
+            user_id=user.id,
+            filename=f"work_{i}.pdf",
+            score=i,
+            full_result=full_result,
+            file_object_name=f"reports/{i}.pdf",
+            created_at=started + timedelta(minutes=i),
+            extracted_text="Текст работы. " * 4000
+        )
+        for i in range(20)
+    )
+    db.commit()
+
+@contextmanager
+def captured_statements(engine):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+def fetched_bytes(engine, statements) -> int:
+    """Объём строк, которые возвращают запросы: запросы выполняются повторно и считаются их значения."""
+    total = 0
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            for row in conn.exec_driver_sql(statement, parameters):
+                total += sum(len(value.encode() if isinstance(value, str) else value) if isinstance(value, (str, bytes)) else 8 for value in row if value is not None)
+    return total
+
+def full_page_bytes(engine, db, user_id: int = None) -> int:
+    """Та же страница, если загружать строки целиком, как до load_only."""
+    with captured_statements(engine) as statements:
+        query = db.query(Analysis).filter(Analysis.deleted_at.is_(None))
+        if user_id is not None:
+            query = query.filter(Analysis.user_id == user_id)
+        rows = query.order_by(Analysis.created_at.desc()).limit(6).all()
+        for row in rows:
+            row.full_result, row.extracted_text
+    return fetched_bytes(engine, statements)
+
+def assert_light(statements):
+    for statement, _ in statements:
+        for column in HEAVY_COLUMNS:
+            assert column not in statement, statement
+
+def test_my_uploads_page(engine, db, user, analyses):
+    with captured_statements(engine) as statements:
+        page = get_my_uploads(page=1, limit=6, search=None, min_score=None, max_score=None, sort_by="created_at", sort_order="desc", db=db, current_user=user)
+
+    assert [item["filename"] for item in page["items"]] == [f"work_{i}.pdf" for i in range(19, 13, -1)]
+    assert page["total"] == 20
+    assert_light(statements)
+    listing = fetched_bytes(engine, statements)
+    full = full_page_bytes(engine, db, user.id)
+    assert listing * 100 < full
+
+def test_all_analyses_page(engine, db, user, admin, analyses):
+    with captured_statements(engine) as statements:
+        page = get_all_analyses(page=1, limit=6, search=None, min_score=None, max_score=None, user_id=None, sort_by="created_at", sort_order="desc", db=db, current_user=admin)
+
+    assert len(page["items"]) == 6
+    assert page["total"] == 20
+    assert_light(statements)
+    listing = fetched_bytes(engine, statements)
+    full = full_page_bytes(engine, db)
+    assert listing * 100 < full
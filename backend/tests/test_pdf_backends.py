@@ -0,0 +1,49 @@
+from io import BytesIO
+import pytest
+from reportlab.pdfgen import canvas
+from backend import pdf_backends
+from backend.pdf_backends import PdfBackend, PDF_BACKENDS, select_backend
+
+def make_pdf(pages: list[str]) -> bytes:
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer)
+    for text in pages:
+        if text:
+            pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+def test_backend_must_implement_extract_pages():
+    with pytest.raises(TypeError):
+        PdfBackend()
+
+def test_auto_prefers_pypdf2():
+    assert select_backend("auto").name == "pypdf2"
+
+def test_auto_skips_unavailable(monkeypatch):
+    monkeypatch.setattr(pdf_backends.shutil, "which", lambda name: None)
+    monkeypatch.setattr(pdf_backends, "PDF_BACKEND_PREFERENCE", ("pdftotext", "pypdf2"))
+    assert select_backend("auto").name == "pypdf2"
+
+def test_explicit_backend():
+    assert select_backend("pypdf2") is PDF_BACKENDS["pypdf2"]
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Неизвестный"):
+        select_backend("acrobat")
+
+def test_unavailable_backend(monkeypatch):
+    monkeypatch.setattr(pdf_backends.shutil, "which", lambda name: None)
+    with pytest.raises(ValueError, match="не установлен"):
+        select_backend("pdftotext")
+
+def test_pypdf2_keeps_empty_pages():
+    pages = PDF_BACKENDS["pypdf2"].extract_pages(make_pdf(["First page", "", "Third page"]))
+    assert len(pages) == 3
+    assert "First page" in pages[0]
+    assert pages[1].strip() == ""
+    assert "Third page" in pages[2]
+
+def test_split_pages_drops_trailing_form_feed():
+    assert pdf_backends._split_pages("one\ftwo\f") == ["one", "two"]
@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from backend import pdf_ocr
+
+PAGES = ["Текстовый слой первой страницы", "", "Текстовый слой третьей страницы"]
+
+class BrokenPool:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+@pytest.fixture
+def with_pdftoppm(monkeypatch):
+    monkeypatch.setattr(pdf_ocr.shutil, "which", lambda name: "/usr/bin/" + name)
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(pdf_ocr, "_get_pool", lambda: pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+def test_failure_keeps_text_layer(monkeypatch):
+    monkeypatch.setattr(pdf_ocr.shutil, "which", lambda name: None)
+    # Без pdftoppm страницы берутся из самого PDF, а это не PDF
+    assert pdf_ocr.ocr_missing_pages(b"not a pdf", PAGES) == PAGES
+
+def test_broken_pool_on_submit_is_recreated(monkeypatch, with_pdftoppm):
+    working = ThreadPoolExecutor(max_workers=1)
+    pools = [BrokenPool(), working]
+    resets = []
+    monkeypatch.setattr(pdf_ocr, "_get_pool", lambda: pools[0])
+    monkeypatch.setattr(pdf_ocr, "_reset_pool", lambda: resets.append(pools.pop(0)))
+    monkeypatch.setattr(pdf_ocr, "_ocr_page", lambda number, image, path, deadline: f"Распознанная страница {number}")
+
+    result = pdf_ocr.ocr_missing_pages(b"%PDF-1.4", PAGES)
+    working.shutdown(wait=True)
+
+    assert len(resets) == 1
+    assert result == [PAGES[0], "Распознанная страница 2", PAGES[2]]
+
+def test_pool_broken_twice_keeps_text_layer(monkeypatch, with_pdftoppm):
+    resets = []
+    monkeypatch.setattr(pdf_ocr, "_get_pool", BrokenPool)
+    monkeypatch.setattr(pdf_ocr, "_reset_pool", lambda: resets.append(1))
+
+    assert pdf_ocr.ocr_missing_pages(b"%PDF-1.4", PAGES) == PAGES
+    assert len(resets) == 2
+
+def test_budget_timeout_unlinks_file_after_running_page(monkeypatch, with_pdftoppm, thread_pool):
+    monkeypatch.setattr(pdf_ocr, "OCR_PDF_TIME_BUDGET_SECONDS", 0.1)
+    seen = {}
+
+    def slow_page(number, image, path, deadline):
+        time.sleep(0.3)
+        seen["path"] = path
+        seen["exists"] = os.path.exists(path)
+        return "поздно"
+
+    monkeypatch.setattr(pdf_ocr, "_ocr_page", slow_page)
+
+    assert pdf_ocr.ocr_missing_pages(b"%PDF-1.4", PAGES) == PAGES
+    thread_pool.shutdown(wait=True)
+    assert seen["exists"]
+    assert not os.path.exists(seen["path"])
+
+def test_page_after_deadline_is_skipped(monkeypatch):
+    def render(*args):
+        raise AssertionError("страница после срока не растрируется")
+
+    monkeypatch.setattr(pdf_ocr, "_render_page", render)
+    assert pdf_ocr._ocr_page(1, None, "/tmp/missing.pdf", time.time() - 1) == ""
+
+def test_subprocess_timeouts_follow_deadline(monkeypatch):
+    timeouts = {}
+
+    def render(path, number, timeout):
+        timeouts["pdftoppm"] = timeout
+        return b"png"
+
+    def recognize(image_bytes, timeout=0):
+        timeouts["tesseract"] = timeout
+        return "текст"
+
+    monkeypatch.setattr(pdf_ocr, "_render_page", render)
+    monkeypatch.setattr(pdf_ocr.ocr_service, "recognize_text", recognize)
+
+    assert pdf_ocr._ocr_page(1, None, "/tmp/doc.pdf", time.time() + 5) == "текст"
+    assert 0 < timeouts["pdftoppm"] <= 5
+    assert 0 < timeouts["tesseract"] <= 5
@@ -0,0 +1,98 @@
+import asyncio
+import orjson
+import pytest
+from fastapi import HTTPException
+from backend import progress
+from backend.progress import ProgressChannel, event_stream, report
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(progress.time, "monotonic", clock)
+    monkeypatch.setattr(progress, "PROGRESS_MIN_INTERVAL_MS", 100)
+    return clock
+
+@pytest.fixture
+def sent(clock):
+    channel = ProgressChannel(asyncio.new_event_loop())
+    sent = []
+    channel.emit = lambda event, data: sent.append(data)
+    token = progress._channel.set(channel)
+    yield sent
+    progress._channel.reset(token)
+    channel.loop.close()
+
+def test_without_channel_nothing_is_sent(clock):
+    report("extracting", 1, 10)
+
+def test_intermediate_frames_throttled(clock, sent):
+    for page in range(1, 11):
+        report("extracting", page, 10)
+        clock.now += 0.03
+
+    # 0 мс, 120 мс, 240 мс и последний кадр этапа, который отправляется всегда
+    assert [frame["current"] for frame in sent] == [1, 5, 9, 10]
+    assert [frame["elapsedMs"] for frame in sent] == [0, 120, 240, 270]
+
+def test_stages_throttled_separately(clock, sent):
+    report("extracting", 1, 10)
+    report("ocr", 1, 3)
+    report("extracting", 2, 10)
+    report("analysing")
+    report("analysing")
+
+    assert [(frame["stage"], frame.get("current")) for frame in sent] == [("extracting", 1), ("ocr", 1), ("analysing", None), ("analysing", None)]
+
+def test_extra_fields(clock, sent):
+    report("file", 1, 2, filename="work.pdf")
+    assert sent == [{"stage": "file", "current": 1, "total": 2, "filename": "work.pdf", "elapsedMs": 0}]
+
+def parse(frames: list[bytes]) -> list[tuple[str, dict]]:
+    events = []
+    for frame in b"".join(frames).decode().split("\n\n"):
+        if frame.startswith("event: "):
+            event, data = frame.split("\n")
+            events.append((event[len("event: "):], orjson.loads(data[len("data: "):])))
+    return events
+
+class Slot:
+    task = None
+
+    def hold_until(self, task):
+        self.task = task
+
+def stream(run) -> tuple[list[tuple[str, dict]], Slot]:
+    slot = Slot()
+
+    async def collect():
+        response = event_stream(run, slot=slot)
+        return [frame async for frame in response.body_iterator]
+
+    return parse(asyncio.run(collect())), slot
+
+def test_stream_sends_progress_then_result(engine):
+    def run(db):
+        for page in range(1, 4):
+            report("extracting", page, 3)
+        return {"score": 90}
+
+    events, slot = stream(run)
+
+    assert events[0] == ("progress", {"stage": "extracting", "current": 1, "total": 3, "elapsedMs": events[0][1]["elapsedMs"]})
+    assert events[-1] == ("result", {"score": 90})
+    assert [event for event, _ in events].count("progress") in (2, 3)
+    assert slot.task.done()
+
+def test_stream_reports_http_errors(engine):
+    def run(db):
+        raise HTTPException(status_code=400, detail="Неподдерживаемый тип файла")
+
+    events, _ = stream(run)
+    assert events == [("error", {"status": 400, "detail": "Неподдерживаемый тип файла"})]
@@ -0,0 +1,177 @@
+import copy
+import math
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException
+from backend import rescore
+from backend.analyze import analyze_work_structure
+from backend.database import Analysis, RescoreJob
+from backend.minio_service import minio_service
+from backend.result_format import compact_result, expand_result
+from backend.template_store import CompiledTemplates, template_store
+from backend.work_templates import TEMPLATE_VERSION, WORK_TYPE_TEMPLATES
+from .conftest import advisory_locks
+
+TEXTS = [
+    "Лабораторная работа\nЦель работы: измерить период.\nЗадание\nХод работы\n1. Собрать установку.\nВывод",
+    "Реферат\nВведение\nОсновная часть\nЗаключение\nСписок литературы",
+    "Лабораторная работа\nЦель\nЗадание\nЭксперимент\nВывод",
+    "Курсовая работа\nСодержание\nВведение\nГлава 1\nЗаключение",
+    "Лабораторная работа без разделов",
+]
+
+@pytest.fixture(autouse=True)
+def in_process_pool(monkeypatch):
+    monkeypatch.setattr(template_store, "_compiled", CompiledTemplates(TEMPLATE_VERSION, WORK_TYPE_TEMPLATES))
+    monkeypatch.setattr(template_store, "_checked_at", math.inf)
+    monkeypatch.setattr(rescore, "ProcessPoolExecutor", lambda max_workers, mp_context, initializer, initargs: ThreadPoolExecutor(max_workers))
+
+@pytest.fixture
+def rendered(monkeypatch):
+    rendered = []
+    render = rescore._render_report
+
+    def track(task):
+        rendered.append(task[0])
+        return render(task)
+
+    monkeypatch.setattr(rescore, "_render_report", track)
+    return rendered
+
+@pytest.fixture
+def analyses(db, user):
+    """Анализы с устаревшей оценкой, кроме последнего: он уже актуален."""
+    ids = []
+    for i, content in enumerate(TEXTS):
+        result = analyze_work_structure(content, f"work_{i}.txt")
+        stale = i < len(TEXTS) - 1
+        analysis = Analysis(
+            user_id=user.id,
+            filename=f"work_{i}.txt",
+            score=result['score'] + 1 if stale else result['score'],
+            full_result=compact_result(result, TEMPLATE_VERSION),
+            file_object_name=f"reports/{i}.pdf",
+            extracted_text=content
+        )
+        db.add(analysis)
+        db.commit()
+        ids.append(analysis.id)
+    return ids
+
+def scores(db) -> dict:
+    db.expire_all()
+    return {row.id: (row.score, row.result_version) for row in db.query(Analysis.id, Analysis.score, Analysis.result_version)}
+
+def test_resume_continues_after_failed_batch(db, analyses, monkeypatch):
+    batch = rescore._rescore_batch
+    calls = []
+
+    def fail_second_batch(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("соединение с БД потеряно")
+        return batch(*args)
+
+    monkeypatch.setattr(rescore, "_rescore_batch", fail_second_batch)
+    with pytest.raises(RuntimeError):
+        rescore.run_rescore(batch_size=2, workers=1, reports=False)
+
+    job = db.query(RescoreJob).one()
+    assert (job.status, job.error, job.processed, job.last_id) == ("failed", "соединение с БД потеряно", 2, analyses[1])
+    after_failure = scores(db)
+    assert [after_failure[i][1] for i in analyses] == [2, 2, 1, 1, 1]
+    assert not advisory_locks
+
+    monkeypatch.setattr(rescore, "_rescore_batch", batch)
+    report = rescore.run_rescore(job.id, batch_size=2, workers=1, reports=False)
+
+    assert report["status"] == "finished"
+    assert (report["processed"], report["updated"], report["unchanged"], report["failed"]) == (5, 4, 1, 0)
+    final = scores(db)
+    # Каждый анализ пересчитан ровно один раз: пачка до сбоя не повторяется
+    assert [final[i][1] for i in analyses] == [2, 2, 2, 2, 1]
+    for analysis_id, content in zip(analyses, TEXTS):
+        assert final[analysis_id][0] == analyze_work_structure(content, "x.txt")['score']
+
+def test_reports_rendered_only_for_changed(db, analyses, rendered):
+    minio_service.delete_files([f"reports/{i}.pdf" for i in range(len(TEXTS))])
+
+    rescore.run_rescore(batch_size=10, workers=2, reports=True)
+
+    assert sorted(rendered) == analyses[:-1]
+    assert minio_service.get_file("reports/0.pdf").startswith(b"%PDF")
+
+def test_start_while_locked_creates_no_job(db, admin):
+    lock_conn = rescore._try_lock()
+    try:
+        with pytest.raises(HTTPException) as error:
+            rescore.start_rescore(reports=False, db=db, current_user=admin)
+        assert error.value.status_code == 409
+        assert db.query(RescoreJob).count() == 0
+    finally:
+        rescore._release_lock(lock_conn)
+    assert not advisory_locks
+
+def test_second_run_writes_nothing(db, analyses):
+    rescore.run_rescore(batch_size=2, workers=1, reports=False)
+    before = scores(db)
+
+    report = rescore.run_rescore(batch_size=2, workers=1, reports=False)
+
+    assert (report["processed"], report["updated"], report["unchanged"]) == (5, 0, 5)
+    assert scores(db) == before
+
+ESSAY = "Реферат\nВведение\nОсновная часть\nЗаключение\nСписок литературы"
+LAB = "Лабораторная работа\nЦель работы: измерить период.\nЗадание\nХод работы\nВывод"
+
+def add_analysis(db, user, content: str, work_type: str = None, legacy: bool = False) -> int:
+    result = analyze_work_structure(content, "work.txt", work_type)
+    if legacy:
+        # Результаты, сохранённые до появления workTypeSource
+        del result['workTypeSource']
+    analysis = Analysis(user_id=user.id, filename="work.txt", score=result['score'], full_result=compact_result(result, TEMPLATE_VERSION), extracted_text=content)
+    db.add(analysis)
+    db.commit()
+    return analysis.id
+
+@pytest.fixture
+def changed_templates(monkeypatch):
+    """Версия 2: у реферата другие ключевые слова, курсовая удалена."""
+    templates = copy.deepcopy(WORK_TYPE_TEMPLATES)
+    templates['essay']['keywords'] = ['эссе']
+    del templates['course_work']
+    monkeypatch.setitem(template_store._history, TEMPLATE_VERSION + 1, templates)
+    monkeypatch.setitem(template_store._history, TEMPLATE_VERSION, WORK_TYPE_TEMPLATES)
+    return templates
+
+def stored_types(db) -> dict:
+    db.expire_all()
+    return {row.id: expand_result(row.full_result) for row in db.query(Analysis.id, Analysis.full_result)}
+
+def test_only_chosen_type_is_kept(db, user, changed_templates, monkeypatch):
+    detected = add_analysis(db, user, ESSAY)
+    chosen = add_analysis(db, user, ESSAY, 'essay')
+    deleted = add_analysis(db, user, LAB, 'course_work')
+    monkeypatch.setattr(template_store, "_compiled", CompiledTemplates(TEMPLATE_VERSION + 1, changed_templates))
+
+    rescore.run_rescore(batch_size=10, workers=1, reports=False)
+
+    results = stored_types(db)
+    # По новым ключевым словам реферат не узнаётся, и короткий текст считается лабораторной
+    assert (results[detected]['detectedType'], results[detected]['workTypeSource']) == ('lab_report', 'detected')
+    assert (results[chosen]['detectedType'], results[chosen]['workTypeSource']) == ('essay', 'user')
+    # Выбранного шаблона больше нет: тип определён заново, а не оценён запасным шаблоном под старым именем
+    assert (results[deleted]['detectedType'], results[deleted]['workType']) == ('lab_report', 'Лабораторная работа')
+    assert results[deleted]['workTypeSource'] == 'detected'
+
+def test_legacy_results_compared_with_old_detector(db, user, changed_templates, monkeypatch):
+    detected = add_analysis(db, user, ESSAY, legacy=True)
+    chosen = add_analysis(db, user, ESSAY, 'thesis', legacy=True)
+    monkeypatch.setattr(template_store, "_compiled", CompiledTemplates(TEMPLATE_VERSION + 1, changed_templates))
+
+    rescore.run_rescore(batch_size=10, workers=1, reports=False)
+
+    results = stored_types(db)
+    assert (results[detected]['detectedType'], results[detected]['workTypeSource']) == ('lab_report', 'detected')
+    # Детектор версии 1 определил бы реферат, значит диплом выбрал пользователь
+    assert (results[chosen]['detectedType'], results[chosen]['workTypeSource']) == ('thesis', 'user')
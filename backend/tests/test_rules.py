@@ -0,0 +1,32 @@
+"""DocumentIndex отвечает так же, как прямой поиск re по исходному тексту."""
+import re
+import pytest
+from backend.benchmarks.corpus import generate_paragraphs
+from backend.rules import BONUS_RULES, STRUCTURE_RULES, WORK_TYPE_KEYWORDS, DocumentIndex, pattern_literals
+from backend.work_templates import WORK_TYPE_TEMPLATES
+
+PATTERNS = sorted(
+    {p for template in WORK_TYPE_TEMPLATES.values()
+     for section in template['required_sections'] + template.get('optional_sections', [])
+     for p in section['patterns']}
+    | {k for keywords in WORK_TYPE_KEYWORDS.values() for k in keywords}
+    | {p for rule in STRUCTURE_RULES + BONUS_RULES for p in rule.condition.patterns}
+)
+
+TEXTS = {work_type: "\n".join(generate_paragraphs(work_type)) for work_type in ('lab_report', 'essay', 'course_work', 'thesis')}
+# Разделы, разорванные переводами строк и табуляцией, и смешанный регистр
+TEXTS['whitespace'] = "СПИСОК\n\tЛИТЕРАТУРЫ\nглава  3\r\nХод\n\nработы\nЦель РАБОТЫ: рис.2, Глава\t1"
+
+def test_patterns_expand_to_literals():
+    # Иначе проверка ниже сравнивала бы re с самим собой
+    assert sum(pattern_literals(p) is not None for p in PATTERNS) > len(PATTERNS) * 0.8
+
+@pytest.mark.parametrize("name", list(TEXTS))
+def test_index_agrees_with_re(name):
+    text = TEXTS[name]
+    index = DocumentIndex(text)
+    for pattern in PATTERNS:
+        assert index.matches(pattern) == (re.search(pattern, text, re.IGNORECASE) is not None), pattern
+        assert index.count(pattern) == len(re.findall(pattern, text.lower())), pattern
+        for literal in pattern_literals(pattern) or ():
+            assert index.has_literal(literal) == (re.search(re.escape(literal).replace(r"\ ", r"\s+"), text.lower()) is not None), literal
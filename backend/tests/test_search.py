@@ -0,0 +1,54 @@
+import re
+import pytest
+from sqlalchemy import event
+from backend.database import Analysis
+from backend.search import MARK_START, MARK_STOP, build_snippets, render_snippet
+
+def fake_ts_headline(config, text, query, options):
+    """ts_headline для SQLite: русская конфигурация находит только кириллицу, английская — латиницу."""
+    alphabet = "а-яё" if config == "russian" else "a-z"
+    words = [w for w in query.lower().split() if re.fullmatch(f"[{alphabet}]+", w)]
+    for word in words:
+        text = re.sub(rf"\b({word})\b", MARK_START + r"\1" + MARK_STOP, text, flags=re.IGNORECASE)
+    return text
+
+def register_ts_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function("ts_headline", 4, fake_ts_headline)
+    dbapi_connection.create_function("websearch_to_tsquery", 2, lambda config, q: q)
+    dbapi_connection.create_function("translate", 3, lambda text, chars, to: text.translate({ord(c): None for c in chars}))
+
+@pytest.fixture
+def ts_functions(engine):
+    event.listen(engine, "connect", register_ts_functions)
+    # Соединения в пуле открыты без этих функций
+    engine.dispose()
+    yield
+    event.remove(engine, "connect", register_ts_functions)
+    engine.dispose()
+
+def add_analysis(db, user, text):
+    analysis = Analysis(user_id=user.id, filename="work.txt", score=0, full_result={}, extracted_text=text)
+    db.add(analysis)
+    db.commit()
+    return analysis.id
+
+def test_snippet_text_is_escaped():
+    headline = f"<img src=x onerror=alert(1)> {MARK_START}цель{MARK_STOP} & вывод"
+    assert render_snippet(headline) == "&lt;img src=x onerror=alert(1)&gt; <mark>цель</mark> &amp; вывод"
+
+def test_snippet_uses_matching_config(ts_functions, db, user):
+    russian = add_analysis(db, user, "Цель работы и <b>вывод</b>")
+    english = add_analysis(db, user, "Objective and conclusion")
+
+    snippets = build_snippets(db, [russian, english], "вывод conclusion")
+
+    assert snippets[russian] == "Цель работы и &lt;b&gt;<mark>вывод</mark>&lt;/b&gt;"
+    assert snippets[english] == "Objective and <mark>conclusion</mark>"
+
+def test_markers_in_text_do_not_become_tags(ts_functions, db, user):
+    analysis = add_analysis(db, user, f"{MARK_START}script{MARK_STOP} вывод")
+    assert build_snippets(db, [analysis], "вывод")[analysis] == "script <mark>вывод</mark>"
+
+def test_snippet_without_match_keeps_first_headline(ts_functions, db, user):
+    analysis = add_analysis(db, user, "Текст без совпадений")
+    assert build_snippets(db, [analysis], "conclusion")[analysis] == "Текст без совпадений"
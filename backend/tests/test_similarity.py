@@ -0,0 +1,66 @@
+import random
+from backend.database import Analysis
+from backend.similarity import (
+    SHINGLE_WORDS, band_buckets, compute_signature, index_signature, pack_signature,
+    similar_analyses, similarity, unpack_signature
+)
+
+VOCABULARY = [f"слово{i}" for i in range(3000)]
+
+def make_text(seed: int, words: int = 2000) -> list[str]:
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(words)]
+
+def edit(words: list[str], share: float, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    edited = list(words)
+    for i in rng.sample(range(len(words)), int(len(words) * share)):
+        edited[i] = rng.choice(VOCABULARY)
+    return edited
+
+def jaccard(a: list[str], b: list[str]) -> float:
+    shingles = lambda words: {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+def test_short_text_has_no_signature():
+    assert compute_signature("Титульный лист. Лабораторная работа № 1.") is None
+
+def test_near_duplicate_estimate():
+    original = make_text(1)
+    copy = edit(original, 0.02)
+    estimate = similarity(compute_signature(" ".join(original)), compute_signature(" ".join(copy)))
+    assert estimate >= 0.7
+    assert abs(estimate - jaccard(original, copy)) < 0.12
+
+def test_unrelated_texts():
+    a, b = make_text(1), make_text(2)
+    signature_a, signature_b = compute_signature(" ".join(a)), compute_signature(" ".join(b))
+    assert similarity(signature_a, signature_b) < 0.05
+    assert not set(band_buckets(signature_a)) & set(band_buckets(signature_b))
+
+def test_case_and_punctuation_ignored():
+    words = make_text(3)
+    plain = compute_signature(" ".join(words))
+    assert compute_signature(", ".join(word.upper() for word in words) + ".") == plain
+
+def test_pack_roundtrip():
+    signature = compute_signature(" ".join(make_text(4)))
+    assert unpack_signature(pack_signature(signature)) == signature
+
+def test_index_finds_near_duplicate(db, user):
+    original = make_text(5)
+    texts = {"original": original, "unrelated": make_text(6)}
+    ids = {}
+    for name, words in texts.items():
+        analysis = Analysis(user_id=user.id, filename=f"{name}.txt", score=0, full_result={})
+        db.add(analysis)
+        db.flush()
+        index_signature(db, analysis.id, compute_signature(" ".join(words)))
+        ids[name] = analysis.id
+    db.commit()
+
+    found = similar_analyses(db, compute_signature(" ".join(edit(original, 0.02))), threshold=0.5)
+
+    assert [analysis_id for analysis_id, _ in found] == [ids["original"]]
+    assert similar_analyses(db, compute_signature(" ".join(original)), exclude_id=ids["original"], threshold=0.5) == []
@@ -0,0 +1,96 @@
+import pytest
+from fastapi import HTTPException
+from backend import template_store as store_module
+from backend.analyze import analyze_work_structure
+from backend.template_store import (
+    TemplateIn, TemplateStore, delete_work_template, get_template, save_work_template, seed_templates, template_store
+)
+from backend.config import TEMPLATE_REFRESH_SECONDS
+from backend.work_templates import DEFAULT_TEMPLATE, TEMPLATE_VERSION, WORK_TYPE_TEMPLATES
+
+PRACTICE = TemplateIn(
+    name="Отчёт по практике",
+    required_sections=[
+        {"id": "diary", "name": "Дневник практики", "patterns": [r"дневник\s+практики"]},
+        {"id": "conclusion", "name": "Вывод", "patterns": ["вывод"]},
+    ],
+    keywords=["Практика", "  ", "практика"],
+)
+
+@pytest.fixture(autouse=True)
+def restore_store(monkeypatch):
+    monkeypatch.setattr(template_store, "_compiled", template_store._compiled)
+    monkeypatch.setattr(template_store, "_checked_at", template_store._checked_at)
+    # Номера версий повторяются между тестами, поэтому кеш версий у каждого свой
+    monkeypatch.setattr(template_store, "_history", dict(template_store._history))
+
+@pytest.fixture
+def seeded(db):
+    seed_templates()
+
+def test_seed_loads_builtin_version(seeded):
+    assert template_store.current().version == TEMPLATE_VERSION
+    assert template_store.current().templates == WORK_TYPE_TEMPLATES
+
+def test_save_creates_version_and_keeps_old(db, admin, seeded):
+    saved = save_work_template(PRACTICE, "practice_report", db=db, current_user=admin)
+
+    assert saved["version"] == TEMPLATE_VERSION + 1
+    assert saved["template"]["keywords"] == ["практика"]
+    assert "optional_sections" not in saved["template"]
+    assert template_store.current().version == saved["version"]
+    assert get_template("practice_report")["name"] == "Отчёт по практике"
+    assert get_template("practice_report", TEMPLATE_VERSION) is None
+    assert get_template("essay", saved["version"]) == WORK_TYPE_TEMPLATES["essay"]
+
+def test_delete_creates_version(db, admin, seeded):
+    deleted = delete_work_template("essay", db=db, current_user=admin)
+
+    assert deleted["version"] == TEMPLATE_VERSION + 1
+    assert get_template("essay") is None
+    assert get_template("essay", TEMPLATE_VERSION) == WORK_TYPE_TEMPLATES["essay"]
+
+def test_delete_rejects_default_and_unknown(db, admin, seeded):
+    with pytest.raises(HTTPException) as error:
+        delete_work_template(DEFAULT_TEMPLATE, db=db, current_user=admin)
+    assert error.value.status_code == 400
+    with pytest.raises(HTTPException) as error:
+        delete_work_template("unknown", db=db, current_user=admin)
+    assert error.value.status_code == 404
+
+def test_invalid_pattern_rejected(db, admin, seeded):
+    template = PRACTICE.model_copy(update={"keywords": ["(незакрытая"]})
+    with pytest.raises(HTTPException) as error:
+        save_work_template(template, "practice_report", db=db, current_user=admin)
+    assert error.value.status_code == 400
+
+def test_other_worker_refreshes_after_interval(db, admin, seeded):
+    worker = TemplateStore()
+    assert worker.current().version == TEMPLATE_VERSION
+
+    save_work_template(PRACTICE, "practice_report", db=db, current_user=admin)
+
+    # Версия в БД проверяется не чаще раза в TEMPLATE_REFRESH_SECONDS
+    assert worker.current().version == TEMPLATE_VERSION
+    worker._checked_at -= TEMPLATE_REFRESH_SECONDS
+    assert worker.current().version == TEMPLATE_VERSION + 1
+
+def test_refresh_keeps_version_when_db_fails(db, seeded, monkeypatch):
+    class BrokenSession:
+        def query(self, *args):
+            raise RuntimeError("БД недоступна")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(store_module, "SessionLocal", BrokenSession)
+    assert template_store.refresh().version == TEMPLATE_VERSION
+
+def test_new_work_type_detected_by_keywords(db, admin, seeded):
+    save_work_template(PRACTICE, "practice_report", db=db, current_user=admin)
+
+    practice = analyze_work_structure("Дневник практики\nВывод: практика пройдена", "otchet.txt")
+    assert practice["detectedType"] == "practice_report"
+    assert practice["sectionsMissing"] == []
+    # Встроенные типы проверяются раньше добавленных
+    assert analyze_work_structure("Реферат о практике", "x.txt")["detectedType"] == "essay"
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from backend.database import UploadSession
+from backend.minio_service import minio_service
+from backend.uploads import MAX_UPLOAD_SIZE, UploadCreate, _claim_sessions, _finalize, create_upload
+from .conftest import make_user
+
+CONTENT = "Лабораторная работа. Цель работы. Вывод.".encode()
+
+def start_upload(db, user, content: bytes = CONTENT, upload_parts: bool = True) -> str:
+    report = create_upload(UploadCreate(filename="lab.txt", content_type="text/plain", size=len(content)), db=db, current_user=user)
+    assert report["partCount"] == 1
+    if upload_parts:
+        session = db.get(UploadSession, report["id"])
+        minio_service.upload_part(session.object_name, session.upload_id, 1, content)
+    return report["id"]
+
+def status(db, upload_id: str) -> str:
+    db.expire_all()
+    return db.get(UploadSession, upload_id).status
+
+def analyzed(uploads: list[tuple], db) -> dict:
+    return {"files": [(filename, content) for filename, _, content in uploads]}
+
+def failing(uploads: list[tuple], db) -> dict:
+    raise HTTPException(status_code=500, detail="Ошибка анализа")
+
+def test_claim_then_finalize(db, user):
+    upload_id = start_upload(db, user)
+    object_name = db.get(UploadSession, upload_id).object_name
+
+    claimed = _claim_sessions(db, [upload_id], user)
+    assert claimed == {upload_id: "pending"}
+    assert status(db, upload_id) == "finalizing"
+    with pytest.raises(HTTPException) as error:
+        _claim_sessions(db, [upload_id], user)
+    assert error.value.status_code == 409
+
+    assert _finalize(claimed, analyzed, db) == {"files": [("lab.txt", CONTENT)]}
+    assert status(db, upload_id) == "analyzed"
+    assert not minio_service.file_exists(object_name)
+    with pytest.raises(HTTPException) as error:
+        _claim_sessions(db, [upload_id], user)
+    assert error.value.status_code == 409
+
+def test_missing_parts_roll_back_to_pending(db, user):
+    upload_id = start_upload(db, user, upload_parts=False)
+
+    with pytest.raises(HTTPException) as error:
+        _finalize(_claim_sessions(db, [upload_id], user), analyzed, db)
+
+    assert error.value.status_code == 400
+    assert "части 1" in error.value.detail
+    assert status(db, upload_id) == "pending"
+
+def test_failed_analysis_rolls_back_to_completed(db, user):
+    upload_id = start_upload(db, user)
+
+    with pytest.raises(HTTPException):
+        _finalize(_claim_sessions(db, [upload_id], user), failing, db)
+    assert status(db, upload_id) == "completed"
+
+    # Повтор не собирает объект заново, а читает уже собранный
+    claimed = _claim_sessions(db, [upload_id], user)
+    assert claimed == {upload_id: "completed"}
+    assert _finalize(claimed, analyzed, db) == {"files": [("lab.txt", CONTENT)]}
+    assert status(db, upload_id) == "analyzed"
+
+def test_batch_rolls_back_every_session(db, user):
+    ready = start_upload(db, user)
+    missing = start_upload(db, user, upload_parts=False)
+
+    with pytest.raises(HTTPException):
+        _finalize(_claim_sessions(db, [ready, missing], user), analyzed, db)
+
+    # Первая сессия успела собраться, вторая нет
+    assert (status(db, ready), status(db, missing)) == ("completed", "pending")
+
+def test_claim_rejections(db, user):
+    upload_id = start_upload(db, user)
+    other = make_user(db, "other@example.com")
+
+    cases = [
+        ([upload_id, upload_id], user, 400),
+        (["missing"], user, 404),
+        ([upload_id], other, 404),
+    ]
+    for ids, owner, code in cases:
+        with pytest.raises(HTTPException) as error:
+            _claim_sessions(db, ids, owner)
+        assert error.value.status_code == code
+
+    db.get(UploadSession, upload_id).expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+    with pytest.raises(HTTPException) as error:
+        _claim_sessions(db, [upload_id], user)
+    assert error.value.status_code == 410
+    assert status(db, upload_id) == "pending"
+
+def test_rejected_batch_claims_nothing(db, user):
+    first = start_upload(db, user)
+    second = start_upload(db, user)
+    _claim_sessions(db, [second], user)
+
+    with pytest.raises(HTTPException) as error:
+        _claim_sessions(db, [first, second], user)
+
+    assert error.value.status_code == 409
+    assert status(db, first) == "pending"
+
+def test_too_large_upload(db, user):
+    with pytest.raises(HTTPException) as error:
+        create_upload(UploadCreate(filename="big.pdf", size=MAX_UPLOAD_SIZE + 1), db=db, current_user=user)
+    assert error.value.status_code == 413
@@ -0,0 +1,225 @@
+"""Лёгкая трассировка запросов спанами.
+
+TracingMiddleware открывает корневой спан на каждый HTTP-запрос и решает,
+попадает ли трасса в выборку (head-based sampling по TRACE_SAMPLE_RATE или
+флагу входящего заголовка traceparent). Внутри запроса span() и timed()
+из metrics создают дочерние спаны; для трасс вне выборки они ничего не
+делают. trace_id текущего запроса подставляется во все записи логов.
+
+Завершённые спаны складываются в ограниченную очередь, фоновый поток
+выгружает их пачками в файл (TRACE_EXPORTER=file, по строке OTLP/JSON на
+спан) или в OTLP/HTTP коллектор (TRACE_EXPORTER=otlp).
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import httpx
+from .config import TRACE_EXPORTER, TRACE_SAMPLE_RATE, TRACE_FILE, TRACE_OTLP_ENDPOINT, TRACE_SERVICE_NAME
+
+logger = logging.getLogger("tracing")
+
+EXPORT_QUEUE_SIZE = 10000
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 1.0
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "sampled", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, sampled: bool, kind: int = SPAN_KIND_INTERNAL, attributes: dict = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.sampled = sampled
+        self.error = None
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": 2, "message": self.error}
+        return span
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_export_queue: "queue.Queue[Span]" = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """Создаёт дочерний спан текущего. Вне трассы или вне выборки возвращает None."""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return None
+    return Span(parent.trace_id, parent.span_id, name, True, attributes=attributes)
+
+def end_span(span: Optional[Span]):
+    if span is None:
+        return
+    span.end_ns = time.time_ns()
+    if span.sampled:
+        try:
+            _export_queue.put_nowait(span)
+        except queue.Full:
+            pass
+
+@contextmanager
+def span(name: str, **attributes):
+    """Контекстный менеджер дочернего спана; вложенные спаны становятся его детьми."""
+    current = start_span(name, **attributes)
+    if current is None:
+        yield None
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(current)
+
+def _parse_traceparent(header: Optional[str]):
+    """Разбирает W3C traceparent: 00-<trace_id>-<parent_id>-<flags>."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+class TracingMiddleware:
+    """Открывает корневой спан запроса и отдаёт его trace_id в заголовке X-Trace-Id."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < TRACE_SAMPLE_RATE
+        sampled = sampled and TRACE_EXPORTER != "none"
+
+        root = Span(trace_id, parent_id, f"{scope['method']} {scope['path']}", sampled, SPAN_KIND_SERVER, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        token = _current_span.set(root)
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-trace-id", trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                root.name = f"{scope['method']} {route.path}"
+            _current_span.reset(token)
+            end_span(root)
+
+def install_log_trace_ids():
+    """Добавляет trace_id текущего запроса ко всем записям логов как %(trace_id)s."""
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+
+def _write_file(spans: list):
+    with open(TRACE_FILE, "a", encoding="utf-8") as f:
+        for s in spans:
+            f.write(json.dumps(s.to_otlp(), ensure_ascii=False) + "\n")
+
+def _post_otlp(spans: list):
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": TRACE_SERVICE_NAME}, "spans": [s.to_otlp() for s in spans]}],
+        }]
+    }
+    response = httpx.post(TRACE_OTLP_ENDPOINT, json=payload, timeout=5)
+    response.raise_for_status()
+
+def _export_loop():
+    export = _post_otlp if TRACE_EXPORTER == "otlp" else _write_file
+    while True:
+        batch = [_export_queue.get()]
+        deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+        while len(batch) < EXPORT_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_export_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        try:
+            export(batch)
+        except Exception as e:
+            logger.warning(f"Не удалось выгрузить {len(batch)} спанов: {e}")
+
+def start_trace_exporter():
+    if TRACE_EXPORTER == "none":
+        return
+    if TRACE_EXPORTER not in ("file", "otlp"):
+        logger.warning(f"Неизвестный TRACE_EXPORTER={TRACE_EXPORTER}, трассировка выключена")
+        return
+    threading.Thread(target=_export_loop, name="trace-exporter", daemon=True).start()
+    logger.info(f"Экспорт трасс: {TRACE_EXPORTER}, доля выборки {TRACE_SAMPLE_RATE}")
@@ -0,0 +1,268 @@
+"""Загрузка файлов прямо в хранилище частями по presigned-ссылкам.
+
+Большие работы и пачки скриншотов не проходят через воркеры API:
+
+    POST   /api/uploads                      сессия и ссылки PUT для частей
+    PUT    <ссылка части>                    браузер отправляет часть прямо в MinIO
+    GET    /api/uploads/{id}                 загруженные части и новые ссылки для
+                                             недостающих (продолжение после обрыва)
+    POST   /api/uploads/{id}/finalize        сборка файла и анализ
+    POST   /api/uploads/finalize-screenshots то же для пачки скриншотов
+    DELETE /api/uploads/{id}                 отмена загрузки
+
+Какие части загружены, сервер спрашивает у хранилища, поэтому клиенту не
+нужно читать ETag из ответов MinIO. Финализация, как и /api/analyze, с
+Accept: text/event-stream отдаёт ход анализа (progress). После анализа
+исходный файл удаляется, просроченные сессии убирает purger. Для PUT из
+браузера в MinIO должен быть разрешён CORS (MINIO_API_CORS_ALLOW_ORIGIN).
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from .database import UploadSession, User, get_db
+from .dependencies import get_current_user
+from .minio_service import minio_service
+from .analyze import analyze_upload, analyze_screenshot_uploads
+from .admission import AdmissionSlot, admit_analysis
+from .profiling import profile_request, run_profiled, SamplingProfiler
+from .progress import wants_event_stream, event_stream
+from .schemas import AnalysisResult
+from .config import UPLOAD_PART_SIZE_MB, UPLOAD_MAX_SIZE_MB, UPLOAD_SESSION_HOURS
+
+router = APIRouter(prefix="/api", tags=["Uploads"])
+logger = logging.getLogger("uploads")
+
+# Ограничения S3: все части, кроме последней, не меньше 5 МиБ, частей не больше 10000
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+PART_SIZE = max(UPLOAD_PART_SIZE_MB * 1024 * 1024, MIN_PART_SIZE)
+MAX_UPLOAD_SIZE = UPLOAD_MAX_SIZE_MB * 1024 * 1024
+PART_URL_HOURS = 1
+
+class UploadCreate(BaseModel):
+    filename: str = Field(min_length=1, max_length=255)
+    content_type: Optional[str] = Field(default=None, max_length=255)
+    size: int = Field(gt=0)
+
+class ScreenshotsFinalize(BaseModel):
+    upload_ids: list[str] = Field(min_length=1)
+
+def _require_storage():
+    if not minio_service:
+        raise HTTPException(status_code=503, detail="Хранилище файлов недоступно")
+
+def _part_count(session: UploadSession) -> int:
+    return -(-session.size // session.part_size)
+
+def _session_report(session: UploadSession, uploaded: list = ()) -> dict:
+    report = {
+        "id": session.id,
+        "filename": session.filename,
+        "size": session.size,
+        "partSize": session.part_size,
+        "partCount": _part_count(session),
+        "status": session.status,
+        "expiresAt": session.expires_at.isoformat(),
+        "uploadedParts": [{"partNumber": part.part_number, "size": part.size} for part in uploaded]
+    }
+    if session.status == "pending":
+        done = {part.part_number for part in uploaded}
+        report["parts"] = [
+            {"partNumber": number, "url": minio_service.get_presigned_part_url(session.object_name, session.upload_id, number, PART_URL_HOURS)}
+            for number in range(1, _part_count(session) + 1)
+            if number not in done
+        ]
+    return report
+
+def _get_session(db: Session, upload_id: str, user: User) -> UploadSession:
+    session = db.get(UploadSession, upload_id)
+    if not session or session.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+    return session
+
+def _claim_sessions(db: Session, upload_ids: list[str], user: User) -> dict:
+    """Переводит сессии в finalizing, чтобы их не финализировали дважды.
+
+    Возвращает {id: прежний статус} в порядке upload_ids.
+    """
+    if len(set(upload_ids)) != len(upload_ids):
+        raise HTTPException(status_code=400, detail="Загрузки в списке повторяются")
+    sessions = {
+        session.id: session
+        for session in db.query(UploadSession)
+        .filter(UploadSession.id.in_(upload_ids), UploadSession.user_id == user.id)
+        .with_for_update()
+    }
+    now = datetime.utcnow()
+    for upload_id in upload_ids:
+        session = sessions.get(upload_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Загрузка {upload_id} не найдена")
+        if session.expires_at < now:
+            raise HTTPException(status_code=410, detail=f"Срок загрузки {upload_id} истёк")
+        if session.status == "finalizing":
+            raise HTTPException(status_code=409, detail=f"Загрузка {upload_id} уже анализируется")
+        if session.status == "analyzed":
+            raise HTTPException(status_code=409, detail=f"Загрузка {upload_id} уже проанализирована")
+
+    claimed = {upload_id: sessions[upload_id].status for upload_id in upload_ids}
+    for session in sessions.values():
+        session.status = "finalizing"
+    db.commit()
+    return claimed
+
+def _complete_upload(session: UploadSession):
+    """Собирает объект, если загружены все части и их размер совпадает с заявленным."""
+    parts = [part for part in minio_service.list_parts(session.object_name, session.upload_id) if part.part_number <= _part_count(session)]
+    uploaded = {part.part_number for part in parts}
+    missing = [number for number in range(1, _part_count(session) + 1) if number not in uploaded]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Загрузка {session.id}: не загружены части {', '.join(map(str, missing[:20]))}")
+    size = sum(part.size for part in parts)
+    if size != session.size:
+        raise HTTPException(status_code=400, detail=f"Загрузка {session.id}: загружено {size} байт вместо {session.size}")
+    minio_service.complete_multipart_upload(session.object_name, session.upload_id, sorted(parts, key=lambda part: part.part_number))
+
+def _finalize(claimed: dict, analyze: Callable, db: Session) -> dict:
+    """Собирает файлы сессий, читает их из хранилища и анализирует.
+
+    При ошибке сессии возвращаются в pending (если файл ещё не собран) или
+    completed, и финализацию можно повторить.
+    """
+    statuses = dict(claimed)
+    sessions = {session.id: session for session in db.query(UploadSession).filter(UploadSession.id.in_(list(statuses)))}
+    try:
+        uploads = []
+        for upload_id, status in statuses.items():
+            session = sessions[upload_id]
+            if status == "pending":
+                _complete_upload(session)
+                statuses[upload_id] = "completed"
+            uploads.append((session.filename, session.content_type, minio_service.get_file(session.object_name)))
+        result = analyze(uploads, db)
+    except Exception:
+        db.rollback()
+        for upload_id, status in statuses.items():
+            sessions[upload_id].status = status
+        db.commit()
+        raise
+
+    for session in sessions.values():
+        session.status = "analyzed"
+    db.commit()
+    failed = minio_service.delete_files([session.object_name for session in sessions.values()])
+    if failed:
+        logger.warning(f"Не удалось удалить загруженные файлы после анализа: {', '.join(failed)}")
+    return result
+
+@router.post("/uploads", status_code=201)
+def create_upload(
+    upload: UploadCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Создаёт загрузку частями и возвращает ссылки PUT для всех частей."""
+    _require_storage()
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"Файл больше {UPLOAD_MAX_SIZE_MB} МБ")
+
+    session_id = uuid.uuid4().hex
+    object_name = f"uploads/{current_user.id}/{session_id}"
+    upload_id = minio_service.create_multipart_upload(object_name, upload.content_type or "application/octet-stream")
+    session = UploadSession(
+        id=session_id,
+        user_id=current_user.id,
+        object_name=object_name,
+        upload_id=upload_id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size=upload.size,
+        part_size=max(PART_SIZE, -(-upload.size // MAX_PARTS)),
+        status="pending",
+        expires_at=datetime.utcnow() + timedelta(hours=UPLOAD_SESSION_HOURS)
+    )
+    db.add(session)
+    db.commit()
+    logger.info(f"User {current_user.id} started upload {session_id}: {upload.filename}, {upload.size} bytes in {_part_count(session)} parts")
+    return _session_report(session)
+
+@router.get("/uploads/{upload_id}")
+def get_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Состояние загрузки; для незавершённой — новые ссылки на недостающие части."""
+    _require_storage()
+    session = _get_session(db, upload_id, current_user)
+    uploaded = minio_service.list_parts(session.object_name, session.upload_id) if session.status == "pending" else []
+    return _session_report(session, uploaded)
+
+@router.delete("/uploads/{upload_id}")
+def delete_upload_session(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    _require_storage()
+    session = _get_session(db, upload_id, current_user)
+    if session.status == "finalizing":
+        raise HTTPException(status_code=409, detail="Загрузка анализируется")
+    if session.status == "pending":
+        minio_service.abort_multipart_upload(session.object_name, session.upload_id)
+    elif session.status == "completed":
+        minio_service.delete_file(session.object_name)
+    db.delete(session)
+    db.commit()
+    return {"message": "Загрузка отменена"}
+
+@router.post("/uploads/{upload_id}/finalize", response_model=AnalysisResult, response_model_exclude_unset=True)
+async def finalize_upload(
+    request: Request,
+    upload_id: str,
+    work_type: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    slot: AdmissionSlot = Depends(admit_analysis),
+    profiler: Optional[SamplingProfiler] = Depends(profile_request)
+):
+    """Собирает загруженный файл и анализирует его, как /api/analyze."""
+    _require_storage()
+    claimed = await run_in_threadpool(_claim_sessions, db, [upload_id], current_user)
+
+    def analyze(uploads: list[tuple], session_db: Session) -> dict:
+        filename, content_type, content = uploads[0]
+        return analyze_upload(filename, content_type, content, work_type, current_user, profiler, session_db)
+
+    run = partial(_finalize, claimed, analyze)
+    if wants_event_stream(request):
+        return event_stream(run, AnalysisResult, profiler, slot)
+    return await run_in_threadpool(run_profiled, profiler, run, db)
+
+@router.post("/uploads/finalize-screenshots", response_model=AnalysisResult, response_model_exclude_unset=True)
+async def finalize_screenshot_uploads(
+    request: Request,
+    body: ScreenshotsFinalize,
+    work_type: str = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    slot: AdmissionSlot = Depends(admit_analysis),
+    profiler: Optional[SamplingProfiler] = Depends(profile_request)
+):
+    """Собирает загруженные скриншоты и анализирует их как один документ, как /api/analyze-screenshots."""
+    _require_storage()
+    claimed = await run_in_threadpool(_claim_sessions, db, body.upload_ids, current_user)
+
+    def analyze(uploads: list[tuple], session_db: Session) -> dict:
+        return analyze_screenshot_uploads(uploads, work_type, current_user, profiler, session_db)
+
+    run = partial(_finalize, claimed, analyze)
+    if wants_event_stream(request):
+        return event_stream(run, AnalysisResult, profiler, slot)
+    return await run_in_threadpool(run_profiled, profiler, run, db)
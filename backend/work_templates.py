@@ -0,0 +1,131 @@
+"""Встроенные шаблоны структуры учебных работ.
+
+Рабочие шаблоны хранятся в БД (см. template_store): при первом запуске
+туда записываются версии из TEMPLATE_HISTORY, дальше их меняют через
+админские эндпоинты. Встроенные версии остаются запасным вариантом, если
+БД недоступна, и позволяют разворачивать старые компактные результаты.
+"""
+
+TEMPLATE_VERSION = 1
+# Шаблон для неизвестного типа работы, удалить его нельзя
+DEFAULT_TEMPLATE = 'lab_report'
+
+WORK_TYPE_TEMPLATES = {
+    'lab_report': {
+        'name': 'Лабораторная работа',
+        'required_sections': [
+            {'id': 'title', 'name': 'Титульный лист/Название', 'patterns': [
+                r'лабораторная\s+работа', r'отчет\s+по\s+лабораторной', r'lab\s+report', r'title\s+page'
+            ]},
+            {'id': 'purpose', 'name': 'Цель работы', 'patterns': [
+                r'цель', r'цель\s+работы', r'objective', r'aim'
+            ]},
+            {'id': 'task', 'name': 'Задание', 'patterns': [
+                r'задание', r'задача', r'задачи', r'задания', r'task', r'experiment\s+task'
+            ]},
+            {'id': 'procedure', 'name': 'Ход работы', 'patterns': [
+                r'ход\s+работы', r'ход\s+выполнения', r'методика', r'процедура', r'procedure', r'methods', r'experimental\s+steps'
+            ]},
+            {'id': 'conclusion', 'name': 'Вывод', 'patterns': [
+                r'вывод', r'заключение', r'conclusion', r'results'
+            ]}
+        ],
+        'optional_sections': [
+            {'id': 'theory', 'name': 'Теоретическая часть', 'patterns': [
+                r'теория', r'теоретическая', r'theory', r'background'
+            ]},
+            {'id': 'calculations', 'name': 'Расчеты', 'patterns': [
+                r'расчет', r'вычислен', r'calculations', r'computations'
+            ]}
+        ]
+    },
+
+    'course_work': {
+        'name': 'Курсовая работа', 
+        'required_sections': [
+            {'id': 'title', 'name': 'Титульный лист', 'patterns': [
+                r'курсовая\s+работа', r'курсовой\s+проект', r'course\s+work', r'title\s+page'
+            ]},
+            {'id': 'contents', 'name': 'Содержание', 'patterns': [
+                r'содержание', r'оглавление', r'table\s+of\s+contents', r'index'
+            ]},
+            {'id': 'introduction', 'name': 'Введение', 'patterns': [
+                r'введение', r'introduction'
+            ]},
+            {'id': 'theory', 'name': 'Теоретическая часть', 'patterns': [
+                r'теоретическая\s+часть', r'глава\s+1', r'theoretical\s+part', r'chapter\s+1'
+            ]},
+            {'id': 'practice', 'name': 'Практическая часть', 'patterns': [
+                r'практическая\s+часть', r'глава\s+2', r'исследование', r'practical\s+part', r'experiment', r'research'
+            ]},
+            {'id': 'conclusion', 'name': 'Заключение', 'patterns': [
+                r'заключение', r'выводы', r'conclusion', r'results'
+            ]},
+            {'id': 'bibliography', 'name': 'Список литературы', 'patterns': [
+                r'список\s+литературы', r'библиография', r'references', r'bibliography'
+            ]}
+        ],
+        'optional_sections': [
+            {'id': 'appendix', 'name': 'Приложения', 'patterns': [
+                r'приложение', r'appendix', r'annex'
+            ]}
+        ]
+    },
+
+    'essay': {
+        'name': 'Реферат/Эссе',
+        'required_sections': [
+            {'id': 'title', 'name': 'Титульный лист', 'patterns': [
+                r'реферат', r'эссе', r'essay', r'title\s+page'
+            ]},
+            {'id': 'introduction', 'name': 'Введение', 'patterns': [
+                r'введение', r'introduction'
+            ]},
+            {'id': 'main_part', 'name': 'Основная часть', 'patterns': [
+                r'основная\s+часть', r'main\s+part', r'body'
+            ]},
+            {'id': 'conclusion', 'name': 'Заключение', 'patterns': [
+                r'заключение', r'conclusion', r'results'
+            ]}
+        ],
+        'optional_sections': [
+            {'id': 'bibliography', 'name': 'Список литературы', 'patterns': [
+                r'список\s+литературы', r'bibliography', r'references'
+            ]}
+        ]
+    },
+
+    'thesis': {
+        'name': 'Дипломная работа',
+        'required_sections': [
+            {'id': 'title', 'name': 'Титульный лист', 'patterns': [
+                r'дипломная\s+работа', r'выпускная\s+квалификационная', r'thesis', r'title\s+page'
+            ]},
+            {'id': 'abstract', 'name': 'Аннотация', 'patterns': [
+                r'аннотация', r'реферат', r'abstract', r'summary'
+            ]},
+            {'id': 'contents', 'name': 'Содержание', 'patterns': [
+                r'содержание', r'table\s+of\s+contents', r'оглавление'
+            ]},
+            {'id': 'introduction', 'name': 'Введение', 'patterns': [
+                r'введение', r'introduction'
+            ]},
+            {'id': 'chapters', 'name': 'Главы (3-4)', 'patterns': [
+                r'глава\s+[1-4]', r'chapter\s+[1-4]'
+            ]},
+            {'id': 'conclusion', 'name': 'Заключение', 'patterns': [
+                r'заключение', r'выводы', r'conclusion'
+            ]},
+            {'id': 'bibliography', 'name': 'Список литературы', 'patterns': [
+                r'список\s+литературы', r'библиография', r'references', r'bibliography'
+            ]},
+            {'id': 'appendix', 'name': 'Приложения', 'patterns': [
+                r'приложение', r'appendix', r'annex'
+            ]}
+        ]
+    }
+}
+
+TEMPLATE_HISTORY = {
+    TEMPLATE_VERSION: WORK_TYPE_TEMPLATES,
+}
@@ -24,6 +24,7 @@ interface AnalysisResult {
   fileType: string
   workType: string
   detectedType: string
+  workTypeSource?: 'user' | 'detected'
   isValid: boolean
   score: number
   bonusPoints?: number
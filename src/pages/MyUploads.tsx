@@ -22,6 +22,8 @@ const MyUploads: React.FC = () => {
   const [searchParams, setSearchParams] = useSearchParams();
 
   const [uploads, setUploads] = useState<Upload[]>([]);
+  // Полные результаты анализов страницы, загруженные одним запросом
+  const [details, setDetails] = useState<Record<number, any>>({});
   const [loading, setLoading] = useState(true);
   const [isSearching, setIsSearching] = useState(false);
   const [error, setError] = useState('');
@@ -55,6 +57,7 @@ const MyUploads: React.FC = () => {
       if (data && Array.isArray(data.items)) {
         setUploads(data.items);
         setPagination({ page: data.page, limit: data.limit, total: data.total });
+        prefetchDetails(data.items.map(upload => upload.id));
       } else {
         setError('Неверный формат данных от сервера');
       }
@@ -66,6 +69,17 @@ const MyUploads: React.FC = () => {
     }
   };
 
+  const prefetchDetails = async (ids: number[]) => {
+    const missing = ids.filter(id => !(id in details));
+    if (missing.length === 0) return;
+    try {
+      const { results } = await apiService.getUploadsDetails(missing);
+      setDetails(prev => ({ ...prev, ...results }));
+    } catch {
+      // Без предзагрузки детали запрашиваются при открытии анализа
+    }
+  };
+
   useEffect(() => {
     const timer = setTimeout(() => fetchUploads(1, true), searchQuery ? 500 : 0);
     return () => clearTimeout(timer);
@@ -88,6 +102,11 @@ const MyUploads: React.FC = () => {
     setDeletingId(id);
     try {
       await apiService.request(`/upload/${id}`, { method: 'DELETE' });
+      setDetails(prev => {
+        const next = { ...prev };
+        delete next[id];
+        return next;
+      });
       await fetchUploads(pagination.page);
     } catch (err: any) {
       alert('Ошибка при удалении: ' + err.message);
@@ -116,8 +135,11 @@ const MyUploads: React.FC = () => {
 
   const viewFullAnalysis = async (uploadId: number) => {
     try {
-      const response = await apiService.request(`/upload/${uploadId}/details`);
-      const fullResult = await response.json();
+      let fullResult = details[uploadId];
+      if (!fullResult) {
+        const response = await apiService.request(`/upload/${uploadId}/details`);
+        fullResult = await response.json();
+      }
       
       const upload = uploads.find(u => u.id === uploadId);
       sessionStorage.setItem('analysis_result', JSON.stringify(fullResult));
@@ -7,12 +7,111 @@ interface UploadedFile {
   type: 'pdf' | 'image' | 'word' | 'text'
 }
 
+interface AnalysisProgress {
+  stage: string
+  current?: number
+  total?: number
+}
+
+interface UploadSession {
+  id: string
+  status: string
+  partSize: number
+  partCount: number
+  uploadedParts: { partNumber: number, size: number }[]
+  parts?: { partNumber: number, url: string }[]
+}
+
+// Файлы больше порога загружаются прямо в хранилище частями (POST /api/uploads)
+const DIRECT_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+const PARALLEL_PARTS = 3
+const PART_ATTEMPTS = 3
+
+function uploadSessionKey(file: File): string {
+  return `upload_session:${file.name}:${file.size}:${file.lastModified}`
+}
+
+async function putPart(url: string, data: Blob): Promise<void> {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      const response = await fetch(url, { method: 'PUT', body: data })
+      if (response.ok) return
+      if (attempt >= PART_ATTEMPTS) throw new Error(`Хранилище ответило ${response.status}`)
+    } catch (err) {
+      if (attempt >= PART_ATTEMPTS) throw err
+    }
+    await new Promise(resolve => setTimeout(resolve, 1000 * attempt))
+  }
+}
+
+const STAGE_LABELS: Record<string, string> = {
+  uploaded: 'Файлы загружены',
+  extracting: 'Извлечение текста',
+  ocr: 'Распознавание текста',
+  file: 'Обработка файлов',
+  analysing: 'Анализ структуры',
+  rendering: 'Формирование отчёта',
+  stored: 'Сохранение результата',
+}
+
+function progressLabel(event: AnalysisProgress): string {
+  const label = STAGE_LABELS[event.stage] || 'Анализ'
+  if (event.current !== undefined && event.total) {
+    return `${label}: ${event.current} из ${event.total}...`
+  }
+  return `${label}...`
+}
+
+// Ответ с Accept: text/event-stream: события progress, затем result или error
+async function readAnalysisStream(response: Response, onProgress: (event: AnalysisProgress) => void): Promise<any> {
+  if (!response.body || !response.headers.get('content-type')?.startsWith('text/event-stream')) {
+    return response.json()
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary = buffer.indexOf('\n\n')
+    while (boundary !== -1) {
+      const frame = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+      boundary = buffer.indexOf('\n\n')
+
+      let event = 'message'
+      let data = ''
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (!data) continue
+
+      const payload = JSON.parse(data)
+      if (event === 'progress') {
+        onProgress(payload)
+      } else if (event === 'result') {
+        return payload
+      } else if (event === 'error') {
+        throw new Error(`Ошибка сервера: ${payload.status} - ${payload.detail}`)
+      }
+    }
+  }
+
+  throw new Error('Соединение прервано до получения результата анализа')
+}
+
 export default function Upload() {
   const inputRef = useRef<HTMLInputElement | null>(null)
   const navigate = useNavigate()
   const [error, setError] = useState<string | null>(null)
   const [uploadedFiles, setUploadedFiles] = useState<UploadedFile[]>([])
   const [uploading, setUploading] = useState(false)
+  const [progress, setProgress] = useState<string | null>(null)
   const [selectedWorkType, setSelectedWorkType] = useState<string>('auto')
   const [uploadMode, setUploadMode] = useState<'single' | 'screenshots'>('single')
 
@@ -129,15 +228,16 @@ export default function Upload() {
     return false
   }
 
-  const makeRequestWithRetry = async (url: string, formData: FormData): Promise<Response> => {
+  const makeRequestWithRetry = async (url: string, body?: BodyInit, headers: Record<string, string> = {}, method = 'POST'): Promise<Response> => {
     let accessToken = localStorage.getItem('access_token')
     
     let response = await fetch(url, {
-      method: 'POST',
+      method,
       headers: {
-        'Authorization': `Bearer ${accessToken}`
+        'Authorization': `Bearer ${accessToken}`,
+        ...headers
       },
-      body: formData
+      body
     })
 
     if (response.status === 401) {
@@ -145,11 +245,12 @@ export default function Upload() {
       if (refreshed) {
         accessToken = localStorage.getItem('access_token')
         response = await fetch(url, {
-          method: 'POST',
+          method,
           headers: {
-            'Authorization': `Bearer ${accessToken}`
+            'Authorization': `Bearer ${accessToken}`,
+            ...headers
           },
-          body: formData
+          body
         })
       } else {
         window.dispatchEvent(new Event('logout'))
@@ -160,6 +261,57 @@ export default function Upload() {
     return response
   }
 
+  // Загружает файл в хранилище частями; повторная отправка того же файла продолжает загрузку
+  const uploadToStorage = async (file: File): Promise<string> => {
+    const key = uploadSessionKey(file)
+    let session: UploadSession | null = null
+
+    const savedId = localStorage.getItem(key)
+    if (savedId) {
+      const response = await makeRequestWithRetry(`http://127.0.0.1:8000/api/uploads/${savedId}`, undefined, {}, 'GET')
+      if (response.ok) {
+        session = await response.json()
+        if (session && session.status !== 'pending' && session.status !== 'completed') session = null
+      }
+    }
+
+    if (!session) {
+      const response = await makeRequestWithRetry(
+        'http://127.0.0.1:8000/api/uploads',
+        JSON.stringify({ filename: file.name, content_type: file.type || null, size: file.size }),
+        { 'Content-Type': 'application/json' }
+      )
+      if (!response.ok) {
+        const errorText = await response.text()
+        throw new Error(`Ошибка сервера: ${response.status} - ${errorText}`)
+      }
+      session = await response.json() as UploadSession
+      localStorage.setItem(key, session.id)
+    }
+
+    const current = session
+    const parts = current.parts || []
+    let done = current.uploadedParts.length
+    let next = 0
+    const worker = async () => {
+      while (next < parts.length) {
+        const part = parts[next++]
+        const start = (part.partNumber - 1) * current.partSize
+        await putPart(part.url, file.slice(start, start + current.partSize))
+        done += 1
+        setProgress(`Загрузка ${file.name}: ${done} из ${current.partCount} частей...`)
+      }
+    }
+
+    try {
+      await Promise.all(Array.from({ length: PARALLEL_PARTS }, worker))
+    } catch (err) {
+      console.error('Part upload error:', err)
+      throw new Error('Загрузка прервалась. Отправьте файл ещё раз — она продолжится с места остановки.')
+    }
+    return current.id
+  }
+
   async function submitAndGo() {
     if (uploadedFiles.length === 0) {
       setError('Сначала выберите файлы.')
@@ -170,26 +322,51 @@ export default function Upload() {
     setError(null)
     
     try {
-      const formData = new FormData()
-      
-      let url = 'http://127.0.0.1:8000/api/analyze'
-      
-      if (uploadMode === 'screenshots') {
-        url = 'http://127.0.0.1:8000/api/analyze-screenshots'
-        uploadedFiles.forEach(uploadedFile => {
-          formData.append('files', uploadedFile.file)
-        })
+      const files = uploadMode === 'screenshots' ? uploadedFiles.map(f => f.file) : [uploadedFiles[0].file]
+      const direct = files.reduce((total, file) => total + file.size, 0) >= DIRECT_UPLOAD_THRESHOLD
+      const query = selectedWorkType !== 'auto' ? `?work_type=${selectedWorkType}` : ''
+      let response: Response
+
+      if (direct) {
+        const uploadIds: string[] = []
+        for (const file of files) {
+          uploadIds.push(await uploadToStorage(file))
+        }
+
+        setProgress('Анализ...')
+        if (uploadMode === 'screenshots') {
+          response = await makeRequestWithRetry(
+            `http://127.0.0.1:8000/api/uploads/finalize-screenshots${query}`,
+            JSON.stringify({ upload_ids: uploadIds }),
+            { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' }
+          )
+        } else {
+          response = await makeRequestWithRetry(
+            `http://127.0.0.1:8000/api/uploads/${uploadIds[0]}/finalize${query}`,
+            undefined,
+            { 'Accept': 'text/event-stream' }
+          )
+        }
       } else {
-        formData.append('file', uploadedFiles[0].file)
-      }
+        const formData = new FormData()
+        
+        let url = 'http://127.0.0.1:8000/api/analyze'
+        
+        if (uploadMode === 'screenshots') {
+          url = 'http://127.0.0.1:8000/api/analyze-screenshots'
+          files.forEach(file => {
+            formData.append('files', file)
+          })
+        } else {
+          formData.append('file', files[0])
+        }
+
+        url += query
+        
+        console.log(`Sending files to ${url}...`)
 
-      if (selectedWorkType !== 'auto') {
-        url += `?work_type=${selectedWorkType}`
+        response = await makeRequestWithRetry(url, formData, { 'Accept': 'text/event-stream' })
       }
-      
-      console.log(`Sending files to ${url}...`)
-
-      const response = await makeRequestWithRetry(url, formData)
 
       console.log('Response status:', response.status)
 
@@ -198,8 +375,11 @@ export default function Upload() {
         throw new Error(`Ошибка сервера: ${response.status} - ${errorText}`)
       }
 
-      const result = await response.json()
+      const result = await readAnalysisStream(response, event => setProgress(progressLabel(event)))
       console.log('Analysis result:', result)
+      if (direct) {
+        files.forEach(file => localStorage.removeItem(uploadSessionKey(file)))
+      }
       
       sessionStorage.setItem('analysis_result', JSON.stringify(result))
       
@@ -218,6 +398,7 @@ export default function Upload() {
       setError(err.message || 'Ошибка при анализе файлов')
     } finally {
       setUploading(false)
+      setProgress(null)
     }
   }
 
@@ -480,7 +661,7 @@ export default function Upload() {
                 disabled={uploading}
               >
                 {uploading 
-                  ? `Анализ...` 
+                  ? progress || `Анализ...` 
                   : uploadMode === 'screenshots' 
                     ? `Анализировать ${uploadedFiles.length} скриншотов как один документ`
                     : 'Анализировать файл'
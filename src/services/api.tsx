@@ -232,6 +232,26 @@ class ApiService {
     return response.json();
   }
 
+  async getUploadsDetails(ids: number[]): Promise<{
+    results: Record<number, any>;
+    errors: Record<number, { status: number; detail: string }>;
+  }> {
+    const response = await this.request(`/uploads/details?ids=${ids.join(',')}`);
+    return response.json();
+  }
+
+  async bulkDeleteUploads(params: { ids?: number[]; user_id?: number }): Promise<{
+    deleted: number;
+    notFound: number[];
+    forbidden: number[];
+  }> {
+    const response = await this.request('/uploads/bulk-delete', {
+      method: 'POST',
+      body: JSON.stringify(params),
+    });
+    return response.json();
+  }
+
   async getDownloadUrl(uploadId: number): Promise<{ download_url: string; filename: string }> {
     const response = await this.request(`/upload/${uploadId}/download-url`);
     return response.json();
@@ -257,6 +277,61 @@ class ApiService {
     const response = await this.request(`/all-analyses?${queryParams.toString()}`);
     return response.json();
   }
+
+  async searchAnalyses(params: {
+    q: string;
+    page?: number;
+    limit?: number;
+    user_id?: number;
+  }) {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== null) {
+        queryParams.append(key, String(value));
+      }
+    });
+
+    const response = await this.request(`/search?${queryParams.toString()}`);
+    return response.json();
+  }
+
+  async getAdminStats(params: {
+    date_from?: string;
+    date_to?: string;
+    user_id?: number;
+  } = {}) {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== null) {
+        queryParams.append(key, String(value));
+      }
+    });
+
+    const response = await this.request(`/admin/stats?${queryParams.toString()}`);
+    return response.json();
+  }
+
+  async exportAnalyses(params: {
+    format?: 'csv' | 'ndjson';
+    fields?: string;
+    gzip?: boolean;
+    search?: string;
+    min_score?: number;
+    max_score?: number;
+    user_id?: number;
+    sort_by?: string;
+    sort_order?: string;
+  } = {}): Promise<Blob> {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined && value !== null) {
+        queryParams.append(key, String(value));
+      }
+    });
+
+    const response = await this.request(`/admin/export?${queryParams.toString()}`);
+    return response.blob();
+  }
 }
 
 export const apiService = new ApiService();
\ No newline at end of file